@@ -13,7 +13,15 @@ from app.core.config import settings
 
 # Now, after sys.path has been modified, import your app modules
 from app.db.base import Base
-from app.models import memory_model, user_model
+from app.db.schema import ensure_sqlite_directory
+from app.models import (
+    job_model,
+    memory_day_count_model,
+    memory_model,
+    memory_version_model,
+    tag_model,
+    user_model,
+)
 
 # Alembic Config object, provides access to the .ini file settings
 config = context.config
@@ -24,19 +32,37 @@ if config.config_file_name is not None:
 target_metadata = Base.metadata
 
 
-def get_url():
-    return settings.DATABASE_URL.replace("+aiosqlite", "")
+def get_urls():
+    """The main database, then every shard: they share one schema."""
+    urls = [settings.DATABASE_URL]
+    urls += [
+        settings.SHARD_DATABASE_URL.format(shard=shard)
+        for shard in range(settings.SHARD_COUNT)
+    ]
+    return [url.replace("+aiosqlite", "") for url in urls]
 
 
 def run_migrations_offline():
     """Run migrations in 'offline' mode."""
-    url = get_url()
+    for url in get_urls():
+        context.configure(
+            url=url,
+            target_metadata=target_metadata,
+            literal_binds=True,
+            compare_type=True,
+            dialect_opts={"paramstyle": "named"},
+            transaction_per_migration=False,
+        )
+
+        with context.begin_transaction():
+            context.run_migrations()
+
+
+def run_migrations_on(connection):
     context.configure(
-        url=url,
+        connection=connection,
         target_metadata=target_metadata,
-        literal_binds=True,
         compare_type=True,
-        dialect_opts={"paramstyle": "named"},
         transaction_per_migration=False,
     )
 
@@ -46,22 +72,21 @@ def run_migrations_offline():
 
 def run_migrations_online():
     """Run migrations in 'online' mode."""
+    connection = config.attributes.get("connection")
+    if connection is not None:
+        # Handed over by the app (app/db/schema.py), mid-transaction
+        run_migrations_on(connection)
+        return
     configuration = config.get_section(config.config_ini_section)
-    configuration["sqlalchemy.url"] = get_url()
-    connectable = engine_from_config(
-        configuration, prefix="sqlalchemy.", poolclass=pool.NullPool
-    )
-
-    with connectable.connect() as connection:
-        context.configure(
-            connection=connection,
-            target_metadata=target_metadata,
-            compare_type=True,
-            transaction_per_migration=False,
+    for url in get_urls():
+        ensure_sqlite_directory(url)
+        configuration["sqlalchemy.url"] = url
+        connectable = engine_from_config(
+            configuration, prefix="sqlalchemy.", poolclass=pool.NullPool
         )
 
-        with context.begin_transaction():
-            context.run_migrations()
+        with connectable.connect() as connection:
+            run_migrations_on(connection)
 
 
 if context.is_offline_mode():
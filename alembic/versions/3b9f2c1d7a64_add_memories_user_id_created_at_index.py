@@ -0,0 +1,33 @@
+"""Add memories (user_id, created_at) index
+
+Revision ID: 3b9f2c1d7a64
+Revises: ec04cca0de7e
+Create Date: 2026-10-18 09:12:41.302118
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "3b9f2c1d7a64"
+down_revision: Union[str, None] = "ec04cca0de7e"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Every listing filters on user_id and orders by (created_at, id); the
+    # rowid is implicitly the last column of any SQLite index, so this one
+    # index serves both the predicate and the keyset ordering.
+    op.create_index(
+        "ix_memories_user_id_created_at",
+        "memories",
+        ["user_id", "created_at"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_memories_user_id_created_at", table_name="memories")
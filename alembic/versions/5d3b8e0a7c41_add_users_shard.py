@@ -0,0 +1,27 @@
+"""Add users.shard
+
+Revision ID: 5d3b8e0a7c41
+Revises: e4a81f6c2d93
+Create Date: 2026-10-18 17:42:51.206114
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "5d3b8e0a7c41"
+down_revision: Union[str, None] = "e4a81f6c2d93"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("users", sa.Column("shard", sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("users", "shard")
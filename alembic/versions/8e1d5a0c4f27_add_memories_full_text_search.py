@@ -0,0 +1,60 @@
+"""Add memories full-text search
+
+Revision ID: 8e1d5a0c4f27
+Revises: 3b9f2c1d7a64
+Create Date: 2026-10-18 11:40:03.918204
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "8e1d5a0c4f27"
+down_revision: Union[str, None] = "3b9f2c1d7a64"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("""
+        CREATE VIRTUAL TABLE memories_fts USING fts5(
+            title, description,
+            content='memories', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2'
+        )
+        """)
+    op.execute(
+        "INSERT INTO memories_fts(memories_fts, rank) VALUES('rank', 'bm25(5.0, 1.0)')"
+    )
+    op.execute("""
+        CREATE TRIGGER memories_fts_ai AFTER INSERT ON memories BEGIN
+            INSERT INTO memories_fts(rowid, title, description)
+            VALUES (new.id, new.title, new.description);
+        END
+        """)
+    op.execute("""
+        CREATE TRIGGER memories_fts_ad AFTER DELETE ON memories BEGIN
+            INSERT INTO memories_fts(memories_fts, rowid, title, description)
+            VALUES ('delete', old.id, old.title, old.description);
+        END
+        """)
+    op.execute("""
+        CREATE TRIGGER memories_fts_au
+        AFTER UPDATE OF title, description ON memories BEGIN
+            INSERT INTO memories_fts(memories_fts, rowid, title, description)
+            VALUES ('delete', old.id, old.title, old.description);
+            INSERT INTO memories_fts(rowid, title, description)
+            VALUES (new.id, new.title, new.description);
+        END
+        """)
+    # Index the memories that already exist
+    op.execute("INSERT INTO memories_fts(memories_fts) VALUES('rebuild')")
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS memories_fts_au")
+    op.execute("DROP TRIGGER IF EXISTS memories_fts_ad")
+    op.execute("DROP TRIGGER IF EXISTS memories_fts_ai")
+    op.execute("DROP TABLE IF EXISTS memories_fts")
@@ -0,0 +1,114 @@
+"""Add each memory's owner to the search index
+
+Revision ID: 9c4d2b7e1a36
+Revises: f83e1b7c5d20
+Create Date: 2026-10-19 10:14:52.207431
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "9c4d2b7e1a36"
+down_revision: Union[str, None] = "f83e1b7c5d20"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _drop_search_index() -> None:
+    op.execute("DROP TRIGGER IF EXISTS memories_fts_au")
+    op.execute("DROP TRIGGER IF EXISTS memories_fts_ad")
+    op.execute("DROP TRIGGER IF EXISTS memories_fts_ai")
+    op.execute("DROP TABLE IF EXISTS memories_fts")
+    op.execute("DROP VIEW IF EXISTS memories_fts_source")
+
+
+def upgrade() -> None:
+    # Through memory_text(), as before: compressed descriptions may be
+    # stored. The app's startup switches to plain reads if it can.
+    _drop_search_index()
+    op.execute("""
+        CREATE VIEW memories_fts_source AS
+        SELECT id, title, memory_text(description) AS description,
+               'u' || user_id AS owner
+        FROM memories
+        """)
+    op.execute("""
+        CREATE VIRTUAL TABLE memories_fts USING fts5(
+            title, description, owner,
+            content='memories_fts_source', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2'
+        )
+        """)
+    op.execute("""
+        INSERT INTO memories_fts(memories_fts, rank)
+        VALUES('rank', 'bm25(5.0, 1.0, 0.0)')
+        """)
+    op.execute("""
+        CREATE TRIGGER memories_fts_ai AFTER INSERT ON memories BEGIN
+            INSERT INTO memories_fts(rowid, title, description, owner)
+            VALUES (new.id, new.title, memory_text(new.description),
+                    'u' || new.user_id);
+        END
+        """)
+    op.execute("""
+        CREATE TRIGGER memories_fts_ad AFTER DELETE ON memories BEGIN
+            INSERT INTO memories_fts(memories_fts, rowid, title, description, owner)
+            VALUES ('delete', old.id, old.title, memory_text(old.description),
+                    'u' || old.user_id);
+        END
+        """)
+    op.execute("""
+        CREATE TRIGGER memories_fts_au
+        AFTER UPDATE OF title, description, user_id ON memories BEGIN
+            INSERT INTO memories_fts(memories_fts, rowid, title, description, owner)
+            VALUES ('delete', old.id, old.title, memory_text(old.description),
+                    'u' || old.user_id);
+            INSERT INTO memories_fts(rowid, title, description, owner)
+            VALUES (new.id, new.title, memory_text(new.description),
+                    'u' || new.user_id);
+        END
+        """)
+    op.execute("INSERT INTO memories_fts(memories_fts) VALUES('rebuild')")
+
+
+def downgrade() -> None:
+    _drop_search_index()
+    op.execute("""
+        CREATE VIEW memories_fts_source AS
+        SELECT id, title, memory_text(description) AS description FROM memories
+        """)
+    op.execute("""
+        CREATE VIRTUAL TABLE memories_fts USING fts5(
+            title, description,
+            content='memories_fts_source', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2'
+        )
+        """)
+    op.execute(
+        "INSERT INTO memories_fts(memories_fts, rank) VALUES('rank', 'bm25(5.0, 1.0)')"
+    )
+    op.execute("""
+        CREATE TRIGGER memories_fts_ai AFTER INSERT ON memories BEGIN
+            INSERT INTO memories_fts(rowid, title, description)
+            VALUES (new.id, new.title, memory_text(new.description));
+        END
+        """)
+    op.execute("""
+        CREATE TRIGGER memories_fts_ad AFTER DELETE ON memories BEGIN
+            INSERT INTO memories_fts(memories_fts, rowid, title, description)
+            VALUES ('delete', old.id, old.title, memory_text(old.description));
+        END
+        """)
+    op.execute("""
+        CREATE TRIGGER memories_fts_au
+        AFTER UPDATE OF title, description ON memories BEGIN
+            INSERT INTO memories_fts(memories_fts, rowid, title, description)
+            VALUES ('delete', old.id, old.title, memory_text(old.description));
+            INSERT INTO memories_fts(rowid, title, description)
+            VALUES (new.id, new.title, memory_text(new.description));
+        END
+        """)
+    op.execute("INSERT INTO memories_fts(memories_fts) VALUES('rebuild')")
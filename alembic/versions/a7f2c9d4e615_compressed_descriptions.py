@@ -0,0 +1,119 @@
+"""Index descriptions through memory_text() and compress long ones
+
+Revision ID: a7f2c9d4e615
+Revises: 5d3b8e0a7c41
+Create Date: 2026-10-18 19:05:37.552816
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "a7f2c9d4e615"
+down_revision: Union[str, None] = "5d3b8e0a7c41"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _drop_search_index() -> None:
+    op.execute("DROP TRIGGER IF EXISTS memories_fts_au")
+    op.execute("DROP TRIGGER IF EXISTS memories_fts_ad")
+    op.execute("DROP TRIGGER IF EXISTS memories_fts_ai")
+    op.execute("DROP TABLE IF EXISTS memories_fts")
+    op.execute("DROP VIEW IF EXISTS memories_fts_source")
+
+
+def _convert_descriptions(compress: bool) -> None:
+    # In batches by id, so memory use stays flat on large tables
+    from app.db.compression import convert_descriptions
+
+    if op.get_context().as_sql:
+        # No rows to read when only emitting SQL; use the CLI afterwards
+        return
+    connection = op.get_bind()
+    after_id = 0
+    while after_id is not None:
+        after_id, _ = convert_descriptions(connection, compress, after_id)
+
+
+def upgrade() -> None:
+    # Through memory_text(), which reads stored text and compressed BLOBs
+    # alike. Existing rows are left as they are: `python -m app.cli
+    # convert-descriptions` compresses them, and the app's startup switches
+    # the triggers to plain reads while none are compressed.
+    _drop_search_index()
+    op.execute("""
+        CREATE VIEW memories_fts_source AS
+        SELECT id, title, memory_text(description) AS description FROM memories
+        """)
+    op.execute("""
+        CREATE VIRTUAL TABLE memories_fts USING fts5(
+            title, description,
+            content='memories_fts_source', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2'
+        )
+        """)
+    op.execute(
+        "INSERT INTO memories_fts(memories_fts, rank) VALUES('rank', 'bm25(5.0, 1.0)')"
+    )
+    op.execute("""
+        CREATE TRIGGER memories_fts_ai AFTER INSERT ON memories BEGIN
+            INSERT INTO memories_fts(rowid, title, description)
+            VALUES (new.id, new.title, memory_text(new.description));
+        END
+        """)
+    op.execute("""
+        CREATE TRIGGER memories_fts_ad AFTER DELETE ON memories BEGIN
+            INSERT INTO memories_fts(memories_fts, rowid, title, description)
+            VALUES ('delete', old.id, old.title, memory_text(old.description));
+        END
+        """)
+    op.execute("""
+        CREATE TRIGGER memories_fts_au
+        AFTER UPDATE OF title, description ON memories BEGIN
+            INSERT INTO memories_fts(memories_fts, rowid, title, description)
+            VALUES ('delete', old.id, old.title, memory_text(old.description));
+            INSERT INTO memories_fts(rowid, title, description)
+            VALUES (new.id, new.title, memory_text(new.description));
+        END
+        """)
+    op.execute("INSERT INTO memories_fts(memories_fts) VALUES('rebuild')")
+
+
+def downgrade() -> None:
+    _drop_search_index()
+    _convert_descriptions(compress=False)
+    op.execute("""
+        CREATE VIRTUAL TABLE memories_fts USING fts5(
+            title, description,
+            content='memories', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2'
+        )
+        """)
+    op.execute(
+        "INSERT INTO memories_fts(memories_fts, rank) VALUES('rank', 'bm25(5.0, 1.0)')"
+    )
+    op.execute("""
+        CREATE TRIGGER memories_fts_ai AFTER INSERT ON memories BEGIN
+            INSERT INTO memories_fts(rowid, title, description)
+            VALUES (new.id, new.title, new.description);
+        END
+        """)
+    op.execute("""
+        CREATE TRIGGER memories_fts_ad AFTER DELETE ON memories BEGIN
+            INSERT INTO memories_fts(memories_fts, rowid, title, description)
+            VALUES ('delete', old.id, old.title, old.description);
+        END
+        """)
+    op.execute("""
+        CREATE TRIGGER memories_fts_au
+        AFTER UPDATE OF title, description ON memories BEGIN
+            INSERT INTO memories_fts(memories_fts, rowid, title, description)
+            VALUES ('delete', old.id, old.title, old.description);
+            INSERT INTO memories_fts(rowid, title, description)
+            VALUES (new.id, new.title, new.description);
+        END
+        """)
+    op.execute("INSERT INTO memories_fts(memories_fts) VALUES('rebuild')")
@@ -0,0 +1,41 @@
+"""Add memory_day_counts
+
+Revision ID: b19e6d3f0a58
+Revises: a7f2c9d4e615
+Create Date: 2026-10-18 20:31:12.640973
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "b19e6d3f0a58"
+down_revision: Union[str, None] = "a7f2c9d4e615"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "memory_day_counts",
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("day", sa.Date(), nullable=False),
+        sa.Column("count", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("user_id", "day"),
+    )
+    # Counts for the memories that already exist
+    op.execute("""
+        INSERT INTO memory_day_counts (user_id, day, count)
+        SELECT user_id, date(created_at), count(*) FROM memories
+        WHERE created_at IS NOT NULL
+        GROUP BY user_id, date(created_at)
+        """)
+
+
+def downgrade() -> None:
+    op.drop_table("memory_day_counts")
@@ -0,0 +1,54 @@
+"""Add tags and memory_tags
+
+Revision ID: d6c0a4e8b2f3
+Revises: b19e6d3f0a58
+Create Date: 2026-10-18 21:47:05.118392
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "d6c0a4e8b2f3"
+down_revision: Union[str, None] = "b19e6d3f0a58"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "tags",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("count", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_tags_user_id_name", "tags", ["user_id", "name"], unique=True)
+    op.create_table(
+        "memory_tags",
+        sa.Column("memory_id", sa.Integer(), nullable=False),
+        sa.Column("tag_id", sa.Integer(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(["memory_id"], ["memories.id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(["tag_id"], ["tags.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("memory_id", "tag_id"),
+    )
+    op.create_index(
+        "ix_memory_tags_tag_id_created_at",
+        "memory_tags",
+        ["tag_id", "created_at", "memory_id"],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_memory_tags_tag_id_created_at", table_name="memory_tags")
+    op.drop_table("memory_tags")
+    op.drop_index("ix_tags_user_id_name", table_name="tags")
+    op.drop_table("tags")
@@ -0,0 +1,31 @@
+"""Add memories.version
+
+Revision ID: e4a81f6c2d93
+Revises: c52a7e9b1f08
+Create Date: 2026-10-18 15:20:07.418305
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "e4a81f6c2d93"
+down_revision: Union[str, None] = "c52a7e9b1f08"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "memories",
+        sa.Column("version", sa.Integer(), nullable=False, server_default="1"),
+    )
+
+
+def downgrade() -> None:
+    # Plain ALTER TABLE DROP COLUMN; a batch copy would lose the FTS triggers
+    op.drop_column("memories", "version")
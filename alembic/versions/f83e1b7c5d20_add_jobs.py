@@ -0,0 +1,39 @@
+"""Add jobs
+
+Revision ID: f83e1b7c5d20
+Revises: d6c0a4e8b2f3
+Create Date: 2026-10-18 23:12:40.529117
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "f83e1b7c5d20"
+down_revision: Union[str, None] = "d6c0a4e8b2f3"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "jobs",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("kind", sa.String(), nullable=False),
+        sa.Column("payload", sa.JSON(), nullable=False),
+        sa.Column("attempts", sa.Integer(), nullable=False),
+        sa.Column("run_after", sa.DateTime(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("last_error", sa.String(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_jobs_run_after", "jobs", ["run_after"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_jobs_run_after", table_name="jobs")
+    op.drop_table("jobs")
@@ -1,17 +1,37 @@
 # app/auth.py
 
+from typing import Optional
+
 from fastapi import Depends, HTTPException, Request, status
 from jose import JWTError, jwt
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 
 from app.core.config import settings
-from app.db.session import get_db
+from app.core.principal_cache import principal_cache
+from app.core.security import verify_password_async
+from app.db.session import get_db, get_read_db, shard_session
 from app.models.user_model import User
 
 
-async def get_current_user(request: Request, db: AsyncSession = Depends(get_db)):
-    token = request.cookies.get("access_token")
+async def authenticate_user(
+    db: AsyncSession, username: str, password: str
+) -> Optional[User]:
+    """Return the user if the password matches, otherwise None."""
+    stmt = select(User).filter(User.username == username)
+    result = await db.execute(stmt)
+    user = result.scalar_one_or_none()
+    # Give the connection back before the slow password check; the loaded
+    # user stays usable once detached
+    await db.close()
+    if not user or not await verify_password_async(password, user.hashed_password):
+        return None
+    return user
+
+
+async def get_current_user(request: Request, db: AsyncSession = Depends(get_read_db)):
+    # Browsers send the token in a cookie, API clients in the header
+    token = request.cookies.get("access_token") or request.headers.get("Authorization")
     if not token:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -26,18 +46,28 @@ async def get_current_user(request: Request, db: AsyncSession = Depends(get_db))
                 detail="Invalid authentication scheme.",
                 headers={"WWW-Authenticate": "Bearer"},
             )
-        payload = jwt.decode(
-            param, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
-        )
-        user_id: str = payload.get("sub")
+        # Fast path: a token already verified by this cache
+        user_id = await principal_cache.get_token(param)
         if user_id is None:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Invalid token.",
-                headers={"WWW-Authenticate": "Bearer"},
+            payload = jwt.decode(
+                param, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
             )
+            subject: str = payload.get("sub")
+            if subject is None:
+                raise HTTPException(
+                    status_code=status.HTTP_401_UNAUTHORIZED,
+                    detail="Invalid token.",
+                    headers={"WWW-Authenticate": "Bearer"},
+                )
+            user_id = int(subject)
+            await principal_cache.set_token(param, user_id, payload.get("exp"))
+
+        user = await principal_cache.get_user(user_id)
+        if user is not None:
+            return user
+
         # Fetch the user from the database
-        stmt = select(User).filter(User.id == int(user_id))
+        stmt = select(User).filter(User.id == user_id)
         result = await db.execute(stmt)
         user = result.scalar_one_or_none()
         if user is None:
@@ -46,6 +76,7 @@ async def get_current_user(request: Request, db: AsyncSession = Depends(get_db))
                 detail="User not found.",
                 headers={"WWW-Authenticate": "Bearer"},
             )
+        await principal_cache.set_user(user)
         return user
     except JWTError as e:
         raise HTTPException(
@@ -53,3 +84,27 @@ async def get_current_user(request: Request, db: AsyncSession = Depends(get_db))
             detail="Token decode error.",
             headers={"WWW-Authenticate": "Bearer"},
         ) from e
+
+
+# Sessions for the current user's memories, on the database that holds
+# them: the main one (via get_db/get_read_db) unless the user is sharded
+async def get_user_db(
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    if current_user.shard is None:
+        yield db
+    else:
+        async with shard_session(current_user.shard) as session:
+            yield session
+
+
+async def get_user_read_db(
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db),
+):
+    if current_user.shard is None:
+        yield db
+    else:
+        async with shard_session(current_user.shard, read=True) as session:
+            yield session
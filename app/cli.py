@@ -0,0 +1,164 @@
+# app/cli.py
+#
+# Maintenance commands, run as `python -m app.cli <command>`.
+
+import argparse
+import asyncio
+import os
+
+from sqlalchemy import create_engine
+
+# Registers memory_text(), which the search index may read through
+import app.db.compression  # noqa: F401
+from app.core.assets import BUILD_DIR, build_assets
+from app.core.config import settings
+from app.db.search import rebuild_search_index, sync_search_index
+
+
+def _database_urls():
+    """Sync URLs of the main database and every shard."""
+    urls = [settings.SYNC_DATABASE_URL]
+    urls += [
+        settings.SHARD_DATABASE_URL.format(shard=shard).replace("+aiosqlite", "")
+        for shard in range(settings.SHARD_COUNT)
+    ]
+    return urls
+
+
+def rebuild_search(args):
+    for url in _database_urls():
+        engine = create_engine(url)
+        with engine.begin() as connection:
+            rebuild_search_index(connection)
+        engine.dispose()
+        print(f"{url}: search index rebuilt.")
+
+
+def convert_descriptions(args):
+    from app.db.compression import convert_descriptions as convert_batch
+
+    compress = settings.DESCRIPTION_COMPRESSION and not args.decompress
+    for url in _database_urls():
+        engine = create_engine(url)
+        # Before compressing, the search triggers must decompress; once no
+        # compressed rows are left, they go back to plain reads
+        if compress:
+            with engine.begin() as connection:
+                sync_search_index(connection)
+        after_id, changed = 0, 0
+        while after_id is not None:
+            # A transaction per batch keeps write locks short
+            with engine.begin() as connection:
+                after_id, count = convert_batch(connection, compress, after_id)
+            changed += count
+        with engine.begin() as connection:
+            sync_search_index(connection)
+        engine.dispose()
+        print(f"{url}: rewrote {changed} descriptions.")
+
+
+def rebuild_stats(args):
+    from app.services.stats import rebuild_day_counts
+
+    for url in _database_urls():
+        engine = create_engine(url)
+        with engine.begin() as connection:
+            rows = rebuild_day_counts(connection)
+        engine.dispose()
+        print(f"{url}: rebuilt {rows} day counts.")
+
+
+def check_stats(args):
+    from app.services.stats import check_day_counts
+
+    mismatches = 0
+    for url in _database_urls():
+        engine = create_engine(url)
+        with engine.connect() as connection:
+            for user_id, day, expected, stored in check_day_counts(connection):
+                mismatches += 1
+                print(f"{url}: user {user_id} {day}: {stored} stored, {expected} real")
+        engine.dispose()
+    if mismatches:
+        print(f"{mismatches} day counts are off; run rebuild-stats.")
+        raise SystemExit(1)
+    print("Day counts match the memories.")
+
+
+def build_static(args):
+    manifest = build_assets()
+    print(f"Built {len(manifest)} static assets into {os.path.normpath(BUILD_DIR)}.")
+
+
+def rebalance_shards(args):
+    from app.db.rebalance import rebalance_shards as rebalance
+    from app.db.session import dispose_shard_engines, read_engine, write_engine
+
+    async def run():
+        try:
+            return await rebalance(args.user or None, dry_run=args.dry_run)
+        finally:
+            await dispose_shard_engines()
+            await write_engine.dispose()
+            await read_engine.dispose()
+
+    def where(shard):
+        return "main" if shard is None else f"shard {shard}"
+
+    moves = asyncio.run(run())
+    for user_id, source, target in moves:
+        print(f"user {user_id}: {where(source)} -> {where(target)}")
+    verb = "Would move" if args.dry_run else "Moved"
+    print(f"{verb} {len(moves)} users for SHARD_COUNT={settings.SHARD_COUNT}.")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m app.cli")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser(
+        "rebuild-search", help="Create and repopulate the memories search index"
+    ).set_defaults(func=rebuild_search)
+
+    commands.add_parser(
+        "rebuild-stats", help="Recompute the timeline day counts from memories"
+    ).set_defaults(func=rebuild_stats)
+
+    commands.add_parser(
+        "check-stats", help="Compare the timeline day counts with memories"
+    ).set_defaults(func=check_stats)
+
+    commands.add_parser(
+        "build-static",
+        help="Fingerprint and precompress frontend/static for serving",
+    ).set_defaults(func=build_static)
+
+    convert = commands.add_parser(
+        "convert-descriptions",
+        help="Store existing descriptions as DESCRIPTION_COMPRESSION says",
+    )
+    convert.add_argument(
+        "--decompress",
+        action="store_true",
+        help="store every description as plain text",
+    )
+    convert.set_defaults(func=convert_descriptions)
+
+    rebalance = commands.add_parser(
+        "rebalance-shards",
+        help="Move users' memories to their shard under the current SHARD_COUNT",
+    )
+    rebalance.add_argument(
+        "--user", type=int, action="append", help="only this user id (repeatable)"
+    )
+    rebalance.add_argument(
+        "--dry-run", action="store_true", help="list the moves without making them"
+    )
+    rebalance.set_defaults(func=rebalance_shards)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+# app/core/assets.py
+#
+# Static asset pipeline. `python -m app.cli build-static` copies
+# frontend/static into a build directory under content-hashed names, next
+# to gzip and brotli variants and a manifest.json; templates link assets
+# through static_url(), and PrecompressedStaticFiles serves the variant the
+# client accepts. Without a build, the source files are served as they are.
+
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import shutil
+from functools import lru_cache
+from typing import Dict, Optional
+
+from starlette.datastructures import Headers
+from starlette.exceptions import HTTPException
+from starlette.staticfiles import StaticFiles
+
+ROOT_DIR = os.path.join(os.path.dirname(__file__), "..", "..")
+SOURCE_DIR = os.path.join(ROOT_DIR, "frontend", "static")
+BUILD_DIR = os.path.join(ROOT_DIR, "frontend", "static-build")
+MANIFEST = "manifest.json"
+STATIC_PREFIX = "/static/"
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+# Below this size a compressed variant saves less than its headers cost
+MIN_COMPRESS_SIZE = 256
+COMPRESSIBLE_TYPES = ("text/", "application/javascript", "application/json")
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+
+def _hashed_name(path: str, data: bytes) -> str:
+    digest = hashlib.sha256(data).hexdigest()[:12]
+    stem, ext = os.path.splitext(path)
+    return f"{stem}.{digest}{ext}"
+
+
+def _compressible(path: str) -> bool:
+    media_type = mimetypes.guess_type(path)[0] or ""
+    return media_type.startswith(COMPRESSIBLE_TYPES) or media_type.endswith("+xml")
+
+
+def _write_variants(target: str, data: bytes, brotli) -> None:
+    variants = [
+        (".gz", gzip.compress(data, compresslevel=9, mtime=0)),
+        (".br", brotli.compress(data, quality=11)),
+    ]
+    for suffix, compressed in variants:
+        # Only keep a variant that is actually smaller
+        if len(compressed) < len(data):
+            with open(target + suffix, "wb") as f:
+                f.write(compressed)
+
+
+def build_assets(source: str = SOURCE_DIR, dest: str = BUILD_DIR) -> Dict[str, str]:
+    """Build the hashed, precompressed copy of `source`; returns the manifest.
+
+    Each file is written under both its own name and its hashed name, so
+    references that bypass static_url() keep working.
+    """
+    try:
+        import brotli
+    except ImportError as e:
+        raise RuntimeError(
+            "Building static assets needs the 'brotli' package for the .br "
+            "variants; install it from requirements.txt."
+        ) from e
+
+    shutil.rmtree(dest, ignore_errors=True)
+    manifest = {}
+    for directory, _, files in os.walk(source):
+        for filename in sorted(files):
+            path = os.path.join(directory, filename)
+            logical = os.path.relpath(path, source).replace(os.sep, "/")
+            with open(path, "rb") as f:
+                data = f.read()
+            manifest[logical] = _hashed_name(logical, data)
+            for name in (logical, manifest[logical]):
+                target = os.path.join(dest, name)
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                with open(target, "wb") as f:
+                    f.write(data)
+                if len(data) >= MIN_COMPRESS_SIZE and _compressible(logical):
+                    _write_variants(target, data, brotli)
+    with open(os.path.join(dest, MANIFEST), "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+
+@lru_cache(maxsize=None)
+def load_manifest(dest: str = BUILD_DIR) -> Dict[str, str]:
+    try:
+        with open(os.path.join(dest, MANIFEST)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def static_directory() -> str:
+    """The built assets if there is a build, otherwise the sources."""
+    return BUILD_DIR if load_manifest() else SOURCE_DIR
+
+
+def static_url(path: str) -> str:
+    """URL of a static asset, fingerprinted when a build exists."""
+    return STATIC_PREFIX + load_manifest().get(path, path)
+
+
+def _accepted_encodings(header: Optional[str]) -> set:
+    accepted = set()
+    for item in (header or "").split(","):
+        coding, _, params = item.strip().partition(";")
+        quality = params.strip().removeprefix("q=")
+        try:
+            if params and float(quality) == 0:
+                continue
+        except ValueError:
+            continue
+        accepted.add(coding.strip().lower())
+    return accepted
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    """StaticFiles that prefers a prebuilt .br or .gz file of the asset.
+
+    Hashed files from the manifest are cached for a year as immutable;
+    anything else must be revalidated.
+    """
+
+    def __init__(self, *args, manifest: Optional[Dict[str, str]] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.immutable = set((manifest or {}).values())
+
+    async def get_response(self, path: str, scope):
+        accepted = _accepted_encodings(Headers(scope=scope).get("accept-encoding"))
+        response = None
+        for encoding, suffix in ENCODINGS:
+            if encoding not in accepted:
+                continue
+            try:
+                response = await super().get_response(path + suffix, scope)
+            except HTTPException:
+                continue
+            # The media type is still that of the asset: mimetypes reads
+            # .gz and .br as encodings, not as types
+            response.headers["Content-Encoding"] = encoding
+            break
+        if response is None:
+            response = await super().get_response(path, scope)
+        response.headers["Vary"] = "Accept-Encoding"
+        logical = path.replace(os.sep, "/")
+        response.headers["Cache-Control"] = (
+            IMMUTABLE if logical in self.immutable else REVALIDATE
+        )
+        return response
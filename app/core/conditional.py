@@ -0,0 +1,71 @@
+# app/core/conditional.py
+
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional
+
+from fastapi import Request, Response, status
+
+from app.models.memory_version_model import MemoryVersion
+
+# Responses depend on who is asking, so shared caches must not reuse them
+# and browsers have to revalidate every time
+CACHE_HEADERS = {"Cache-Control": "private, no-cache", "Vary": "Cookie, Authorization"}
+
+
+def listing_validators(request: Request, marker: MemoryVersion, variant: str) -> dict:
+    """ETag and Last-Modified headers for a listing of the user's memories.
+
+    The ETag covers the user's version counter, the query string (page,
+    cursor, limit) and the representation, so each page has its own tag.
+    """
+    digest = hashlib.sha1(
+        f"{variant}?{request.url.query}".encode(), usedforsecurity=False
+    ).hexdigest()[:16]
+    headers = {"ETag": f'W/"{marker.user_id}-{marker.version}-{digest}"'}
+    if marker.modified_at is not None:
+        headers["Last-Modified"] = _http_date(marker.modified_at)
+    headers.update(CACHE_HEADERS)
+    return headers
+
+
+def _http_date(value: datetime) -> str:
+    # Stored timestamps are naive UTC
+    return format_datetime(value.replace(tzinfo=timezone.utc), usegmt=True)
+
+
+def _parse_http_date(value: str) -> Optional[datetime]:
+    try:
+        return parsedate_to_datetime(value).replace(tzinfo=None)
+    except (TypeError, ValueError):
+        return None
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    if header.strip() == "*":
+        return True
+    # Weak comparison: W/ prefixes are ignored on both sides
+    opaque = etag.removeprefix("W/")
+    return any(
+        candidate.strip().removeprefix("W/") == opaque
+        for candidate in header.split(",")
+    )
+
+
+def is_not_modified(request: Request, headers: dict) -> bool:
+    """Evaluate If-None-Match, or failing that If-Modified-Since."""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return _etag_matches(if_none_match, headers["ETag"])
+    if_modified_since = request.headers.get("if-modified-since")
+    last_modified: Optional[str] = headers.get("Last-Modified")
+    if if_modified_since is None or last_modified is None:
+        return False
+    since = _parse_http_date(if_modified_since)
+    # HTTP dates have whole-second precision
+    return since is not None and _parse_http_date(last_modified) <= since
+
+
+def not_modified(headers: dict) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
@@ -26,6 +26,119 @@ class Settings(BaseSettings):
     TEST_DATABASE_URL: str = os.getenv(
         "TEST_DATABASE_URL", "sqlite+aiosqlite:///./test_memory_app.db"
     )
+    # SQLite engine profile, applied to every new connection. An empty
+    # value (or 0) leaves that PRAGMA at SQLite's default.
+    SQLITE_JOURNAL_MODE: str = "WAL"
+    SQLITE_SYNCHRONOUS: str = "NORMAL"
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
+    SQLITE_CACHE_SIZE: int = -64000  # negative means KiB, i.e. 64 MB
+    SQLITE_MMAP_SIZE: int = 268435456
+    # One writer connection plus a read-only pool for listings
+    DB_SPLIT_READ_WRITE: bool = True
+    DB_READ_POOL_SIZE: int = 5
+    DB_READ_POOL_OVERFLOW: int = 5
+    DB_POOL_TIMEOUT_SECONDS: float = 30.0
+    MEMORIES_PAGE_SIZE: int = 20
+    MEMORIES_MAX_PAGE_SIZE: int = 100
+    # Bulk import: rows per executemany/commit, longest accepted line or
+    # CSV record (characters), and how many row errors are reported back
+    IMPORT_BATCH_SIZE: int = 1000
+    IMPORT_MAX_LINE_LENGTH: int = 1_000_000
+    IMPORT_MAX_REPORTED_ERRORS: int = 100
+    # Tags: at most TAGS_MAX_PER_MEMORY per memory and TAGS_MAX_PER_FILTER
+    # in one ?tags= filter, names up to TAG_MAX_LENGTH characters
+    TAGS_MAX_PER_MEMORY: int = 20
+    TAGS_MAX_PER_FILTER: int = 10
+    TAG_MAX_LENGTH: int = 50
+    # Rows fetched per server-side cursor batch when exporting
+    EXPORT_BATCH_SIZE: int = 500
+    # Sharded storage: with SHARD_COUNT > 0, users stay in DATABASE_URL and
+    # each user's memories live in one of SHARD_COUNT databases, named by
+    # SHARD_DATABASE_URL with {shard} filled in. Users placed before a
+    # change of SHARD_COUNT move with `python -m app.cli rebalance-shards`.
+    SHARD_COUNT: int = 0
+    SHARD_DATABASE_URL: str = "sqlite+aiosqlite:///./data/memory_app_shard{shard}.db"
+    # Store descriptions of at least DESCRIPTION_COMPRESS_MIN_BYTES
+    # compressed. Applies to new writes; `python -m app.cli
+    # convert-descriptions` rewrites existing rows either way. While on,
+    # only the app's connections can write memories (app/db/compression.py)
+    DESCRIPTION_COMPRESSION: bool = False
+    DESCRIPTION_COMPRESS_MIN_BYTES: int = 512
+    DESCRIPTION_COMPRESS_LEVEL: int = 6
+    # Coalesce concurrent memory inserts into one transaction per batch:
+    # a writer task commits up to GROUP_COMMIT_MAX_BATCH rows at a time,
+    # waiting at most GROUP_COMMIT_MAX_DELAY_MS for a batch to fill
+    GROUP_COMMIT_ENABLED: bool = False
+    GROUP_COMMIT_MAX_BATCH: int = 64
+    GROUP_COMMIT_MAX_DELAY_MS: float = 2.0
+    # Post-write jobs: stored in the jobs table with the write, run after its
+    # commit by JOBS_WORKERS tasks from a queue of JOBS_QUEUE_SIZE. Jobs
+    # that fail are retried up to JOBS_MAX_ATTEMPTS times, backing off from
+    # JOBS_RETRY_BASE_SECONDS. Jobs that did not fit in the queue, or whose
+    # worker died, are taken from the table after JOBS_LEASE_SECONDS by a
+    # poll, checked for every JOBS_POLL_SECONDS but only run when this
+    # process knows of jobs coming due, or after JOBS_IDLE_POLL_SECONDS.
+    JOBS_QUEUE_SIZE: int = 1000
+    JOBS_WORKERS: int = 2
+    JOBS_MAX_ATTEMPTS: int = 5
+    JOBS_RETRY_BASE_SECONDS: float = 1.0
+    JOBS_LEASE_SECONDS: float = 60.0
+    JOBS_POLL_SECONDS: float = 1.0
+    JOBS_IDLE_POLL_SECONDS: float = 60.0
+    # Password hashing pool: "thread" or "process"; 0 workers means one per CPU
+    PASSWORD_HASH_EXECUTOR: str = "thread"
+    PASSWORD_HASH_WORKERS: int = 0
+    PASSWORD_HASH_MAX_QUEUE: int = 64
+    # Login/register are turned away (503) when a new hash would wait longer
+    PASSWORD_HASH_MAX_WAIT_SECONDS: float = 2.0
+    # Token buckets for login/register attempts, per client IP and per
+    # username; set RATE_LIMIT_URL (redis://...) to share them between workers
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_URL: str = ""
+    RATE_LIMIT_IP_BURST: int = 20
+    RATE_LIMIT_IP_PER_MINUTE: float = 10.0
+    RATE_LIMIT_USERNAME_BURST: int = 5
+    RATE_LIMIT_USERNAME_PER_MINUTE: float = 5.0
+    RATE_LIMIT_MAX_KEYS: int = 100000
+    # Take the client IP from X-Forwarded-For; only behind a trusted proxy
+    RATE_LIMIT_TRUST_FORWARDED_FOR: bool = False
+    # Authenticated-principal cache; set AUTH_CACHE_URL (redis://...) to
+    # share it between workers
+    AUTH_CACHE_ENABLED: bool = True
+    AUTH_CACHE_TTL_SECONDS: float = 60.0
+    AUTH_CACHE_MAX_ENTRIES: int = 10000
+    AUTH_CACHE_URL: str = ""
+    # Rendered per-memory HTML fragments, bounded by count and total size
+    FRAGMENT_CACHE_MAX_ENTRIES: int = 20000
+    FRAGMENT_CACHE_MAX_BYTES: int = 16 * 1024 * 1024
+    # "Related memories": per-user vectors of each memory's words, appended
+    # to files in SIMILARITY_INDEX_DIR as memories are written, and kept in
+    # memory up to SIMILARITY_CACHE_MAX_BYTES. Missing files are rebuilt on
+    # demand; clear the directory after running with this off.
+    SIMILARITY_ENABLED: bool = False
+    SIMILARITY_INDEX_DIR: str = "./data/similarity"
+    SIMILARITY_DIMENSIONS: int = 256
+    SIMILARITY_CACHE_MAX_BYTES: int = 256 * 1024 * 1024
+    SIMILARITY_MAX_RESULTS: int = 20
+    # Compiled templates are cached on disk and shared by all workers; an
+    # empty directory means Jinja's per-user temp directory
+    TEMPLATES_BYTECODE_CACHE: bool = True
+    TEMPLATES_BYTECODE_CACHE_DIR: str = ""
+    TEMPLATES_AUTO_RELOAD: bool = True
+    # Streamed pages are sent in chunks of at least this many characters,
+    # except where the template asks for an early flush()
+    TEMPLATES_STREAM_CHUNK_SIZE: int = 8192
+    # Prometheus instrumentation and the /metrics endpoint
+    METRICS_ENABLED: bool = True
+    # Requests sending `X-Profile: <PROFILE_TOKEN>`, plus a sampled share of
+    # all requests, are profiled into PROFILE_DIR; empty token / 0 is off
+    PROFILE_TOKEN: str = ""
+    PROFILE_SAMPLE_RATE: float = 0.0
+    PROFILE_DIR: str = "./data/profiles"
+    PROFILE_MAX_FILES: int = 50
+    # Statements slower than this are logged (rotating file); 0 disables
+    SLOW_QUERY_MS: float = 250.0
+    SLOW_QUERY_LOG_PATH: str = "./data/slow_queries.log"
 
     model_config = ConfigDict(env_file=env_file)
 
@@ -0,0 +1,176 @@
+# app/core/metrics.py
+#
+# Prometheus metrics. Counters and histograms on the request and query
+# paths are plain in-process updates; gauges that can be read off existing
+# objects (connection pools, the hashing pool) are collected at scrape time
+# instead, so they cost nothing between scrapes.
+
+import time
+
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from sqlalchemy import event
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from app.core.hashing import hashing_pool
+
+registry = CollectorRegistry(auto_describe=True)
+# Instrumented engines by label, for the pool gauges
+ENGINES = {}
+
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "Time to send the full response, by route template.",
+    ["method", "route", "status"],
+    registry=registry,
+)
+REQUESTS_IN_PROGRESS = Gauge(
+    "http_requests_in_progress",
+    "Requests currently being handled.",
+    registry=registry,
+)
+QUERY_DURATION = Histogram(
+    "db_query_duration_seconds",
+    "Statement execution time, by engine and statement type.",
+    ["engine", "operation"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0),
+    registry=registry,
+)
+POOL_CHECKOUTS = Counter(
+    "db_pool_checkouts_total",
+    "Connections handed out by the pool.",
+    ["engine"],
+    registry=registry,
+)
+POOL_WAIT = Histogram(
+    "db_pool_wait_seconds",
+    "Time spent waiting for a pooled connection.",
+    ["engine"],
+    buckets=(0.0001, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0),
+    registry=registry,
+)
+
+
+def route_label(scope) -> str:
+    route = scope.get("route")
+    if route is not None:
+        return route.path_format
+    # Mounts (static files) set an endpoint but no route; everything else
+    # is a 404, which must not create a label per unknown URL
+    if "endpoint" in scope:
+        return scope.get("root_path") or "/"
+    return "unmatched"
+
+
+class MetricsMiddleware:
+    """Plain ASGI middleware; unlike BaseHTTPMiddleware it does not buffer
+    or re-wrap streamed responses."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        REQUESTS_IN_PROGRESS.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            REQUESTS_IN_PROGRESS.dec()
+            REQUEST_DURATION.labels(
+                scope["method"], route_label(scope), str(status)
+            ).observe(time.perf_counter() - started)
+
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """Queue pool that times how long callers wait for a connection.
+
+    Labelled by the pool's logging name, which survives engine.dispose().
+    """
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            return super().connect()
+        finally:
+            POOL_WAIT.labels(self._orig_logging_name or "default").observe(
+                time.perf_counter() - started
+            )
+
+
+def instrument_engine(engine, name: str):
+    """Record query timings and pool checkouts of `engine` under `name`."""
+    engine = getattr(engine, "sync_engine", engine)
+    checkouts = POOL_CHECKOUTS.labels(name)
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _start_timer(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _stop_timer(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["query_started"].pop()
+        operation = statement.lstrip().split(None, 1)[0].upper()
+        QUERY_DURATION.labels(name, operation).observe(time.perf_counter() - started)
+
+    @event.listens_for(engine, "handle_error")
+    def _drop_timer(context):
+        if context.connection is not None and context.cursor is not None:
+            context.connection.info.get("query_started", [None]).pop()
+
+    @event.listens_for(engine, "checkout")
+    def _count_checkout(dbapi_connection, connection_record, connection_proxy):
+        checkouts.inc()
+
+    ENGINES[name] = engine
+    return engine
+
+
+class RuntimeCollector:
+    """Pool occupancy and hashing-pool backlog, read when scraped."""
+
+    def collect(self):
+        size = GaugeMetricFamily(
+            "db_pool_size", "Configured pool size.", labels=["engine"]
+        )
+        checked_out = GaugeMetricFamily(
+            "db_pool_checked_out", "Connections in use.", labels=["engine"]
+        )
+        overflow = GaugeMetricFamily(
+            "db_pool_overflow", "Connections beyond pool_size.", labels=["engine"]
+        )
+        for name, engine in ENGINES.items():
+            pool = engine.pool
+            if not hasattr(pool, "checkedout"):
+                continue
+            size.add_metric([name], pool.size())
+            checked_out.add_metric([name], pool.checkedout())
+            overflow.add_metric([name], max(pool.overflow(), 0))
+        yield from (size, checked_out, overflow)
+
+        stats = hashing_pool.stats()
+        for key, help_text in (
+            ("queue_depth", "Password hashes waiting for a worker."),
+            ("in_flight", "Password hashes submitted and not yet finished."),
+            ("workers", "Password hashing workers."),
+        ):
+            yield GaugeMetricFamily(
+                f"password_hash_pool_{key}", help_text, value=stats[key]
+            )
+        yield CounterMetricFamily(
+            "password_hash_pool_rejected",
+            "Hash requests turned away because the queue was full.",
+            value=stats["rejected_total"],
+        )
+
+
+registry.register(RuntimeCollector())
@@ -0,0 +1,107 @@
+# app/core/pagination.py
+
+import base64
+import json
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, List, Optional, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import Select
+
+from app.core.config import settings
+
+# A cursor is the (created_at, id) key of a row. Because it addresses a
+# position by value instead of by offset, rows inserted or deleted while a
+# client is paging never shift the pages it has not seen yet.
+Cursor = Tuple[datetime, int]
+
+
+@dataclass
+class Page:
+    items: List[Any] = field(default_factory=list)
+    next_cursor: Optional[str] = None  # older rows
+    prev_cursor: Optional[str] = None  # newer rows
+    limit: int = 0
+
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    raw = json.dumps([created_at.isoformat(), row_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Cursor:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (ValueError, TypeError) as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor."
+        ) from e
+
+
+def clamp_limit(limit: Optional[int]) -> int:
+    if not limit or limit < 1:
+        return settings.MEMORIES_PAGE_SIZE
+    return min(limit, settings.MEMORIES_MAX_PAGE_SIZE)
+
+
+def order_keyset(stmt: Select, model, after: Optional[str], before: Optional[str]):
+    """Restrict `stmt` to the rows past the cursor and order it, newest
+    first, or oldest first when paging back with `before`. `model` is
+    anything with created_at and id columns."""
+    key = tuple_(model.created_at, model.id)
+    if before:
+        stmt = stmt.filter(key > tuple_(*decode_cursor(before)))
+        return stmt.order_by(model.created_at.asc(), model.id.asc())
+    if after:
+        stmt = stmt.filter(key < tuple_(*decode_cursor(after)))
+    return stmt.order_by(model.created_at.desc(), model.id.desc())
+
+
+def build_page(
+    rows: List[Any],
+    limit: int,
+    after: Optional[str],
+    before: Optional[str],
+    has_more: bool,
+) -> Page:
+    """A Page of `rows`, in the order they were fetched for `after` or
+    `before`, with the cursors for the pages on either side."""
+    if before:
+        rows.reverse()
+    page = Page(items=rows, limit=limit)
+    if not rows:
+        return page
+    first, last = rows[0], rows[-1]
+    if has_more or before:
+        page.next_cursor = encode_cursor(last.created_at, last.id)
+    if after or (before and has_more):
+        page.prev_cursor = encode_cursor(first.created_at, first.id)
+    return page
+
+
+async def paginate(
+    db: AsyncSession,
+    stmt: Select,
+    model,
+    limit: Optional[int] = None,
+    after: Optional[str] = None,
+    before: Optional[str] = None,
+    scalars: bool = True,
+) -> Page:
+    """Run `stmt` as one newest-first keyset page over `model`.
+
+    `after` continues towards older rows, `before` goes back towards newer
+    ones. One extra row is fetched to know whether another page exists, so
+    the cost of a page is independent of how many rows precede it. With
+    `scalars=False` the items are plain rows, for column-only selects.
+    """
+    limit = clamp_limit(limit)
+    stmt = order_keyset(stmt, model, after, before)
+    result = await db.execute(stmt.limit(limit + 1))
+    rows = list(result.scalars().all() if scalars else result.all())
+    return build_page(rows[:limit], limit, after, before, len(rows) > limit)
@@ -0,0 +1,171 @@
+# app/core/principal_cache.py
+
+import asyncio
+import hashlib
+import json
+import time
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session, make_transient_to_detached, object_session
+
+from app.core.cache import LRUCache
+from app.core.config import settings
+from app.models.user_model import User
+
+
+class MemoryBackend:
+    """Per-process backend; invalidations are only seen by this worker."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.cache = LRUCache(maxsize=maxsize, ttl=ttl)
+
+    async def get(self, key: str):
+        return self.cache.get(key)
+
+    async def set(self, key: str, value, ttl: float):
+        self.cache.set(key, value, ttl=ttl)
+
+    async def delete(self, key: str):
+        self.cache.delete(key)
+
+
+class RedisBackend:
+    """Shared backend so every worker sees the same entries and invalidations.
+
+    Requires the optional `redis` package.
+    """
+
+    def __init__(self, url: str, prefix: str = "memory-app:auth:"):
+        try:
+            import redis.asyncio as redis
+        except ImportError as e:
+            raise RuntimeError(
+                "AUTH_CACHE_URL points at Redis but the 'redis' package is not "
+                "installed."
+            ) from e
+        self.client = redis.from_url(url)
+        self.prefix = prefix
+
+    async def get(self, key: str):
+        raw = await self.client.get(self.prefix + key)
+        return None if raw is None else json.loads(raw)
+
+    async def set(self, key: str, value, ttl: float):
+        # Redis rejects a zero expiry
+        px = max(1, int(ttl * 1000))
+        await self.client.set(self.prefix + key, json.dumps(value), px=px)
+
+    async def delete(self, key: str):
+        await self.client.delete(self.prefix + key)
+
+
+class PrincipalCache:
+    """Caches verified tokens and the users they resolve to.
+
+    A token maps to its user id until the token expires or the TTL passes;
+    a user id maps to that user's column values. get_current_user can then
+    authenticate a request without decoding the JWT or querying `users`.
+    """
+
+    def __init__(self, backend, ttl: float, enabled: bool = True):
+        self.backend = backend
+        self.ttl = ttl
+        self.enabled = enabled
+
+    @staticmethod
+    def _token_key(token: str) -> str:
+        # Never keep raw bearer tokens in a shared store
+        return "token:" + hashlib.sha256(token.encode()).hexdigest()
+
+    async def get_token(self, token: str) -> Optional[int]:
+        if not self.enabled:
+            return None
+        return await self.backend.get(self._token_key(token))
+
+    async def set_token(self, token: str, user_id: int, expires_at=None):
+        if not self.enabled:
+            return
+        ttl = self.ttl
+        if expires_at is not None:
+            ttl = min(ttl, float(expires_at) - time.time())
+        if ttl > 0:
+            await self.backend.set(self._token_key(token), user_id, ttl)
+
+    async def invalidate_token(self, token: str):
+        await self.backend.delete(self._token_key(token))
+
+    async def get_user(self, user_id: int) -> Optional[User]:
+        if not self.enabled:
+            return None
+        values = await self.backend.get(f"user:{user_id}")
+        if values is None:
+            return None
+        # A detached instance, as if loaded by a session that has closed
+        user = User(**values)
+        make_transient_to_detached(user)
+        return user
+
+    async def set_user(self, user: User):
+        if not self.enabled:
+            return
+        values = {c.key: getattr(user, c.key) for c in User.__table__.columns}
+        await self.backend.set(f"user:{user.id}", values, self.ttl)
+
+    async def invalidate_user(self, user_id: int):
+        await self.backend.delete(f"user:{user_id}")
+
+    def invalidate_user_soon(self, user_id: int):
+        """Invalidate from synchronous code such as ORM event handlers."""
+        if isinstance(self.backend, MemoryBackend):
+            self.backend.cache.delete(f"user:{user_id}")
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        loop.create_task(self.invalidate_user(user_id))
+
+
+def _build_backend():
+    if settings.AUTH_CACHE_URL:
+        return RedisBackend(settings.AUTH_CACHE_URL)
+    return MemoryBackend(
+        maxsize=settings.AUTH_CACHE_MAX_ENTRIES, ttl=settings.AUTH_CACHE_TTL_SECONDS
+    )
+
+
+principal_cache = PrincipalCache(
+    _build_backend(),
+    ttl=settings.AUTH_CACHE_TTL_SECONDS,
+    enabled=settings.AUTH_CACHE_ENABLED,
+)
+
+
+_CHANGED_USERS = "changed_users"
+
+
+# Password changes and account deletions made through the ORM drop the
+# cached principal once they commit: dropped at flush, it could be cached
+# again from the old row by a request reading before the commit. Bulk
+# UPDATE/DELETE statements bypass these hooks and must call
+# principal_cache.invalidate_user themselves.
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _note_changed_user(mapper, connection, target):
+    session = object_session(target)
+    if session is None:
+        principal_cache.invalidate_user_soon(target.id)
+        return
+    session.info.setdefault(_CHANGED_USERS, set()).add(target.id)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_changed_users(session: Session) -> None:
+    for user_id in session.info.pop(_CHANGED_USERS, ()):
+        principal_cache.invalidate_user_soon(user_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_changed_users(session: Session) -> None:
+    session.info.pop(_CHANGED_USERS, None)
@@ -0,0 +1,215 @@
+# app/core/profiling.py
+#
+# On-demand request profiling and the slow-query log.
+#
+# A request is profiled when it carries `X-Profile: <PROFILE_TOKEN>` or is
+# picked by PROFILE_SAMPLE_RATE. The profile covers the whole response,
+# streamed body included, and is written to PROFILE_DIR as a pstats file
+# plus a text summary that splits the time between the database driver,
+# SQLAlchemy, Jinja and the app. cProfile sees everything on the event loop
+# thread, so other requests running concurrently show up in it as well;
+# only one request is profiled at a time.
+
+import asyncio
+import cProfile
+import hmac
+import io
+import json
+import logging
+import os
+import pstats
+import random
+import time
+import uuid
+from collections import defaultdict
+from contextvars import ContextVar
+from logging.handlers import RotatingFileHandler
+from typing import Optional
+
+from sqlalchemy import event
+
+from app.core.config import settings
+from app.core.metrics import route_label
+
+PROFILE_HEADER = "x-profile"
+SLOW_QUERY_MAX_BYTES = 10 * 1024 * 1024
+SLOW_QUERY_BACKUPS = 5
+STATEMENT_MAX_LENGTH = 2000
+
+# ASGI scope of the request being handled, for attributing queries
+current_scope: ContextVar[Optional[dict]] = ContextVar("current_scope", default=None)
+_profiling = False
+
+# Where a function's own time is counted in the summary, by file path
+AREAS = (
+    ("database driver", ("sqlite3", "aiosqlite")),
+    ("sqlalchemy", ("sqlalchemy",)),
+    ("templates", ("jinja2", "markupsafe", "templates")),
+    ("app", (os.sep + "app" + os.sep,)),
+)
+
+
+def _wants_profile(scope) -> bool:
+    if settings.PROFILE_TOKEN:
+        for name, value in scope["headers"]:
+            if name == PROFILE_HEADER.encode():
+                return hmac.compare_digest(value, settings.PROFILE_TOKEN.encode())
+    rate = settings.PROFILE_SAMPLE_RATE
+    return rate > 0 and random.random() < rate
+
+
+def summarize_profile(stats: pstats.Stats, top: int = 40) -> str:
+    areas = defaultdict(float)
+    for (filename, _, function), (_, _, own_time, _, _) in stats.stats.items():
+        # Builtins have no file, but name their type, e.g. sqlite3.Cursor
+        where = f"{filename}:{function}"
+        area = next(
+            (label for label, keys in AREAS if any(k in where for k in keys)),
+            "other",
+        )
+        areas[area] += own_time
+    lines = ["Own time by area:"]
+    for area, seconds in sorted(areas.items(), key=lambda item: -item[1]):
+        lines.append(f"  {area:<16} {seconds * 1000:9.1f}ms")
+    out = io.StringIO()
+    stats.stream = out
+    stats.sort_stats("cumulative").print_stats(top)
+    return "\n".join(lines) + "\n\n" + out.getvalue()
+
+
+def write_profile(profiler: cProfile.Profile, path: str, header: str) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    profiler.dump_stats(path + ".prof")
+    stats = pstats.Stats(profiler)
+    with open(path + ".txt", "w") as f:
+        f.write(header + "\n\n" + summarize_profile(stats))
+    # Keep the newest PROFILE_MAX_FILES profiles
+    names = sorted(n for n in os.listdir(settings.PROFILE_DIR) if n.endswith(".prof"))
+    for name in names[: -settings.PROFILE_MAX_FILES or None]:
+        for suffix in (".prof", ".txt"):
+            stale = os.path.join(settings.PROFILE_DIR, name[:-5] + suffix)
+            if os.path.exists(stale):
+                os.remove(stale)
+
+
+class ProfilingMiddleware:
+    """Tracks the current request for the slow-query log and profiles the
+    requests that ask for it (see the module docstring)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        global _profiling
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        token = current_scope.set(scope)
+        try:
+            if _profiling or not _wants_profile(scope):
+                return await self.app(scope, receive, send)
+
+            profile_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+
+            async def send_wrapper(message):
+                if message["type"] == "http.response.start":
+                    headers = list(message.get("headers", []))
+                    headers.append((b"x-profile-id", profile_id.encode()))
+                    message = {**message, "headers": headers}
+                await send(message)
+
+            _profiling = True
+            profiler = cProfile.Profile()
+            started = time.perf_counter()
+            profiler.enable()
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                profiler.disable()
+                _profiling = False
+                header = (
+                    f"{scope['method']} {scope['path']} "
+                    f"route={route_label(scope)} "
+                    f"wall={(time.perf_counter() - started) * 1000:.1f}ms"
+                )
+                path = os.path.join(settings.PROFILE_DIR, profile_id)
+                await asyncio.to_thread(write_profile, profiler, path, header)
+        finally:
+            current_scope.reset(token)
+
+
+slow_query_logger = logging.getLogger("app.slow_queries")
+slow_query_logger.propagate = False
+
+
+class _LazyRotatingFileHandler(RotatingFileHandler):
+    """Creates the file, and its directory, only once something is logged."""
+
+    def __init__(self, filename, **kwargs):
+        super().__init__(filename, delay=True, **kwargs)
+
+    def _open(self):
+        os.makedirs(os.path.dirname(self.baseFilename), exist_ok=True)
+        return super()._open()
+
+
+def _configure_slow_query_logger():
+    if slow_query_logger.handlers or not settings.SLOW_QUERY_LOG_PATH:
+        return
+    handler = _LazyRotatingFileHandler(
+        settings.SLOW_QUERY_LOG_PATH,
+        maxBytes=SLOW_QUERY_MAX_BYTES,
+        backupCount=SLOW_QUERY_BACKUPS,
+    )
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    slow_query_logger.addHandler(handler)
+    slow_query_logger.setLevel(logging.INFO)
+
+
+def parameters_shape(parameters, executemany: bool) -> str:
+    """Types of the bound parameters, never their values."""
+
+    def shape(row) -> str:
+        if isinstance(row, dict):
+            return ", ".join(f"{k}: {type(v).__name__}" for k, v in row.items())
+        return ", ".join(type(v).__name__ for v in row or ())
+
+    if executemany:
+        first = parameters[0] if parameters else ()
+        return f"{len(parameters)} x ({shape(first)})"
+    return f"({shape(parameters)})"
+
+
+def install_slow_query_log(engine, name: str):
+    """Log statements of `engine` slower than SLOW_QUERY_MS."""
+    if settings.SLOW_QUERY_MS <= 0 or not settings.SLOW_QUERY_LOG_PATH:
+        return engine
+    _configure_slow_query_logger()
+    engine = getattr(engine, "sync_engine", engine)
+    threshold = settings.SLOW_QUERY_MS / 1000
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _start_timer(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("slow_query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _check_duration(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["slow_query_started"].pop()
+        if elapsed < threshold:
+            return
+        scope = current_scope.get()
+        record = {
+            "at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "duration_ms": round(elapsed * 1000, 3),
+            "engine": name,
+            "route": f"{scope['method']} {route_label(scope)}" if scope else None,
+            "statement": " ".join(statement.split())[:STATEMENT_MAX_LENGTH],
+            "parameters": parameters_shape(parameters, executemany),
+        }
+        slow_query_logger.info(json.dumps(record))
+
+    @event.listens_for(engine, "handle_error")
+    def _drop_timer(context):
+        if context.connection is not None and context.cursor is not None:
+            context.connection.info.get("slow_query_started", [None]).pop()
+
+    return engine
@@ -0,0 +1,147 @@
+# app/core/ratelimit.py
+#
+# Token-bucket rate limiting and load shedding for the endpoints that run
+# bcrypt (login, register, API token). Both are checked as route
+# dependencies, before the database or the hashing pool is touched, so a
+# rejected attempt costs next to nothing.
+
+import math
+import time
+
+from fastapi import Depends, Form, HTTPException, Request, status
+
+from app.core.cache import LRUCache
+from app.core.config import settings
+from app.core.hashing import hashing_pool
+
+
+class MemoryBucketBackend:
+    """Per-process buckets; each worker enforces the limits on its own."""
+
+    def __init__(self, maxsize: int):
+        # A bucket left alone refills to capacity, which is the same as not
+        # having one, so entries expire once they would be full again
+        self.buckets = LRUCache(maxsize=maxsize)
+
+    async def take(self, key: str, capacity: float, rate: float) -> float:
+        """Take one token; returns 0, or the seconds until one is available."""
+        now = time.monotonic()
+        tokens, updated = self.buckets.get(key) or (capacity, now)
+        tokens = min(capacity, tokens + (now - updated) * rate)
+        wait = 0.0
+        if tokens < 1:
+            wait = (1 - tokens) / rate
+        else:
+            tokens -= 1
+        self.buckets.set(key, (tokens, now), ttl=(capacity - tokens) / rate)
+        return wait
+
+
+# KEYS[1] = bucket; ARGV = capacity, rate (tokens/s). The clock is Redis's
+# own, so all workers agree on it.
+TAKE_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(bucket[1]) or capacity
+local updated = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate)
+local wait = 0
+if tokens < 1 then
+    wait = (1 - tokens) / rate
+else
+    tokens = tokens - 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil((capacity - tokens) / rate * 1000) + 1000)
+return tostring(wait)
+"""
+
+
+class RedisBucketBackend:
+    """Buckets shared by every worker. Requires the optional `redis` package."""
+
+    def __init__(self, url: str, prefix: str = "memory-app:ratelimit:"):
+        try:
+            import redis.asyncio as redis
+        except ImportError as e:
+            raise RuntimeError(
+                "RATE_LIMIT_URL points at Redis but the 'redis' package is not "
+                "installed."
+            ) from e
+        self.client = redis.from_url(url)
+        self.script = self.client.register_script(TAKE_SCRIPT)
+        self.prefix = prefix
+
+    async def take(self, key: str, capacity: float, rate: float) -> float:
+        wait = await self.script(keys=[self.prefix + key], args=[capacity, rate])
+        return float(wait)
+
+
+def _build_backend():
+    if settings.RATE_LIMIT_URL:
+        return RedisBucketBackend(settings.RATE_LIMIT_URL)
+    return MemoryBucketBackend(maxsize=settings.RATE_LIMIT_MAX_KEYS)
+
+
+bucket_backend = _build_backend()
+
+
+def client_ip(request: Request) -> str:
+    if settings.RATE_LIMIT_TRUST_FORWARDED_FOR:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else "unknown"
+
+
+def _too_many(wait: float) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail="Too many attempts, please try again later.",
+        headers={"Retry-After": str(max(1, math.ceil(wait)))},
+    )
+
+
+async def limit_auth_attempts(request: Request, username: str = Form(...)):
+    """Dependency: one token per attempt from the client's and the
+    username's bucket. The username bucket stops a distributed attack on
+    one account; it is only drawn from once the IP is within its limit."""
+    if not settings.RATE_LIMIT_ENABLED:
+        return
+    wait = await bucket_backend.take(
+        f"ip:{client_ip(request)}",
+        settings.RATE_LIMIT_IP_BURST,
+        settings.RATE_LIMIT_IP_PER_MINUTE / 60,
+    )
+    if not wait:
+        wait = await bucket_backend.take(
+            f"user:{username.strip().lower()}",
+            settings.RATE_LIMIT_USERNAME_BURST,
+            settings.RATE_LIMIT_USERNAME_PER_MINUTE / 60,
+        )
+    if wait:
+        raise _too_many(wait)
+
+
+async def shed_hashing_load():
+    """Dependency: 503 straight away when a new hash would wait too long.
+
+    The hashing pool itself only refuses work once its queue is full; this
+    turns requests away earlier, from the expected wait, so that logins
+    fail fast and the pool's backlog never grows into latency for others.
+    """
+    wait = hashing_pool.estimated_wait()
+    if hashing_pool.saturated or wait > settings.PASSWORD_HASH_MAX_WAIT_SECONDS:
+        hashing_pool.rejected_total += 1
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Server is busy, please try again shortly.",
+            headers={"Retry-After": str(max(1, math.ceil(wait)))},
+        )
+
+
+# Route dependencies for every endpoint that verifies or hashes a password
+AUTH_GUARDS = [Depends(limit_auth_attempts), Depends(shed_hashing_load)]
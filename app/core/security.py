@@ -8,6 +8,7 @@ from jose import JWTError, jwt
 from passlib.context import CryptContext
 
 from app.core.config import settings
+from app.core.hashing import HashingPoolBusy, hashing_pool
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
@@ -20,6 +21,29 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 
+def _busy() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Server is busy, please try again shortly.",
+        headers={"Retry-After": "1"},
+    )
+
+
+# Async variants run bcrypt in the hashing pool so the event loop stays free
+async def hash_password_async(password: str) -> str:
+    try:
+        return await hashing_pool.run(hash_password, password)
+    except HashingPoolBusy as e:
+        raise _busy() from e
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    try:
+        return await hashing_pool.run(verify_password, plain_password, hashed_password)
+    except HashingPoolBusy as e:
+        raise _busy() from e
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     to_encode = data.copy()
     expire = datetime.utcnow() + (
@@ -0,0 +1,147 @@
+# app/db/compression.py
+#
+# Transparent compression of long memory descriptions.
+#
+# With DESCRIPTION_COMPRESSION on, a description of at least
+# DESCRIPTION_COMPRESS_MIN_BYTES is stored as a BLOB: a format byte, then
+# raw deflate data primed with a dictionary shared by every row. Shorter
+# descriptions, and any that would not shrink, stay TEXT. SQLite's TEXT
+# affinity keeps both kinds in the one column, so reads never depend on the
+# setting. The memory_text() SQL function, registered on every SQLAlchemy
+# connection, gives SQL code (the search index) the plain text.
+#
+# While compression is on, the search triggers call memory_text(), so writes
+# to memories fail on connections without it: the sqlite3 shell, DB
+# browsers, plain sqlite3 scripts. Scripts can register it themselves with
+# register_sqlite_functions(). Otherwise switch compression off and run
+# `python -m app.cli convert-descriptions`, which stores every description
+# as text and puts back triggers that any SQLite client can fire.
+
+import zlib
+from typing import List, Optional, Tuple, Union
+
+from sqlalchemy import String, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.types import TypeDecorator
+
+from app.core.config import settings
+
+FORMAT_ZLIB_V1 = 1
+CONVERT_BATCH_SIZE = 1000
+
+# Frequent words and phrases of diary entries, the most common last, where
+# deflate reaches them with the shortest distances. Every description is
+# compressed as if it followed this text, so even a few hundred bytes of
+# prose find matches. A new dictionary needs a new format byte: stored rows
+# name the one they were written with.
+_DICTIONARY_V1 = " ".join(
+    [
+        "yesterday tomorrow morning afternoon evening tonight weekend",
+        "Monday Tuesday Wednesday Thursday Friday Saturday Sunday",
+        "January February March April May June July August September",
+        "October November December birthday holiday vacation trip",
+        "family friends mother father sister brother husband wife kids",
+        "school work office meeting project boss colleague team",
+        "breakfast lunch dinner coffee tea restaurant cooked kitchen",
+        "walked drove went came back home house garden park beach city",
+        "weather rain sun snow cold warm outside inside early late",
+        "happy sad tired excited worried anxious grateful proud calm",
+        "remember forgot thinking thought feel feeling felt really very",
+        "something nothing everything someone everyone anything always never",
+        "because about after before during while until since again still",
+        "could would should might must can will just also even only much",
+        "little great good better best bad first last long time today",
+        "I think that I was I had I have I am I feel I wanted to I went to",
+        "we were we had it was there was and then but I so I and I",
+        "of the in the to the on the at the for the with the from the",
+        "that the this is it is that was to be I don't I didn't I can't",
+        " the and to of a in I was it my that ",
+    ]
+).encode()
+
+DICTIONARIES = {FORMAT_ZLIB_V1: _DICTIONARY_V1}
+
+
+def compress_text(value: str) -> Union[str, bytes]:
+    """The stored form of `value`: compressed bytes, or `value` itself if
+    it is short or does not compress."""
+    raw = value.encode()
+    if len(raw) < settings.DESCRIPTION_COMPRESS_MIN_BYTES:
+        return value
+    compressor = zlib.compressobj(
+        settings.DESCRIPTION_COMPRESS_LEVEL,
+        wbits=-15,
+        zdict=DICTIONARIES[FORMAT_ZLIB_V1],
+    )
+    data = bytes([FORMAT_ZLIB_V1]) + compressor.compress(raw) + compressor.flush()
+    return data if len(data) < len(raw) else value
+
+
+def decompress_text(value):
+    """The text of a stored description, compressed or not."""
+    if not isinstance(value, (bytes, memoryview)):
+        return value
+    data = bytes(value)
+    dictionary = DICTIONARIES.get(data[0]) if data else None
+    if dictionary is None:
+        raise ValueError("Unknown compressed description format.")
+    decompressor = zlib.decompressobj(wbits=-15, zdict=dictionary)
+    return (decompressor.decompress(data[1:]) + decompressor.flush()).decode()
+
+
+class CompressedText(TypeDecorator):
+    """A String column whose long values are stored compressed."""
+
+    impl = String
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None or not settings.DESCRIPTION_COMPRESSION:
+            return value
+        return compress_text(value)
+
+    def process_result_value(self, value, dialect):
+        return decompress_text(value)
+
+
+def register_sqlite_functions(dbapi_connection) -> None:
+    """Add memory_text() to a DB-API connection, e.g. a sqlite3 one."""
+    dbapi_connection.create_function(
+        "memory_text", 1, decompress_text, deterministic=True
+    )
+
+
+# Every engine, the app's, Alembic's and the CLI's: with compression on, the
+# search triggers call memory_text() on each write to memories
+@event.listens_for(Engine, "connect")
+def _register_sqlite_functions(dbapi_connection, connection_record):
+    if hasattr(dbapi_connection, "create_function"):
+        register_sqlite_functions(dbapi_connection)
+
+
+def convert_descriptions(
+    connection, compress: bool, after_id: int = 0, limit: int = CONVERT_BATCH_SIZE
+) -> Tuple[Optional[int], int]:
+    """Rewrite one batch of descriptions, by id, in their stored form for
+    `compress` and the current threshold.
+
+    Returns the id to continue after (None once done) and the number of
+    rows rewritten; the caller decides where transactions end.
+    """
+    rows = connection.exec_driver_sql(
+        "SELECT id, description FROM memories WHERE id > ? ORDER BY id LIMIT ?",
+        (after_id, limit),
+    ).fetchall()
+    if not rows:
+        return None, 0
+    updates: List[tuple] = []
+    for memory_id, stored in rows:
+        text = decompress_text(stored)
+        wanted = compress_text(text) if compress and text is not None else text
+        if wanted != stored:
+            updates.append((wanted, memory_id))
+    if updates:
+        connection.exec_driver_sql(
+            "UPDATE memories SET description = ? WHERE id = ?", updates
+        )
+    return rows[-1][0], len(updates)
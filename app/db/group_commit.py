@@ -0,0 +1,108 @@
+# app/db/group_commit.py
+
+import asyncio
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, List, Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+@dataclass
+class _Pending:
+    payload: Any
+    future: asyncio.Future = field(repr=False)
+
+
+class GroupCommitter:
+    """Coalesces concurrent writes into shared transactions.
+
+    Callers `submit` a payload and await its result. A single writer task
+    takes whatever has queued up, waits up to `max_delay` seconds for more
+    (never beyond `max_batch` items), stages every payload in one session
+    with `apply(db, payload)` and commits once. With SQLite's single writer
+    that is one fsync for the whole batch instead of one per request.
+
+    If the batch fails, each payload is retried in a transaction of its
+    own, so a bad payload only fails its own caller.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], AsyncSession],
+        apply: Callable[[AsyncSession, Any], Awaitable[Any]],
+        max_batch: int = 64,
+        max_delay: float = 0.002,
+    ):
+        self.session_factory = session_factory
+        self.apply = apply
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self.batches_total = 0
+        self.items_total = 0
+
+    async def submit(self, payload) -> Any:
+        if self._task is None or self._task.done():
+            self._queue = asyncio.Queue()
+            self._task = asyncio.create_task(self._run(self._queue))
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait(_Pending(payload, future))
+        return await future
+
+    async def stop(self) -> None:
+        """Commit what is queued, then end the writer task."""
+        if self._task is None or self._task.done():
+            return
+        self._queue.put_nowait(None)
+        await self._task
+        self._task = None
+
+    async def _run(self, queue: asyncio.Queue) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            first = await queue.get()
+            if first is None:
+                return
+            batch: List[_Pending] = [first]
+            stopping = False
+            deadline = loop.time() + self.max_delay
+            while len(batch) < self.max_batch:
+                try:
+                    if queue.empty():
+                        timeout = deadline - loop.time()
+                        if timeout <= 0:
+                            break
+                        item = await asyncio.wait_for(queue.get(), timeout)
+                    else:
+                        item = queue.get_nowait()
+                except asyncio.TimeoutError:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            # Callers that went away (e.g. client disconnects) are skipped
+            batch = [pending for pending in batch if not pending.future.done()]
+            if batch:
+                await self._commit(batch)
+            if stopping:
+                return
+
+    async def _commit(self, batch: List[_Pending]) -> None:
+        try:
+            async with self.session_factory() as db:
+                results = [await self.apply(db, pending.payload) for pending in batch]
+                await db.commit()
+        except Exception as e:
+            if len(batch) > 1:
+                for pending in batch:
+                    await self._commit([pending])
+            elif not batch[0].future.done():
+                batch[0].future.set_exception(e)
+            return
+        self.batches_total += 1
+        self.items_total += len(batch)
+        for pending, result in zip(batch, results):
+            if not pending.future.done():
+                pending.future.set_result(result)
@@ -0,0 +1,390 @@
+# app/db/jobs.py
+#
+# Background jobs for work derived from a write that the request need not
+# wait for. stage_job() adds a row to the jobs outbox in the write's own
+# session; once that session commits, the job goes onto an in-process queue
+# served by worker tasks, and the request returns. The outbox row is deleted
+# after the job has run, so a job survives a crash or restart at any point
+# and runs at least once: handlers must be idempotent.
+
+import asyncio
+import heapq
+import logging
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+
+from sqlalchemy import delete, event, inspect, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_session
+from sqlalchemy.future import select
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.core.config import settings
+from app.models.job_model import Job
+
+logger = logging.getLogger(__name__)
+
+# Done jobs are deleted in batches: when one is full, when the queue runs
+# dry, or when its first job was done this share of the lease ago, so that
+# no other process takes a done job once the lease is over
+DELETE_BATCH_SIZE = 100
+DELETE_LEASE_FRACTION = 0.25
+
+# Handlers by job kind. A handler gets a sessionmaker for the database the
+# job was written to (the user's shard, say) and the job's payload.
+Handler = Callable[[sessionmaker, dict], Awaitable[Any]]
+JOB_HANDLERS: Dict[str, Handler] = {}
+
+_STAGED = "staged_jobs"
+
+
+def job_handler(kind: str):
+    """Register the decorated coroutine function as the handler of `kind`."""
+
+    def register(handler: Handler) -> Handler:
+        JOB_HANDLERS[kind] = handler
+        return handler
+
+    return register
+
+
+@dataclass
+class _Item:
+    source: sessionmaker
+    job_id: int
+    kind: str
+    payload: dict
+    attempts: int = 0
+
+
+class JobQueue:
+    """A bounded queue of jobs and the tasks that run them.
+
+    Jobs come from commits (dispatch) and from the outbox tables (poll).
+    Dispatch never waits: when the queue is full the job stays in its
+    table, leased for `lease` seconds, and the poll takes it once the lease
+    is over and there is room. The poll only ever takes as many jobs as
+    there is room for, so a backlog waits in the database, not in memory.
+
+    The outboxes are only read when this process knows of jobs coming due
+    there (a spilled job's lease or a retry's backoff ends, or the last
+    poll left some behind), checked every `poll_interval` seconds, and
+    otherwise every `idle_poll_interval` seconds, for the jobs of workers
+    or processes that died.
+    """
+
+    def __init__(
+        self,
+        capacity: int = 1000,
+        workers: int = 2,
+        max_attempts: int = 5,
+        retry_base: float = 1.0,
+        lease: float = 60.0,
+        poll_interval: float = 1.0,
+        idle_poll_interval: float = 60.0,
+    ):
+        self.capacity = capacity
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.retry_base = retry_base
+        self.lease = lease
+        self.poll_interval = poll_interval
+        self.idle_poll_interval = idle_poll_interval
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        # Outbox databases by engine, and the ids of jobs done in each
+        self._sources: Dict[Any, sessionmaker] = {}
+        self._done: Dict[Any, List[int]] = {}
+        self._done_since: Optional[float] = None
+        # When jobs known to this process come due (time.monotonic())
+        self._wakeups: List[float] = []
+        self._last_poll = 0.0
+        self.dispatched_total = 0
+        self.spilled_total = 0
+        self.completed_total = 0
+        self.retried_total = 0
+        self.failed_total = 0
+
+    def add_source(self, source: sessionmaker) -> sessionmaker:
+        """Have the poll look for jobs in the database of `source`."""
+        return self._sources.setdefault(source.kw["bind"], source)
+
+    def source_for(self, db: AsyncSession) -> sessionmaker:
+        source = self._sources.get(db.bind)
+        if source is None:
+            source = self.add_source(
+                sessionmaker(
+                    bind=db.bind,
+                    class_=AsyncSession,
+                    expire_on_commit=False,
+                    info={k: v for k, v in db.info.items() if k != _STAGED},
+                )
+            )
+        return source
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks) and not any(task.done() for task in self._tasks)
+
+    def _ensure_started(self) -> None:
+        if self.running:
+            return
+        for task in self._tasks:
+            task.cancel()
+        self._queue = asyncio.Queue(self.capacity)
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._poll_forever()))
+
+    async def start(self, sources: Iterable[sessionmaker] = ()) -> None:
+        """Start the tasks and take what is due in the outboxes of `sources`
+        (and of any database dispatched from later)."""
+        for source in sources:
+            self.add_source(source)
+        self._ensure_started()
+        await self.poll()
+
+    def dispatch(self, source: sessionmaker, items: Iterable[tuple]) -> None:
+        """Queue just-committed jobs, given as (id, kind, payload)."""
+        self._ensure_started()
+        spilled = False
+        for job_id, kind, payload in items:
+            try:
+                self._queue.put_nowait(_Item(source, job_id, kind, payload))
+                self.dispatched_total += 1
+            except asyncio.QueueFull:
+                self.spilled_total += 1
+                spilled = True
+        if spilled:
+            self._wake_in(self.lease)
+
+    async def join(self) -> None:
+        """Wait until every queued job has run, and clear the done ones
+        from the outbox."""
+        if self._queue is not None:
+            await self._queue.join()
+        await self._delete_done()
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        """Finish the queued jobs (for at most `timeout` seconds), then end
+        the tasks; unfinished jobs stay in the outbox for the next start."""
+        if self.running:
+            try:
+                await asyncio.wait_for(self._queue.join(), timeout)
+            except asyncio.TimeoutError:
+                logger.warning("Stopping with %d jobs queued", self._queue.qsize())
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        await self._delete_done()
+
+    async def _work(self) -> None:
+        while True:
+            item = await self._queue.get()
+            try:
+                await self._run(item)
+            except Exception:
+                logger.exception(
+                    "Job %s (%s) could not be settled", item.job_id, item.kind
+                )
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, item: _Item) -> None:
+        try:
+            handler = JOB_HANDLERS.get(item.kind)
+            if handler is None:
+                raise LookupError(f"No handler for job kind {item.kind!r}.")
+            await handler(item.source, item.payload)
+        except Exception as e:
+            await self._retry_later(item, e)
+            return
+        self.completed_total += 1
+        done = self._done.setdefault(item.source.kw["bind"], [])
+        done.append(item.job_id)
+        now = time.monotonic()
+        if self._done_since is None:
+            self._done_since = now
+        if (
+            len(done) >= DELETE_BATCH_SIZE
+            or self._queue.empty()
+            or now - self._done_since >= self.lease * DELETE_LEASE_FRACTION
+        ):
+            await self._delete_done()
+
+    async def _retry_later(self, item: _Item, error: Exception) -> None:
+        attempts = item.attempts + 1
+        if attempts >= self.max_attempts:
+            run_after = None
+            self.failed_total += 1
+            logger.error(
+                "Job %s (%s) failed for good after %d attempts: %r",
+                item.job_id,
+                item.kind,
+                attempts,
+                error,
+            )
+        else:
+            delay = self.retry_base * 2 ** (attempts - 1)
+            run_after = datetime.utcnow() + timedelta(seconds=delay)
+            self._wake_in(delay)
+            self.retried_total += 1
+            logger.warning(
+                "Job %s (%s) failed, retrying in %.1fs: %r",
+                item.job_id,
+                item.kind,
+                delay,
+                error,
+            )
+        async with item.source() as db:
+            await db.execute(
+                update(Job)
+                .where(Job.id == item.job_id)
+                .values(
+                    attempts=attempts,
+                    run_after=run_after,
+                    last_error=repr(error)[:1000],
+                )
+            )
+            await db.commit()
+
+    async def _delete_done(self) -> None:
+        self._done_since = None
+        for bind, ids in list(self._done.items()):
+            if not ids:
+                continue
+            # Taken before the first await, so jobs finishing meanwhile wait
+            # for the next round
+            self._done[bind] = []
+            async with self._sources[bind]() as db:
+                await db.execute(delete(Job).where(Job.id.in_(ids)))
+                await db.commit()
+
+    async def poll(self) -> int:
+        """Take due jobs from every outbox, as many as the queue has room
+        for; returns how many were queued."""
+        self._ensure_started()
+        self._last_poll = time.monotonic()
+        # This poll takes whatever they were for
+        while self._wakeups and self._wakeups[0] <= self._last_poll:
+            heapq.heappop(self._wakeups)
+        await self._delete_done()
+        queued = 0
+        for source in list(self._sources.values()):
+            room = self.capacity - self._queue.qsize()
+            if room <= 0:
+                # The other outboxes may hold due jobs too
+                self._wake_in(0)
+                break
+            items = await self._claim(source, room)
+            for item in items:
+                self._queue.put_nowait(item)
+                queued += 1
+            if len(items) == room:
+                # More may be due behind them
+                self._wake_in(0)
+        return queued
+
+    def _wake_in(self, delay: float) -> None:
+        heapq.heappush(self._wakeups, time.monotonic() + delay)
+
+    def _poll_due(self) -> bool:
+        now = time.monotonic()
+        if self._wakeups and self._wakeups[0] <= now:
+            return True
+        return now - self._last_poll >= self.idle_poll_interval
+
+    async def _claim(self, source: sessionmaker, limit: int) -> List[_Item]:
+        now = datetime.utcnow()
+        async with source() as db:
+            due = (
+                (
+                    await db.execute(
+                        select(Job.id)
+                        .where(Job.run_after <= now)
+                        .order_by(Job.run_after)
+                        .limit(limit)
+                    )
+                )
+                .scalars()
+                .all()
+            )
+            if not due:
+                return []
+            # The run_after condition again: another process may have taken
+            # some of them since
+            rows = (
+                await db.execute(
+                    update(Job)
+                    .where(Job.id.in_(due), Job.run_after <= now)
+                    .values(run_after=now + timedelta(seconds=self.lease))
+                    .returning(Job.id, Job.kind, Job.payload, Job.attempts)
+                )
+            ).all()
+            await db.commit()
+        return [_Item(source, *row) for row in rows]
+
+    async def _poll_forever(self) -> None:
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            if not self._poll_due():
+                continue
+            try:
+                await self.poll()
+            except Exception:
+                logger.exception("Polling the job outbox failed")
+
+
+job_queue = JobQueue(
+    capacity=settings.JOBS_QUEUE_SIZE,
+    workers=settings.JOBS_WORKERS,
+    max_attempts=settings.JOBS_MAX_ATTEMPTS,
+    retry_base=settings.JOBS_RETRY_BASE_SECONDS,
+    lease=settings.JOBS_LEASE_SECONDS,
+    poll_interval=settings.JOBS_POLL_SECONDS,
+    idle_poll_interval=settings.JOBS_IDLE_POLL_SECONDS,
+)
+
+
+async def stage_job(db: AsyncSession, kind: str, payload: dict) -> Job:
+    """Add a job to `db`'s transaction; it is queued when `db` commits.
+
+    Jobs about one user's data carry the user's id as payload["user_id"],
+    so that they move with the user's rows between shards.
+    """
+    # Leased from the start: the committing process queues it itself
+    job = Job(
+        kind=kind,
+        payload=payload,
+        attempts=0,
+        run_after=datetime.utcnow() + timedelta(seconds=job_queue.lease),
+    )
+    db.add(job)
+    # Kind and payload kept aside: the job may be expired by the commit
+    db.info.setdefault(_STAGED, []).append((job, kind, payload))
+    return job
+
+
+def jobs_of_user(user_id: int):
+    """A WHERE clause for the outbox rows of jobs about `user_id`."""
+    return Job.payload["user_id"].as_integer() == user_id
+
+
+@event.listens_for(Session, "after_commit")
+def _dispatch_staged_jobs(session: Session) -> None:
+    staged = session.info.pop(_STAGED, None)
+    db = async_session(session)
+    if staged and db is not None:
+        job_queue.dispatch(
+            job_queue.source_for(db),
+            [
+                (inspect(job).identity[0], kind, payload)
+                for job, kind, payload in staged
+            ],
+        )
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_staged_jobs(session: Session) -> None:
+    session.info.pop(_STAGED, None)
@@ -0,0 +1,116 @@
+# app/db/rebalance.py
+#
+# Moves users' memories to the database that shard_for_user_id assigns
+# them under the current SHARD_COUNT: after adding or removing shards, or
+# turning sharding on (users start out in the main database) or off.
+#
+# Run it with the app stopped. A write made to the old database while its
+# user is being moved would be lost, and workers cache users, and with them
+# the shard they live on, for AUTH_CACHE_TTL_SECONDS.
+
+from typing import Iterable, List, Optional, Tuple
+
+from sqlalchemy import delete, insert, select, update
+
+from app.core.principal_cache import principal_cache
+from app.db.jobs import jobs_of_user
+from app.db.session import (
+    async_session,
+    prepare_shard,
+    shard_for_user_id,
+    shard_session,
+)
+from app.models.job_model import Job
+from app.models.memory_day_count_model import MemoryDayCount
+from app.models.memory_model import Memory
+from app.models.memory_version_model import MemoryVersion
+from app.models.tag_model import MemoryTag, Tag
+from app.models.user_model import User
+from app.services import similarity
+
+# Everything stored per user on a shard; the search index follows the
+# memories table through its triggers
+USER_TABLES = (
+    Memory.__table__,
+    MemoryVersion.__table__,
+    MemoryDayCount.__table__,
+    Tag.__table__,
+    MemoryTag.__table__,
+)
+COPY_BATCH_SIZE = 1000
+# Pending jobs about the user move too, or they would run against the old
+# database; job ids are only unique within one, so copies get new ids
+JOB_COLUMNS = [column for column in Job.__table__.c if column.key != "id"]
+
+Move = Tuple[int, Optional[int], Optional[int]]
+
+
+def _session(shard: Optional[int], main):
+    return main() if shard is None else shard_session(shard)
+
+
+async def move_user(
+    user_id: int, source: Optional[int], target: Optional[int], main=async_session
+) -> None:
+    """Move one user's rows from `source` to `target`.
+
+    Rows keep their ids, which are unique across databases. The copy, the
+    switch of users.shard and the removal of the originals each commit on
+    their own; if a move is interrupted, running it again starts over.
+    """
+    async with _session(source, main) as src, _session(target, main) as dest:
+        # Left over from an earlier, interrupted run
+        for table in USER_TABLES:
+            await dest.execute(delete(table).where(table.c.user_id == user_id))
+        await dest.execute(delete(Job).where(jobs_of_user(user_id)))
+        for table in USER_TABLES:
+            result = await src.stream(select(table).where(table.c.user_id == user_id))
+            async for rows in result.mappings().partitions(COPY_BATCH_SIZE):
+                await dest.execute(insert(table), [dict(row) for row in rows])
+        jobs = await src.execute(select(*JOB_COLUMNS).where(jobs_of_user(user_id)))
+        jobs = [dict(job) for job in jobs.mappings()]
+        if jobs:
+            await dest.execute(insert(Job), jobs)
+        await dest.commit()
+
+    async with main() as db:
+        await db.execute(update(User).where(User.id == user_id).values(shard=target))
+        await db.commit()
+    await principal_cache.invalidate_user(user_id)
+
+    async with _session(source, main) as src:
+        for table in USER_TABLES:
+            await src.execute(delete(table).where(table.c.user_id == user_id))
+        await src.execute(delete(Job).where(jobs_of_user(user_id)))
+        await src.commit()
+    # Rebuilt from the new database on next use
+    await similarity.discard_index(user_id)
+
+
+async def rebalance_shards(
+    user_ids: Optional[Iterable[int]] = None,
+    dry_run: bool = False,
+    main=async_session,
+) -> List[Move]:
+    """Move every user (or those in `user_ids`) who is not on their shard.
+
+    Returns the moves as (user_id, from, to), where None is the main
+    database; with `dry_run` they are only listed.
+    """
+    stmt = select(User.id, User.shard).order_by(User.id)
+    if user_ids is not None:
+        stmt = stmt.where(User.id.in_(list(user_ids)))
+    async with main() as db:
+        users = (await db.execute(stmt)).all()
+    moves = [
+        (user_id, current, shard_for_user_id(user_id))
+        for user_id, current in users
+        if current != shard_for_user_id(user_id)
+    ]
+    if dry_run:
+        return moves
+    for shard in sorted({target for _, _, target in moves if target is not None}):
+        await prepare_shard(shard)
+    for user_id, source, target in moves:
+        await move_user(user_id, source, target, main=main)
+    return moves
@@ -0,0 +1,123 @@
+# app/db/schema.py
+#
+# Startup schema check. Alembic owns the schema; create_all only fills in
+# for a database that migrations have not been run against.
+
+import logging
+import os
+
+from sqlalchemy import inspect
+from sqlalchemy.engine import Connection, make_url
+
+from app.db.base import Base
+from app.db.search import sync_search_index
+from app.models import (  # noqa: F401
+    job_model,
+    memory_day_count_model,
+    memory_model,
+    memory_version_model,
+    tag_model,
+    user_model,
+)
+
+logger = logging.getLogger(__name__)
+
+ALEMBIC_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "alembic")
+
+# The schema of the first revision, which databases created before the
+# app used Alembic have, without an alembic_version row
+BASELINE_SCHEMA = {
+    "users": {"id", "username", "hashed_password"},
+    "memories": {"id", "title", "description", "created_at", "user_id"},
+}
+
+# alembic is imported inside the functions below: it adds a fifth of a
+# second to importing the app, and is only needed once the lifespan runs
+
+
+def _alembic_config():
+    from alembic.config import Config
+
+    config = Config()
+    config.set_main_option("script_location", ALEMBIC_DIR)
+    return config
+
+
+def _script_directory():
+    from alembic.script import ScriptDirectory
+
+    return ScriptDirectory.from_config(_alembic_config())
+
+
+def _is_baseline(connection: Connection) -> bool:
+    inspector = inspect(connection)
+    tables = set(inspector.get_table_names()) - {"alembic_version"}
+    return tables == set(BASELINE_SCHEMA) and all(
+        {column["name"] for column in inspector.get_columns(table)} == columns
+        for table, columns in BASELINE_SCHEMA.items()
+    )
+
+
+def upgrade_to_head(connection: Connection) -> None:
+    """Run the migrations from the database's revision to head, on
+    `connection` and in its transaction."""
+    from alembic import command
+
+    config = _alembic_config()
+    # Picked up by alembic/env.py in place of the configured databases
+    config.attributes["connection"] = connection
+    command.upgrade(config, "head")
+
+
+def ensure_sqlite_directory(url: str) -> None:
+    """Create the directory holding a file-based SQLite database."""
+    url = make_url(url)
+    if url.get_backend_name() != "sqlite" or url.database in (None, "", ":memory:"):
+        return
+    directory = os.path.dirname(url.database)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+
+def sync_schema(connection: Connection) -> bool:
+    """Bring a database up to the models; returns False if nothing to do.
+
+    A database already at the Alembic head is left untouched. An empty one
+    is created from the models and stamped at head, so the next start takes
+    the fast path. One that predates Alembic (unstamped, with exactly the
+    first revision's tables) is adopted: stamped at that revision and
+    migrated to head. Anything else gets create_all, which adds missing
+    tables but not columns, plus a warning that migrations are pending.
+
+    Either way, the search triggers then read descriptions the way
+    DESCRIPTION_COMPRESSION says (app/db/search.py).
+    """
+    migrated = _migrate(connection)
+    return sync_search_index(connection) or migrated
+
+
+def _migrate(connection: Connection) -> bool:
+    from alembic.runtime.migration import MigrationContext
+
+    context = MigrationContext.configure(connection)
+    scripts = _script_directory()
+    head = scripts.get_current_head()
+    current = context.get_current_revision()
+    if current == head:
+        return False
+    if current is None and _is_baseline(connection):
+        logger.info("Adopting an unversioned database; migrating it to %s.", head)
+        context.stamp(scripts, scripts.get_base())
+        upgrade_to_head(connection)
+        return True
+    fresh = not inspect(connection).get_table_names()
+    Base.metadata.create_all(connection)
+    if fresh:
+        context.stamp(scripts, head)
+    else:
+        logger.warning(
+            "Database is at revision %s, not %s; run `alembic upgrade head`.",
+            current,
+            head,
+        )
+    return True
@@ -0,0 +1,236 @@
+# app/db/search.py
+
+import logging
+import re
+from dataclasses import dataclass
+from datetime import datetime
+from typing import List, Optional
+
+from markupsafe import Markup, escape
+from sqlalchemy import DateTime, Integer, String, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# External-content FTS5 index over memories: the text lives only in the
+# memories table, the index stores tokens, and triggers keep both in sync.
+#
+# All users share the index, so every memory also carries its owner as one
+# token ("u42"). Searches match it along with the terms, and FTS5 skips
+# through the term's hits to the user's instead of collecting everyone's.
+#
+# With DESCRIPTION_COMPRESSION on, descriptions may be stored compressed, so
+# the triggers and the view the index reads for snippets decompress them
+# with memory_text() (app/db/compression.py). That function exists only on
+# the app's connections, so then every write to memories has to go through
+# one; with compression off the triggers read the column as it is and any
+# SQLite client can write. sync_search_index() switches between the two.
+SEARCH_TRIGGERS = ("memories_fts_ai", "memories_fts_ad", "memories_fts_au")
+
+
+def search_ddl(decompress: bool) -> List[str]:
+    """Statements creating the index, its view and triggers; `decompress`
+    routes descriptions through memory_text()."""
+
+    def description(column: str) -> str:
+        return f"memory_text({column})" if decompress else column
+
+    return [
+        f"""
+        CREATE VIEW IF NOT EXISTS memories_fts_source AS
+        SELECT id, title, {description("description")} AS description,
+               'u' || user_id AS owner
+        FROM memories
+        """,
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS memories_fts USING fts5(
+            title, description, owner,
+            content='memories_fts_source', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2'
+        )
+        """,
+        # Title matches weigh more than description matches in ORDER BY rank
+        """
+        INSERT INTO memories_fts(memories_fts, rank)
+        VALUES('rank', 'bm25(5.0, 1.0, 0.0)')
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS memories_fts_ai AFTER INSERT ON memories BEGIN
+            INSERT INTO memories_fts(rowid, title, description, owner)
+            VALUES (new.id, new.title, {description("new.description")},
+                    'u' || new.user_id);
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS memories_fts_ad AFTER DELETE ON memories BEGIN
+            INSERT INTO memories_fts(memories_fts, rowid, title, description, owner)
+            VALUES ('delete', old.id, old.title, {description("old.description")},
+                    'u' || old.user_id);
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS memories_fts_au
+        AFTER UPDATE OF title, description, user_id ON memories BEGIN
+            INSERT INTO memories_fts(memories_fts, rowid, title, description, owner)
+            VALUES ('delete', old.id, old.title, {description("old.description")},
+                    'u' || old.user_id);
+            INSERT INTO memories_fts(rowid, title, description, owner)
+            VALUES (new.id, new.title, {description("new.description")},
+                    'u' || new.user_id);
+        END
+        """,
+    ]
+
+
+REBUILD_SQL = "INSERT INTO memories_fts(memories_fts) VALUES('rebuild')"
+
+# Control characters that never occur in diary text mark highlighted terms,
+# so the snippet can be HTML-escaped before the <mark> tags go in.
+_HL_OPEN, _HL_CLOSE = "\x02", "\x03"
+
+SEARCH_SQL = text(f"""
+    SELECT m.id, m.created_at,
+           highlight(memories_fts, 0, '{_HL_OPEN}', '{_HL_CLOSE}') AS title,
+           snippet(memories_fts, 1, '{_HL_OPEN}', '{_HL_CLOSE}', '…', 24)
+               AS snippet
+    FROM memories_fts
+    JOIN memories AS m ON m.id = memories_fts.rowid
+    WHERE memories_fts MATCH :query AND m.user_id = :user_id
+    ORDER BY memories_fts.rank
+    LIMIT :limit OFFSET :offset
+    """).columns(id=Integer, created_at=DateTime, title=String, snippet=String)
+
+
+@dataclass
+class SearchHit:
+    id: int
+    created_at: datetime
+    title: Markup
+    snippet: Markup
+
+
+@dataclass
+class SearchResults:
+    query: str
+    hits: List[SearchHit]
+    page: int
+    next_page: Optional[int] = None
+    prev_page: Optional[int] = None
+
+
+def install_search_index(target, connection, **kw):
+    """Create the FTS table and triggers; usable as an after_create hook."""
+    for statement in search_ddl(settings.DESCRIPTION_COMPRESSION):
+        connection.exec_driver_sql(statement)
+
+
+def drop_search_index(target, connection, **kw):
+    connection.exec_driver_sql("DROP TABLE IF EXISTS memories_fts")
+    connection.exec_driver_sql("DROP VIEW IF EXISTS memories_fts_source")
+
+
+def search_index_decompresses(connection) -> Optional[bool]:
+    """Whether the installed triggers call memory_text(); None if there is
+    no search index."""
+    trigger = connection.exec_driver_sql(
+        "SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name = ?",
+        (SEARCH_TRIGGERS[0],),
+    ).scalar()
+    return None if trigger is None else "memory_text(" in trigger
+
+
+def sync_search_index(connection) -> bool:
+    """Make the triggers and view read descriptions the way
+    DESCRIPTION_COMPRESSION says; returns whether they changed.
+
+    Both ways index the same text for uncompressed rows, so switching needs
+    no rebuild. Switching to plain reads waits until no compressed
+    description is left (`python -m app.cli convert-descriptions`).
+    """
+    decompress = settings.DESCRIPTION_COMPRESSION
+    current = search_index_decompresses(connection)
+    if current is None or current == decompress:
+        return False
+    if not decompress:
+        compressed = connection.exec_driver_sql(
+            "SELECT 1 FROM memories WHERE typeof(description) = 'blob' LIMIT 1"
+        ).first()
+        if compressed:
+            logger.warning(
+                "Compressed descriptions remain, so the search triggers still "
+                "need memory_text(); run `python -m app.cli convert-descriptions`."
+            )
+            return False
+    for trigger in SEARCH_TRIGGERS:
+        connection.exec_driver_sql(f"DROP TRIGGER IF EXISTS {trigger}")
+    connection.exec_driver_sql("DROP VIEW IF EXISTS memories_fts_source")
+    for statement in search_ddl(decompress):
+        connection.exec_driver_sql(statement)
+    return True
+
+
+def rebuild_search_index(connection):
+    """Re-tokenize every memory, e.g. for databases that predate the index."""
+    install_search_index(None, connection)
+    connection.exec_driver_sql(REBUILD_SQL)
+
+
+def build_match_query(query: str, user_id: Optional[int] = None) -> str:
+    # Quote every term so user input can never be parsed as FTS5 syntax;
+    # the last term is a prefix match to support search-as-you-type.
+    terms = re.findall(r"\w+", query)
+    if not terms:
+        return ""
+    quoted = [f'"{term}"' for term in terms]
+    quoted[-1] += "*"
+    match = " ".join(quoted)
+    if user_id is None:
+        return match
+    # The terms only match text columns, so no term can match an owner
+    return f'owner : "u{user_id}" AND {{title description}} : ({match})'
+
+
+def _highlight(value: str) -> Markup:
+    return Markup(
+        str(escape(value or ""))
+        .replace(_HL_OPEN, "<mark>")
+        .replace(_HL_CLOSE, "</mark>")
+    )
+
+
+async def search_memories(
+    db: AsyncSession, user_id: int, query: str, page: int = 1, per_page: int = 20
+) -> SearchResults:
+    """Ranked full-text search over one user's memories."""
+    results = SearchResults(query=query, hits=[], page=page)
+    match = build_match_query(query, user_id)
+    if not match:
+        return results
+
+    rows = (
+        await db.execute(
+            SEARCH_SQL,
+            {
+                "query": match,
+                "user_id": user_id,
+                "limit": per_page + 1,
+                "offset": (page - 1) * per_page,
+            },
+        )
+    ).all()
+    if len(rows) > per_page:
+        results.next_page = page + 1
+    if page > 1:
+        results.prev_page = page - 1
+    for row in rows[:per_page]:
+        results.hits.append(
+            SearchHit(
+                id=row.id,
+                created_at=row.created_at,
+                title=_highlight(row.title),
+                snippet=_highlight(row.snippet),
+            )
+        )
+    return results
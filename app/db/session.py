@@ -1,26 +1,118 @@
 # app/db/session.py
 
-from sqlalchemy import create_engine
+from typing import List, Optional, Tuple
+
+from sqlalchemy import event, func, select
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
 
 from app.core.config import settings
+from app.core.metrics import InstrumentedQueuePool, instrument_engine
+from app.core.profiling import install_slow_query_log
+from app.db.schema import ensure_sqlite_directory, sync_schema
 
 # Production database URL from settings
 DATABASE_URL = settings.DATABASE_URL
 
-# Create asynchronous engine for production
-async_engine = create_async_engine(DATABASE_URL, future=True, echo=False)
+
+def _is_sqlite(url: str) -> bool:
+    return make_url(url).get_backend_name() == "sqlite"
+
+
+def sqlite_pragmas(read_only: bool = False) -> list:
+    """PRAGMA statements of the configured engine profile, in apply order."""
+    pragmas = [f"PRAGMA busy_timeout={settings.SQLITE_BUSY_TIMEOUT_MS}"]
+    # journal_mode is a property of the database file and needs a write
+    # lock to change, so only writer connections set it
+    if settings.SQLITE_JOURNAL_MODE and not read_only:
+        pragmas.append(f"PRAGMA journal_mode={settings.SQLITE_JOURNAL_MODE}")
+    if settings.SQLITE_SYNCHRONOUS:
+        pragmas.append(f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}")
+    if settings.SQLITE_CACHE_SIZE:
+        pragmas.append(f"PRAGMA cache_size={settings.SQLITE_CACHE_SIZE}")
+    if settings.SQLITE_MMAP_SIZE:
+        pragmas.append(f"PRAGMA mmap_size={settings.SQLITE_MMAP_SIZE}")
+    if read_only:
+        pragmas.append("PRAGMA query_only=ON")
+    return pragmas
+
+
+def apply_engine_profile(engine, read_only: bool = False):
+    """Run the profile's PRAGMAs on every new connection of `engine`."""
+    engine = getattr(engine, "sync_engine", engine)
+    if not _is_sqlite(str(engine.url)):
+        return engine
+    pragmas = sqlite_pragmas(read_only)
+
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+
+    return engine
+
+
+def _pool_options(name: str, size: int, overflow: int, url: str = DATABASE_URL) -> dict:
+    if not _is_sqlite(url) or ":memory:" in url:
+        return {}
+    options = {
+        "pool_size": size,
+        "max_overflow": overflow,
+        "pool_timeout": settings.DB_POOL_TIMEOUT_SECONDS,
+        "pool_logging_name": name,
+    }
+    if settings.METRICS_ENABLED:
+        options["poolclass"] = InstrumentedQueuePool
+    return options
+
+
+# SQLite allows one writer at a time, so writes share a single connection
+# and queue in the pool instead of contending for the database lock. Reads
+# get their own pool and, in WAL mode, never wait behind a commit.
+write_engine = create_async_engine(
+    DATABASE_URL, future=True, echo=False, **_pool_options("write", 1, 0)
+)
+apply_engine_profile(write_engine)
+
+if settings.DB_SPLIT_READ_WRITE:
+    read_engine = create_async_engine(
+        DATABASE_URL,
+        future=True,
+        echo=False,
+        **_pool_options(
+            "read", settings.DB_READ_POOL_SIZE, settings.DB_READ_POOL_OVERFLOW
+        ),
+    )
+    apply_engine_profile(read_engine, read_only=True)
+else:
+    read_engine = write_engine
+
+if settings.METRICS_ENABLED:
+    instrument_engine(write_engine, "write")
+    if read_engine is not write_engine:
+        instrument_engine(read_engine, "read")
+install_slow_query_log(write_engine, "write")
+if read_engine is not write_engine:
+    install_slow_query_log(read_engine, "read")
+
+# Kept for code that predates the read/write split
+async_engine = write_engine
 
 # Create sessionmaker for async sessions
 async_session = sessionmaker(
-    bind=async_engine,
+    bind=write_engine,
     class_=AsyncSession,
     expire_on_commit=False,
 )
 
-# Synchronous engine for creating tables (sync for migrations, etc.)
-sync_engine = create_engine(settings.SYNC_DATABASE_URL, echo=False)
+read_session = sessionmaker(
+    bind=read_engine,
+    class_=AsyncSession,
+    expire_on_commit=False,
+)
 
 
 # Dependency to get the async DB session
@@ -29,6 +121,131 @@ async def get_db():
         yield session
 
 
+# Dependency for read-only work; uses the read pool
+async def get_read_db():
+    async with read_session() as session:
+        yield session
+
+
+# Sharding. Users always live in the main database above; users.shard
+# names the database holding their memories (NULL: the main one). Shard
+# databases carry the full schema, but their `users` table stays empty.
+SHARD_ID_SPAN = 1 << 40
+
+# (write, read) sessionmakers by shard URL, created on first use
+_shards = {}
+
+
+def shard_url(shard: int) -> str:
+    return settings.SHARD_DATABASE_URL.format(shard=shard)
+
+
+def shard_for_user_id(user_id: int) -> Optional[int]:
+    """Where a user's memories belong under the current SHARD_COUNT."""
+    if settings.SHARD_COUNT <= 0:
+        return None
+    return user_id % settings.SHARD_COUNT
+
+
+def shard_id_range(shard: int) -> Tuple[int, int]:
+    """Ids allocated on `shard`; the main database uses ids below
+    SHARD_ID_SPAN. Disjoint ranges keep ids unique across databases, so a
+    user's rows can move between shards without being renumbered."""
+    low = (shard + 1) * SHARD_ID_SPAN
+    return low, low + SHARD_ID_SPAN
+
+
+def next_shard_id(db: AsyncSession, column):
+    """The value for the integer primary key `column` in an insert through
+    `db`: SQLite's own rowid on the main database, the next id of the
+    shard's range on a shard."""
+    shard = db.info.get("shard")
+    if shard is None:
+        return None
+    low, high = shard_id_range(shard)
+    # Evaluated by the INSERT itself, under the write lock
+    return (
+        select(func.coalesce(func.max(column), low) + 1)
+        .where(column >= low, column < high)
+        .scalar_subquery()
+    )
+
+
+def _shard_sessions(shard: int) -> Tuple[sessionmaker, sessionmaker]:
+    url = shard_url(shard)
+    if url not in _shards:
+        name = f"shard{shard}"
+        write = create_async_engine(
+            url, future=True, **_pool_options(f"{name}-write", 1, 0, url)
+        )
+        read = create_async_engine(
+            url,
+            future=True,
+            **_pool_options(
+                f"{name}-read",
+                settings.DB_READ_POOL_SIZE,
+                settings.DB_READ_POOL_OVERFLOW,
+                url,
+            ),
+        )
+        for engine, label, read_only in ((write, "write", False), (read, "read", True)):
+            apply_engine_profile(engine, read_only=read_only)
+            # Memories reference users.id, which only the main database fills
+            event.listen(engine.sync_engine, "connect", _disable_foreign_keys)
+            if settings.METRICS_ENABLED:
+                instrument_engine(engine, f"{name}-{label}")
+            install_slow_query_log(engine, f"{name}-{label}")
+        _shards[url] = tuple(
+            sessionmaker(
+                bind=engine,
+                class_=AsyncSession,
+                expire_on_commit=False,
+                info={"shard": shard},
+            )
+            for engine in (write, read)
+        )
+    return _shards[url]
+
+
+def _disable_foreign_keys(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA foreign_keys=OFF")
+    cursor.close()
+
+
+def shard_engine(shard: int):
+    """The write engine of `shard`, e.g. for schema changes."""
+    return _shard_sessions(shard)[0].kw["bind"]
+
+
+def shard_session(shard: Optional[int], read: bool = False) -> AsyncSession:
+    """A session on the database holding the memories of `shard`."""
+    if shard is None:
+        return (read_session if read else async_session)()
+    return _shard_sessions(shard)[1 if read else 0]()
+
+
+def write_sessionmakers() -> List[sessionmaker]:
+    """Sessionmakers writing to the main database and each shard."""
+    return [async_session] + [
+        _shard_sessions(shard)[0] for shard in range(settings.SHARD_COUNT)
+    ]
+
+
+async def prepare_shard(shard: int) -> None:
+    """Create the shard's database, or bring it up to the models."""
+    ensure_sqlite_directory(shard_url(shard))
+    async with shard_engine(shard).begin() as connection:
+        await connection.run_sync(sync_schema)
+
+
+async def dispose_shard_engines() -> None:
+    for makers in _shards.values():
+        for maker in makers:
+            await maker.kw["bind"].dispose()
+    _shards.clear()
+
+
 # Test setup (override for testing)
 # Only used during tests to ensure that the test DB is properly connected
 def override_get_db(session):
@@ -1,104 +1,181 @@
 # app/main.py
 
-import os
+from contextlib import asynccontextmanager
+from typing import Optional
 
-from fastapi import Depends, FastAPI, HTTPException, Request
+from fastapi import APIRouter, Depends, FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse
-from fastapi.staticfiles import StaticFiles
+from fastapi.responses import HTMLResponse, ORJSONResponse, StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 
-from app.auth import get_current_user
-from app.db.base import Base
-from app.db.session import get_db, sync_engine
-from app.routers import memory, user
-from app.templates import templates  # Import templates from app.templates
-
-
-if not os.path.exists("./data"):
-    os.makedirs("./data")
-
-
-app = FastAPI()
-
-
-# Initialize the database with all models (using synchronous engine)
-Base.metadata.create_all(bind=sync_engine)
-
-
-# Allow CORS (adjust origins as needed)
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],  # Change to specific origins in production
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+from app.auth import get_current_user, get_user_read_db
+from app.core.assets import PrecompressedStaticFiles, load_manifest, static_directory
+from app.core.conditional import is_not_modified, listing_validators, not_modified
+from app.core.config import settings
+from app.core.hashing import hashing_pool
+from app.core.metrics import MetricsMiddleware
+from app.core.pagination import decode_cursor, paginate
+from app.core.profiling import ProfilingMiddleware
+from app.db.jobs import job_queue
+from app.db.schema import ensure_sqlite_directory, sync_schema
+from app.db.session import (
+    dispose_shard_engines,
+    prepare_shard,
+    read_engine,
+    write_engine,
+    write_sessionmakers,
+)
+from app.models.memory_model import Memory
+from app.models.user_model import User
+from app.routers import api, memory, ops, user
+from app.services.memories import get_memories_version, stop_memory_writers
+from app.templates import (  # Import templates from app.templates
+    build_version,
+    precompile_templates,
+    stream_template,
+    templates,
 )
 
+# Page routes; the API and form handlers live in app/routers
+pages = APIRouter()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Once per worker, before the first request: nothing here runs on import
+    ensure_sqlite_directory(settings.DATABASE_URL)
+    async with write_engine.begin() as connection:
+        await connection.run_sync(sync_schema)
+    for shard in range(settings.SHARD_COUNT):
+        await prepare_shard(shard)
+    precompile_templates()
+    # Also picks up jobs left over from before a restart
+    await job_queue.start(write_sessionmakers())
+    yield
+    await stop_memory_writers()
+    await job_queue.stop()
+    hashing_pool.shutdown()
+    await write_engine.dispose()
+    await read_engine.dispose()
+    await dispose_shard_engines()
+
+
+def create_app() -> FastAPI:
+    app = FastAPI(lifespan=lifespan)
+
+    # Allow CORS (adjust origins as needed)
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],  # Change to specific origins in production
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
 
-# Include routers
-app.include_router(user.router)
-app.include_router(memory.router)
-
-
-# Get the directory of the current file (app/main.py)
-current_dir = os.path.dirname(os.path.abspath(__file__))
-
-# Build the absolute path to the 'frontend/static' directory
-static_dir = os.path.join(current_dir, "..", "frontend", "static")
-
-# Verify the static directory exists
-if not os.path.isdir(static_dir):
-    raise RuntimeError(f"Static directory '{static_dir}' does not exist")
-
+    app.add_middleware(ProfilingMiddleware)
+    if settings.METRICS_ENABLED:
+        app.add_middleware(MetricsMiddleware)
+
+    # Include routers
+    app.include_router(ops.router)
+    app.include_router(user.router)
+    app.include_router(memory.router)
+    app.include_router(api.router)
+    app.include_router(pages)
+
+    # Mount static files: the fingerprinted, precompressed build when there
+    # is one (python -m app.cli build-static), otherwise frontend/static
+    app.mount(
+        "/static",
+        PrecompressedStaticFiles(
+            directory=static_directory(), manifest=load_manifest()
+        ),
+        name="static",
+    )
 
-# Mount static files
-app.mount("/static", StaticFiles(directory=static_dir), name="static")
+    app.add_exception_handler(HTTPException, http_exception_handler)
+    return app
 
 
 # Serve index.html
-@app.get("/", response_class=HTMLResponse)
+@pages.get("/", response_class=HTMLResponse)
 async def serve_index(request: Request):
     return templates.TemplateResponse("index.html", {"request": request})
 
 
 # Serve register.html
-@app.get("/users/register", response_class=HTMLResponse)
+@pages.get("/users/register", response_class=HTMLResponse)
 async def serve_register(request: Request):
     return templates.TemplateResponse("register.html", {"request": request})
 
 
 # Serve login.html
-@app.get("/users/login", response_class=HTMLResponse)
+@pages.get("/users/login", response_class=HTMLResponse)
 async def serve_login(request: Request):
     return templates.TemplateResponse("login.html", {"request": request})
 
 
 # Serve memories.html
-@app.get("/memories", response_class=HTMLResponse)
+@pages.get("/memories", response_class=HTMLResponse)
 async def serve_memories(
     request: Request,
-    current_user: Depends(get_current_user),
-    db: AsyncSession = Depends(get_db),
+    limit: Optional[int] = Query(None, ge=1),
+    after: Optional[str] = None,
+    before: Optional[str] = None,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_user_read_db),
 ):
-    result = await db.execute(
-        select(memory_model.Memory).filter(
-            memory_model.Memory.user_id == current_user.id
-        )
+    # Revalidation is answered from the per-user version row alone; the
+    # build version keeps pages cached before a deploy from being reused
+    validators = listing_validators(
+        request,
+        await get_memories_version(db, current_user.id),
+        f"html-{build_version()}",
     )
-    memories = result.scalars().all()
-    return templates.TemplateResponse(
-        "memories.html",
-        {"request": request, "memories": memories, "user": current_user},
+    if is_not_modified(request, validators):
+        return not_modified(validators)
+    # Bad cursors must fail before the streamed response commits to a 200
+    for cursor in (after, before):
+        if cursor:
+            decode_cursor(cursor)
+
+    async def load_page():
+        # Keyset pagination: one bounded, index-ordered query per page
+        return await paginate(
+            db,
+            select(Memory).filter(Memory.user_id == current_user.id),
+            Memory,
+            limit=limit,
+            after=after,
+            before=before,
+        )
+
+    # The header goes out before the query runs; the list follows
+    return StreamingResponse(
+        stream_template(
+            "memories.html",
+            {"request": request, "load_page": load_page, "user": current_user},
+        ),
+        media_type="text/html; charset=utf-8",
+        headers=validators,
     )
 
 
 # Exception handlers
-@app.exception_handler(HTTPException)
 async def http_exception_handler(request: Request, exc: HTTPException):
+    if request.url.path.startswith("/api/"):
+        return ORJSONResponse(
+            {"detail": exc.detail},
+            status_code=exc.status_code,
+            headers=getattr(exc, "headers", None),
+        )
     return templates.TemplateResponse(
         "error.html",
         {"request": request, "detail": exc.detail},
         status_code=exc.status_code,
+        headers=getattr(exc, "headers", None),
     )
+
+
+app = create_app()
@@ -0,0 +1,32 @@
+# app/models/job_model.py
+
+from datetime import datetime
+
+from sqlalchemy import JSON, Column, DateTime, Index, Integer, String
+
+from app.db.base import Base
+
+
+class Job(Base):
+    """Outbox of post-write work (app/db/jobs.py).
+
+    Rows are added in the transaction of the write they follow, so the work
+    is never lost to a crash between the commit and running it, and deleted
+    once it has run.
+    """
+
+    __tablename__ = "jobs"
+    __table_args__ = (
+        # Due jobs, oldest first
+        Index("ix_jobs_run_after", "run_after"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    kind = Column(String, nullable=False)
+    payload = Column(JSON, nullable=False)
+    attempts = Column(Integer, nullable=False, default=0)
+    # Not to be taken before then: a lease while it runs, a backoff after
+    # a failure. NULL once it has failed JOBS_MAX_ATTEMPTS times.
+    run_after = Column(DateTime, nullable=True)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    last_error = Column(String, nullable=True)
@@ -0,0 +1,22 @@
+# app/models/memory_day_count_model.py
+
+from sqlalchemy import Column, Date, ForeignKey, Integer
+
+from app.db.base import Base
+
+
+class MemoryDayCount(Base):
+    """Memories per user per day, for the timeline statistics.
+
+    Kept current by every memory write, in the write's own transaction, so
+    the statistics read one row per day with entries instead of grouping
+    the user's memories.
+    """
+
+    __tablename__ = "memory_day_counts"
+
+    user_id = Column(
+        Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True
+    )
+    day = Column(Date, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
@@ -2,19 +2,40 @@
 
 from datetime import datetime
 
-from sqlalchemy import Column, DateTime, ForeignKey, Integer, String
+from sqlalchemy import (
+    Column,
+    DateTime,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+    event,
+)
 from sqlalchemy.orm import relationship
 
 from app.db.base import Base
+from app.db.compression import CompressedText
+from app.db.search import drop_search_index, install_search_index
 
 
 class Memory(Base):
     __tablename__ = "memories"
+    __table_args__ = (
+        # Serves user_id filters and the (created_at, id) keyset ordering
+        Index("ix_memories_user_id_created_at", "user_id", "created_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String, index=True)  # Check if 'title' exists here
-    description = Column(String)
+    description = Column(CompressedText)
     created_at = Column(DateTime, default=datetime.utcnow)
     user_id = Column(Integer, ForeignKey("users.id"))
+    # Bumped on every edit; keys the rendered-fragment cache
+    version = Column(Integer, nullable=False, default=1, server_default="1")
 
     owner = relationship("User", back_populates="memories")
+
+
+# Keep the FTS5 index alongside the table wherever create_all/drop_all run
+event.listen(Memory.__table__, "after_create", install_search_index)
+event.listen(Memory.__table__, "after_drop", drop_search_index)
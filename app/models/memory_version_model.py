@@ -0,0 +1,22 @@
+# app/models/memory_version_model.py
+
+from sqlalchemy import Column, DateTime, ForeignKey, Integer
+
+from app.db.base import Base
+
+
+class MemoryVersion(Base):
+    """Per-user change marker for the memories collection.
+
+    Bumped in the same transaction as every memory write, so listings can
+    be validated (ETag / Last-Modified) with a primary-key lookup instead of
+    a query over memories.
+    """
+
+    __tablename__ = "memory_versions"
+
+    user_id = Column(
+        Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True
+    )
+    version = Column(Integer, nullable=False, default=0)
+    modified_at = Column(DateTime, nullable=True)
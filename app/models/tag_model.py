@@ -0,0 +1,50 @@
+# app/models/tag_model.py
+
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer, String
+
+from app.db.base import Base
+
+
+class Tag(Base):
+    """A user's tag, with the number of memories carrying it.
+
+    The count is kept current by every write that tags or untags a memory,
+    in the write's own transaction, so the tag cloud reads these rows
+    instead of grouping memory_tags. Tags no memory carries are deleted.
+    """
+
+    __tablename__ = "tags"
+    __table_args__ = (
+        # Name lookups, and the tag cloud in name order
+        Index("ix_tags_user_id_name", "user_id", "name", unique=True),
+    )
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(
+        Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False
+    )
+    name = Column(String, nullable=False)
+    count = Column(Integer, nullable=False, default=0)
+
+
+class MemoryTag(Base):
+    """Which memories carry which tags.
+
+    created_at is the memory's, copied here so that filtering by a tag
+    walks (tag_id, created_at, memory_id) in the same newest-first keyset
+    order as the memory listings, without touching memories.
+    """
+
+    __tablename__ = "memory_tags"
+    __table_args__ = (
+        Index("ix_memory_tags_tag_id_created_at", "tag_id", "created_at", "memory_id"),
+    )
+
+    memory_id = Column(
+        Integer, ForeignKey("memories.id", ondelete="CASCADE"), primary_key=True
+    )
+    tag_id = Column(
+        Integer, ForeignKey("tags.id", ondelete="CASCADE"), primary_key=True
+    )
+    user_id = Column(Integer, nullable=False)
+    created_at = Column(DateTime)
@@ -12,6 +12,8 @@ class User(Base):
     id = Column(Integer, primary_key=True, index=True)
     username = Column(String(50), unique=True, index=True, nullable=False)
     hashed_password = Column(String(128), nullable=False)
+    # Shard holding the user's memories; NULL for the main database
+    shard = Column(Integer, nullable=True)
     memories = relationship(
         "Memory", back_populates="owner", cascade="all, delete-orphan"
     )
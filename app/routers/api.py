@@ -0,0 +1,290 @@
+# app/routers/api.py
+
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from fastapi import (
+    APIRouter,
+    Depends,
+    Form,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+    status,
+)
+from fastapi.responses import ORJSONResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.auth import (
+    authenticate_user,
+    get_current_user,
+    get_user_db,
+    get_user_read_db,
+)
+from app.core.conditional import is_not_modified, listing_validators, not_modified
+from app.core.config import settings
+from app.core.pagination import paginate
+from app.core.ratelimit import AUTH_GUARDS
+from app.core.security import create_access_token
+from app.db.session import get_read_db
+from app.models.memory_model import Memory
+from app.models.user_model import User
+from app.schemas.memory_schema import MemoryCreate, MemoryUpdate
+from app.services import memories, similarity
+from app.services.stats import get_timeline
+from app.services.tags import get_tag_cloud, paginate_tagged, tags_for_memories
+
+# JSON API for non-browser clients. Responses are built from plain dicts
+# and encoded with orjson, without a response_model validation pass.
+router = APIRouter(prefix="/api", tags=["api"], default_response_class=ORJSONResponse)
+
+MEMORY_COLUMNS = (
+    Memory.id,
+    Memory.title,
+    Memory.description,
+    Memory.created_at,
+    Memory.user_id,
+)
+
+
+def memory_to_dict(memory, tags: List[str]) -> dict:
+    """Serialize a Memory or a row of MEMORY_COLUMNS, with its tags."""
+    return {
+        "id": memory.id,
+        "title": memory.title,
+        "description": memory.description,
+        "created_at": memory.created_at,
+        "user_id": memory.user_id,
+        "tags": tags,
+    }
+
+
+async def _memory_response(db: AsyncSession, memory) -> ORJSONResponse:
+    tags = await tags_for_memories(db, [memory.id])
+    return ORJSONResponse(memory_to_dict(memory, tags[memory.id]))
+
+
+def _not_found() -> HTTPException:
+    return HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not found.")
+
+
+@router.post("/token", dependencies=AUTH_GUARDS)
+async def issue_token(
+    username: str = Form(...),
+    password: str = Form(...),
+    db: AsyncSession = Depends(get_read_db),
+):
+    user = await authenticate_user(db, username, password)
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Incorrect username or password",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+    token = create_access_token(data={"sub": str(user.id)}, expires_delta=expires)
+    return ORJSONResponse(
+        {
+            "access_token": token,
+            "token_type": "bearer",
+            "expires_in": int(expires.total_seconds()),
+        }
+    )
+
+
+@router.get("/memories")
+async def list_memories(
+    request: Request,
+    limit: Optional[int] = Query(None, ge=1),
+    after: Optional[str] = None,
+    before: Optional[str] = None,
+    tags: Optional[str] = Query(None, description="Comma-separated tag names"),
+    match: str = Query("all", pattern="^(all|any)$"),
+    db: AsyncSession = Depends(get_user_read_db),
+    current_user: User = Depends(get_current_user),
+):
+    names = [name for name in (tags or "").split(",") if name.strip()]
+    if len(names) > settings.TAGS_MAX_PER_FILTER:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Filter by at most {settings.TAGS_MAX_PER_FILTER} tags.",
+        )
+    validators = listing_validators(
+        request, await memories.get_memories_version(db, current_user.id), "json"
+    )
+    if is_not_modified(request, validators):
+        return not_modified(validators)
+    # Selecting columns skips ORM identity-map bookkeeping for the page
+    stmt = select(*MEMORY_COLUMNS).filter(Memory.user_id == current_user.id)
+    if names:
+        page = await paginate_tagged(
+            db,
+            stmt,
+            current_user.id,
+            names,
+            match_all=match == "all",
+            limit=limit,
+            after=after,
+            before=before,
+        )
+    else:
+        page = await paginate(
+            db, stmt, Memory, limit=limit, after=after, before=before, scalars=False
+        )
+    page_tags = await tags_for_memories(db, [row.id for row in page.items])
+    return ORJSONResponse(
+        {
+            "items": [memory_to_dict(row, page_tags[row.id]) for row in page.items],
+            "next_cursor": page.next_cursor,
+            "prev_cursor": page.prev_cursor,
+            "limit": page.limit,
+        },
+        headers=validators,
+    )
+
+
+@router.get("/stats")
+async def timeline_stats(
+    request: Request,
+    db: AsyncSession = Depends(get_user_read_db),
+    current_user: User = Depends(get_current_user),
+):
+    """Entries per day, month and year, and streaks, for a calendar heatmap."""
+    today = datetime.utcnow().date()
+    # Streaks depend on the date as well as on the memories
+    validators = listing_validators(
+        request,
+        await memories.get_memories_version(db, current_user.id),
+        f"stats-{today}",
+    )
+    if is_not_modified(request, validators):
+        return not_modified(validators)
+    timeline = await get_timeline(db, current_user.id, today)
+    return ORJSONResponse(timeline, headers=validators)
+
+
+@router.get("/tags")
+async def list_tags(
+    request: Request,
+    db: AsyncSession = Depends(get_user_read_db),
+    current_user: User = Depends(get_current_user),
+):
+    """The user's tags with their memory counts, for a tag cloud."""
+    validators = listing_validators(
+        request, await memories.get_memories_version(db, current_user.id), "tags"
+    )
+    if is_not_modified(request, validators):
+        return not_modified(validators)
+    cloud = await get_tag_cloud(db, current_user.id)
+    return ORJSONResponse({"items": cloud}, headers=validators)
+
+
+@router.post("/memories", status_code=status.HTTP_201_CREATED)
+async def create_memory(
+    payload: MemoryCreate,
+    db: AsyncSession = Depends(get_user_db),
+    current_user: User = Depends(get_current_user),
+):
+    memory = await memories.create_memory(
+        db, current_user.id, payload.title, payload.description, tags=payload.tags
+    )
+    return ORJSONResponse(
+        memory_to_dict(memory, sorted(payload.tags)),
+        status_code=status.HTTP_201_CREATED,
+    )
+
+
+@router.get("/memories/{memory_id}")
+async def get_memory(
+    memory_id: int,
+    db: AsyncSession = Depends(get_user_read_db),
+    current_user: User = Depends(get_current_user),
+):
+    memory = await memories.get_memory(db, current_user.id, memory_id)
+    if memory is None:
+        raise _not_found()
+    return await _memory_response(db, memory)
+
+
+@router.get("/memories/{memory_id}/related")
+async def related_memories(
+    request: Request,
+    memory_id: int,
+    k: int = Query(5, ge=1),
+    db: AsyncSession = Depends(get_user_read_db),
+    current_user: User = Depends(get_current_user),
+):
+    """The user's memories most similar in wording to this one."""
+    if not settings.SIMILARITY_ENABLED:
+        raise _not_found()
+    # The index follows writes from a job that runs after their commit, so
+    # the version alone would tag results from before the job as current.
+    # The file's state is taken before the query, so a tag never claims a
+    # newer index than its results came from.
+    validators = listing_validators(
+        request,
+        await memories.get_memories_version(db, current_user.id),
+        f"related-{memory_id}-{similarity.index_version(current_user.id)}",
+    )
+    if is_not_modified(request, validators):
+        return not_modified(validators)
+    memory = await memories.get_memory(db, current_user.id, memory_id)
+    if memory is None:
+        raise _not_found()
+    k = min(k, settings.SIMILARITY_MAX_RESULTS)
+    (scored,) = await similarity.related_memories(db, current_user.id, [memory], k)
+    scores = dict(scored)
+    rows = (
+        await db.execute(
+            select(Memory.id, Memory.title, Memory.created_at).filter(
+                Memory.user_id == current_user.id, Memory.id.in_(list(scores))
+            )
+        )
+    ).all()
+    # The index may still list memories deleted since
+    rows = sorted(rows, key=lambda row: scores[row.id], reverse=True)
+    return ORJSONResponse(
+        {
+            "items": [
+                {
+                    "id": row.id,
+                    "title": row.title,
+                    "created_at": row.created_at,
+                    "score": round(scores[row.id], 4),
+                }
+                for row in rows
+            ]
+        },
+        headers=validators,
+    )
+
+
+@router.patch("/memories/{memory_id}")
+async def update_memory(
+    memory_id: int,
+    payload: MemoryUpdate,
+    db: AsyncSession = Depends(get_user_db),
+    current_user: User = Depends(get_current_user),
+):
+    memory = await memories.get_memory(db, current_user.id, memory_id)
+    if memory is None:
+        raise _not_found()
+    memory = await memories.update_memory(
+        db, memory, payload.model_dump(exclude_unset=True)
+    )
+    return await _memory_response(db, memory)
+
+
+@router.delete("/memories/{memory_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_memory(
+    memory_id: int,
+    db: AsyncSession = Depends(get_user_db),
+    current_user: User = Depends(get_current_user),
+):
+    memory = await memories.get_memory(db, current_user.id, memory_id)
+    if memory is None:
+        raise _not_found()
+    await memories.delete_memory(db, memory)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
@@ -1,15 +1,26 @@
 # app/routers/memory.py
 
-from fastapi import APIRouter, Depends, Form, HTTPException, Request, status
-from fastapi.responses import RedirectResponse
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Form, HTTPException, Query, Request, status
+from fastapi.responses import (
+    HTMLResponse,
+    JSONResponse,
+    RedirectResponse,
+    StreamingResponse,
+)
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 
-from app.auth import get_current_user
-from app.db.session import get_db
-from app.models.memory_model import Memory
+from app.auth import get_current_user, get_user_db, get_user_read_db
+from app.core.config import settings
+from app.core.pagination import decode_cursor
+from app.db.search import search_memories
 from app.models.user_model import User
 from app.schemas.memory_schema import MemoryCreate
+from app.services import memories, memory_export
+from app.services.memory_import import FORMATS, detect_format, import_memories
+from app.templates import templates
 
 router = APIRouter(prefix="/memories", tags=["memories"])
 
@@ -19,16 +30,66 @@ async def create_memory(
     request: Request,
     title: str = Form(...),
     description: str = Form(...),
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_user_db),
     current_user: User = Depends(get_current_user),
 ):
-    new_memory = Memory(title=title, description=description, user_id=current_user.id)
-    db.add(new_memory)
     try:
-        await db.commit()
-        await db.refresh(new_memory)
+        await memories.create_memory(db, current_user.id, title, description)
     except Exception as e:
         await db.rollback()
         raise HTTPException(status_code=500, detail="Internal Server Error")
     # Redirect back to the memories page
     return RedirectResponse(url="/memories", status_code=status.HTTP_302_FOUND)
+
+
+@router.post("/import", response_class=JSONResponse)
+async def import_memories_endpoint(
+    request: Request,
+    format: Optional[str] = Query(None, pattern="^(ndjson|csv)$"),
+    db: AsyncSession = Depends(get_user_db),
+    current_user: User = Depends(get_current_user),
+):
+    # The body is read as a stream, never as a whole
+    fmt = format or detect_format(request.headers.get("content-type"))
+    if fmt not in FORMATS:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail="Send NDJSON (application/x-ndjson) or CSV (text/csv).",
+        )
+    report = await import_memories(db, current_user.id, request.stream(), fmt)
+    return report.as_dict()
+
+
+@router.get("/export", response_class=StreamingResponse)
+async def export_memories_endpoint(
+    format: str = Query("ndjson", pattern="^(ndjson|csv|zip)$"),
+    after: Optional[str] = None,
+    db: AsyncSession = Depends(get_user_read_db),
+    current_user: User = Depends(get_current_user),
+):
+    if after:
+        # Reject a bad cursor now, while an error status can still be sent
+        decode_cursor(after)
+    media_type, filename = memory_export.FORMATS[format]
+    return StreamingResponse(
+        memory_export.export_memories(db, current_user.id, format, after=after),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@router.get("/search", response_class=HTMLResponse)
+async def search(
+    request: Request,
+    q: str = "",
+    page: int = Query(1, ge=1),
+    db: AsyncSession = Depends(get_user_read_db),
+    current_user: User = Depends(get_current_user),
+):
+    results = await search_memories(
+        db, current_user.id, q, page=page, per_page=settings.MEMORIES_PAGE_SIZE
+    )
+    return templates.TemplateResponse(
+        "search.html",
+        {"request": request, "results": results, "user": current_user},
+    )
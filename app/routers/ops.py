@@ -0,0 +1,34 @@
+# app/routers/ops.py
+
+from fastapi import APIRouter, Depends, Response, status
+from fastapi.responses import ORJSONResponse
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.metrics import registry
+from app.db.session import get_read_db
+
+# Operational endpoints for the container healthcheck and Prometheus
+router = APIRouter(tags=["ops"], include_in_schema=False)
+
+
+@router.get("/health")
+async def health(db: AsyncSession = Depends(get_read_db)):
+    try:
+        await db.execute(text("SELECT 1"))
+    except SQLAlchemyError:
+        return ORJSONResponse(
+            {"status": "unavailable", "database": "error"},
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        )
+    return ORJSONResponse({"status": "ok", "database": "ok"})
+
+
+@router.get("/metrics")
+async def metrics():
+    if not settings.METRICS_ENABLED:
+        return Response(status_code=status.HTTP_404_NOT_FOUND)
+    return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
@@ -5,30 +5,40 @@ from datetime import timedelta
 from fastapi import APIRouter, Depends, Form, HTTPException, Request, Response, status
 from fastapi.responses import HTMLResponse, RedirectResponse
 from jose import JWTError, jwt
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 
+from app.auth import authenticate_user
 from app.core.config import settings
-from app.core.security import create_access_token, hash_password, verify_password
-from app.db.session import get_db
+from app.core.principal_cache import principal_cache
+from app.core.ratelimit import AUTH_GUARDS
+from app.core.security import (
+    create_access_token,
+    hash_password_async,
+)
+from app.db.session import get_db, get_read_db, shard_for_user_id
 from app.models.user_model import User
 from app.templates import templates  # Import templates
 
 router = APIRouter(prefix="/users", tags=["users"])
 
 
-@router.post("/register", response_class=HTMLResponse)
+@router.post("/register", response_class=HTMLResponse, dependencies=AUTH_GUARDS)
 async def register(
     request: Request,
     response: Response,
     username: str = Form(...),
     password: str = Form(...),
     db: AsyncSession = Depends(get_db),
+    read_db: AsyncSession = Depends(get_read_db),
 ):
     # Check if the user already exists
     stmt = select(User).filter(User.username == username)
-    result = await db.execute(stmt)
+    result = await read_db.execute(stmt)
     existing_user = result.scalar_one_or_none()
+    # Give the connection back before the slow password hash
+    await read_db.close()
 
     if existing_user:
         # User already exists, render the register page with an error message
@@ -37,12 +47,21 @@ async def register(
         )
 
     # Hash the password and create a new user
-    hashed_password = hash_password(password)
+    hashed_password = await hash_password_async(password)
     new_user = User(username=username, hashed_password=hashed_password)
     db.add(new_user)
     try:
+        # The id decides the shard, so place the user once it is assigned
+        await db.flush()
+        new_user.shard = shard_for_user_id(new_user.id)
         await db.commit()
         await db.refresh(new_user)
+    except IntegrityError:
+        # Registered concurrently by another request since the check above
+        await db.rollback()
+        return templates.TemplateResponse(
+            "register.html", {"request": request, "message": "User already exists"}
+        )
     except Exception as e:
         await db.rollback()
         raise HTTPException(status_code=500, detail="Internal Server Error")
@@ -51,20 +70,16 @@ async def register(
     return RedirectResponse(url="/users/login", status_code=status.HTTP_302_FOUND)
 
 
-@router.post("/login")
+@router.post("/login", dependencies=AUTH_GUARDS)
 async def login(
     request: Request,
     username: str = Form(...),
     password: str = Form(...),
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
 ):
-    # Retrieve user by username
-    stmt = select(User).filter(User.username == username)
-    result = await db.execute(stmt)
-    user = result.scalar_one_or_none()
-
-    # Verify the password
-    if not user or not verify_password(password, user.hashed_password):
+    # Retrieve the user and verify the password
+    user = await authenticate_user(db, username, password)
+    if user is None:
         # Invalid credentials, render the login page with an error message
         return templates.TemplateResponse(
             "login.html",
@@ -92,7 +107,12 @@ async def login(
 
 
 @router.get("/logout")
-async def logout(response: Response):
+async def logout(request: Request, response: Response):
+    # Forget the cached principal for this token
+    token = request.cookies.get("access_token")
+    if token:
+        await principal_cache.invalidate_token(token.partition(" ")[2])
+
     # Clear the access token cookie
     response = RedirectResponse(url="/", status_code=status.HTTP_302_FOUND)
     response.delete_cookie(key="access_token")
@@ -1,8 +1,12 @@
 # app/schemas/memory_schema.py
 
 from datetime import datetime
+from typing import List, Optional
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, constr, field_validator
+
+from app.core.config import settings
+from app.services.tags import normalize_tags
 
 
 class MemoryBase(BaseModel):
@@ -10,8 +14,38 @@ class MemoryBase(BaseModel):
     description: str
 
 
+def _validate_tags(value: Optional[List[str]]) -> Optional[List[str]]:
+    if value is None:
+        return value
+    tags = normalize_tags(value)
+    if len(tags) > settings.TAGS_MAX_PER_MEMORY:
+        raise ValueError(f"A memory has at most {settings.TAGS_MAX_PER_MEMORY} tags.")
+    return tags
+
+
 class MemoryCreate(MemoryBase):
-    pass
+    title: constr(min_length=1)
+    description: constr(min_length=1)
+    tags: List[str] = Field(default_factory=list)
+
+    _tags = field_validator("tags")(_validate_tags)
+
+
+class MemoryUpdate(BaseModel):
+    # Omitted fields are left unchanged; explicit nulls are rejected
+    title: constr(min_length=1) = None
+    description: constr(min_length=1) = None
+    # The complete new set of tags; [] removes them all
+    tags: List[str] = None
+
+    _tags = field_validator("tags")(_validate_tags)
+
+
+class MemoryImport(MemoryBase):
+    title: constr(min_length=1)
+    description: constr(min_length=1)
+    # Entries migrated from other apps keep their original date
+    created_at: Optional[datetime] = None
 
 
 class MemoryResponse(MemoryBase):
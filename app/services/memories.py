@@ -0,0 +1,164 @@
+# app/services/memories.py
+#
+# Write paths for memories, shared by the HTML form routes and the JSON API
+# so that anything derived from a write happens the same way for both.
+
+from datetime import datetime
+from typing import List, Optional
+
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy.orm import sessionmaker
+
+from app.core.config import settings
+from app.db.group_commit import GroupCommitter
+from app.db.session import next_shard_id
+from app.models.memory_model import Memory
+from app.models.memory_version_model import MemoryVersion
+from app.services import similarity
+from app.services.stats import record_memory_days
+from app.services.tags import set_memory_tags, stage_new_memory_tags
+from app.templates import evict_memory
+
+
+async def get_memories_version(db: AsyncSession, user_id: int) -> MemoryVersion:
+    """The user's change marker; version 0 if they never wrote anything."""
+    result = await db.execute(
+        select(MemoryVersion).filter(MemoryVersion.user_id == user_id)
+    )
+    return result.scalar_one_or_none() or MemoryVersion(user_id=user_id, version=0)
+
+
+async def bump_memories_version(db: AsyncSession, user_id: int) -> None:
+    """Record a change to the user's memories; call before committing."""
+    now = datetime.utcnow()
+    stmt = insert(MemoryVersion).values(user_id=user_id, version=1, modified_at=now)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[MemoryVersion.user_id],
+        set_={"version": MemoryVersion.version + 1, "modified_at": now},
+    )
+    await db.execute(stmt)
+
+
+async def get_memory(
+    db: AsyncSession, user_id: int, memory_id: int
+) -> Optional[Memory]:
+    result = await db.execute(
+        select(Memory).filter(Memory.id == memory_id, Memory.user_id == user_id)
+    )
+    return result.scalar_one_or_none()
+
+
+async def stage_memory(
+    db: AsyncSession,
+    user_id: int,
+    title: str,
+    description: str,
+    created_at: Optional[datetime] = None,
+    tags: Optional[List[str]] = None,
+) -> Memory:
+    """Add a new memory and everything derived from it to the session,
+    without committing."""
+    # created_at is set here rather than by the column default, so the
+    # returned object is complete without a refresh SELECT after commit
+    memory = Memory(
+        id=next_shard_id(db, Memory.id),
+        title=title,
+        description=description,
+        user_id=user_id,
+        created_at=created_at or datetime.utcnow(),
+        version=1,
+    )
+    db.add(memory)
+    await bump_memories_version(db, user_id)
+    await record_memory_days(db, user_id, {memory.created_at.date(): 1})
+    if tags:
+        await stage_new_memory_tags(db, memory, tags)
+    await similarity.stage_index_update(db, memory)
+    return memory
+
+
+async def _stage_payload(db: AsyncSession, payload: dict) -> Memory:
+    return await stage_memory(db, **payload)
+
+
+# Writers for GROUP_COMMIT_ENABLED, one per database (engine) written to
+memory_writers = {}
+
+
+def memory_writer_for(db: AsyncSession) -> GroupCommitter:
+    writer = memory_writers.get(db.bind)
+    if writer is None:
+        writer = memory_writers[db.bind] = GroupCommitter(
+            sessionmaker(
+                bind=db.bind,
+                class_=AsyncSession,
+                expire_on_commit=False,
+                info=dict(db.info),
+            ),
+            _stage_payload,
+            max_batch=settings.GROUP_COMMIT_MAX_BATCH,
+            max_delay=settings.GROUP_COMMIT_MAX_DELAY_MS / 1000,
+        )
+    return writer
+
+
+async def stop_memory_writers() -> None:
+    for writer in memory_writers.values():
+        await writer.stop()
+
+
+async def create_memory(
+    db: AsyncSession,
+    user_id: int,
+    title: str,
+    description: str,
+    created_at: Optional[datetime] = None,
+    tags: Optional[List[str]] = None,
+) -> Memory:
+    if settings.GROUP_COMMIT_ENABLED:
+        # Don't hold a write-pool connection while the writer needs one;
+        # nothing was written through this session, so the commit is free
+        await db.commit()
+        return await memory_writer_for(db).submit(
+            {
+                "user_id": user_id,
+                "title": title,
+                "description": description,
+                "created_at": created_at,
+                "tags": tags,
+            }
+        )
+    memory = await stage_memory(db, user_id, title, description, created_at, tags)
+    await db.commit()
+    return memory
+
+
+async def update_memory(db: AsyncSession, memory: Memory, changes: dict) -> Memory:
+    """Apply `changes` (column values, and optionally "tags", the new set
+    of tag names) to a memory."""
+    evict_memory(memory)
+    changes = dict(changes)
+    tags = changes.pop("tags", None)
+    if tags is not None:
+        await set_memory_tags(db, memory, tags)
+    for key, value in changes.items():
+        setattr(memory, key, value)
+    memory.version += 1
+    await bump_memories_version(db, memory.user_id)
+    if "title" in changes or "description" in changes:
+        await similarity.stage_index_update(db, memory)
+    await db.commit()
+    return memory
+
+
+async def delete_memory(db: AsyncSession, memory: Memory) -> None:
+    evict_memory(memory)
+    await set_memory_tags(db, memory, [])
+    await db.delete(memory)
+    await bump_memories_version(db, memory.user_id)
+    if memory.created_at is not None:
+        await record_memory_days(db, memory.user_id, {memory.created_at.date(): -1})
+    await similarity.stage_index_update(db, memory)
+    await db.commit()
@@ -0,0 +1,119 @@
+# app/services/memory_export.py
+
+import csv
+import io
+import json
+import zipfile
+from typing import AsyncIterator, Optional
+
+from sqlalchemy import select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.pagination import decode_cursor, encode_cursor
+from app.models.memory_model import Memory
+
+FORMATS = {
+    "ndjson": ("application/x-ndjson", "memories.ndjson"),
+    "csv": ("text/csv; charset=utf-8", "memories.csv"),
+    "zip": ("application/zip", "memories.zip"),
+}
+CSV_FIELDS = ["id", "title", "description", "created_at", "cursor"]
+
+
+async def iter_memory_batches(
+    db: AsyncSession, user_id: int, after: Optional[str] = None
+) -> AsyncIterator[list]:
+    """Yield a user's memories oldest first, in batches, from a DB cursor.
+
+    Rows are read with yield_per through a server-side cursor, so only one
+    batch is held in memory however large the diary is. `after` resumes
+    an interrupted export from the `cursor` of the last row received.
+    """
+    stmt = select(Memory.id, Memory.title, Memory.description, Memory.created_at)
+    stmt = stmt.filter(Memory.user_id == user_id)
+    if after:
+        stmt = stmt.filter(
+            tuple_(Memory.created_at, Memory.id) > tuple_(*decode_cursor(after))
+        )
+    stmt = stmt.order_by(Memory.created_at.asc(), Memory.id.asc())
+    result = await db.stream(
+        stmt.execution_options(yield_per=settings.EXPORT_BATCH_SIZE)
+    )
+    async for partition in result.partitions():
+        yield [
+            {
+                "id": row.id,
+                "title": row.title,
+                "description": row.description,
+                "created_at": row.created_at.isoformat(),
+                "cursor": encode_cursor(row.created_at, row.id),
+            }
+            for row in partition
+        ]
+
+
+def _ndjson(records: list) -> bytes:
+    return "".join(json.dumps(record) + "\n" for record in records).encode()
+
+
+async def export_ndjson(batches: AsyncIterator[list]) -> AsyncIterator[bytes]:
+    async for records in batches:
+        yield _ndjson(records)
+
+
+async def export_csv(batches: AsyncIterator[list]) -> AsyncIterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=CSV_FIELDS)
+    writer.writeheader()
+    async for records in batches:
+        writer.writerows(records)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only, unseekable file that hands written bytes back as chunks.
+
+    zipfile falls back to data descriptors on unseekable output, which lets
+    the archive be produced front to back without a temporary file.
+    """
+
+    def __init__(self):
+        self.chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+async def export_zip(batches: AsyncIterator[list]) -> AsyncIterator[bytes]:
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        with archive.open("memories.ndjson", "w", force_zip64=True) as entry:
+            async for records in batches:
+                entry.write(_ndjson(records))
+                data = sink.drain()
+                if data:
+                    yield data
+    yield sink.drain()
+
+
+EXPORTERS = {"ndjson": export_ndjson, "csv": export_csv, "zip": export_zip}
+
+
+def export_memories(
+    db: AsyncSession, user_id: int, fmt: str, after: Optional[str] = None
+) -> AsyncIterator[bytes]:
+    return EXPORTERS[fmt](iter_memory_batches(db, user_id, after))
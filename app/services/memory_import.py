@@ -0,0 +1,226 @@
+# app/services/memory_import.py
+
+import codecs
+import csv
+import json
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import AsyncIterator, List, Optional
+
+from pydantic import ValidationError
+from sqlalchemy import insert
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.db.session import next_shard_id
+from app.models.memory_model import Memory
+from app.schemas.memory_schema import MemoryImport
+from app.services import similarity
+from app.services.memories import bump_memories_version
+from app.services.stats import record_memory_days
+
+FORMATS = ("ndjson", "csv")
+
+
+@dataclass
+class ImportReport:
+    imported: int = 0
+    failed: int = 0
+    errors: List[dict] = field(default_factory=list)
+    errors_truncated: bool = False
+
+    def add_error(self, line: int, error: str):
+        self.failed += 1
+        if len(self.errors) < settings.IMPORT_MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line, "error": error})
+        else:
+            self.errors_truncated = True
+
+    def as_dict(self) -> dict:
+        return {
+            "imported": self.imported,
+            "failed": self.failed,
+            "errors": self.errors,
+            "errors_truncated": self.errors_truncated,
+        }
+
+
+def detect_format(content_type: Optional[str]) -> Optional[str]:
+    content_type = (content_type or "").split(";")[0].strip().lower()
+    if content_type in ("text/csv", "application/csv"):
+        return "csv"
+    if content_type in (
+        "application/x-ndjson",
+        "application/ndjson",
+        "application/jsonl",
+        "application/json-lines",
+    ):
+        return "ndjson"
+    return None
+
+
+async def iter_lines(chunks: AsyncIterator[bytes], max_line_length: int):
+    """Split a byte stream into text lines without buffering the stream.
+
+    A line longer than `max_line_length` is dropped and reported as None, so
+    memory stays bounded whatever the client sends.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    buffer = ""
+    oversized = False
+    async for chunk in chunks:
+        buffer += decoder.decode(chunk)
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            if oversized:
+                oversized = False
+                yield None
+            else:
+                yield line.rstrip("\r")
+        if len(buffer) > max_line_length:
+            oversized, buffer = True, ""
+    buffer += decoder.decode(b"", final=True)
+    if oversized:
+        yield None
+    elif buffer:
+        yield buffer.rstrip("\r")
+
+
+async def iter_ndjson_records(lines):
+    """Yield (line number, dict or error message) for each non-blank line."""
+    line_no = 0
+    async for line in lines:
+        line_no += 1
+        if line is None:
+            yield line_no, "Line is too long."
+            continue
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            yield line_no, "Invalid JSON."
+            continue
+        if not isinstance(record, dict):
+            yield line_no, "Expected a JSON object."
+            continue
+        yield line_no, record
+
+
+async def iter_csv_records(lines):
+    """Yield (line number, dict or error message) for each CSV record.
+
+    The first record is the header. Quoted fields may span lines; a record
+    is complete once its quotes are balanced.
+    """
+    header = None
+    pending, start, line_no = [], 0, 0
+    async for line in lines:
+        line_no += 1
+        if line is None:
+            pending = []
+            yield line_no, "Line is too long."
+            continue
+        if not pending:
+            if not line.strip():
+                continue
+            start = line_no
+        pending.append(line)
+        text = "\n".join(pending)
+        if text.count('"') % 2:
+            if len(text) > settings.IMPORT_MAX_LINE_LENGTH:
+                pending = []
+                yield start, "Record is too long."
+            continue
+        pending = []
+        values = next(csv.reader([text]))
+        if header is None:
+            header = [name.strip().lower() for name in values]
+            continue
+        if len(values) != len(header):
+            yield start, f"Expected {len(header)} fields, got {len(values)}."
+            continue
+        yield start, dict(zip(header, values))
+    if pending:
+        yield start, "Unterminated quoted field."
+
+
+async def import_memories(
+    db: AsyncSession,
+    user_id: int,
+    chunks: AsyncIterator[bytes],
+    fmt: str,
+    batch_size: Optional[int] = None,
+) -> ImportReport:
+    """Validate and insert memories from an NDJSON or CSV byte stream.
+
+    Rows are written with one executemany per batch and each batch commits
+    on its own, so a large import never holds the write lock for long and
+    memory use does not grow with the size of the upload.
+    """
+    batch_size = batch_size or settings.IMPORT_BATCH_SIZE
+    parse = iter_csv_records if fmt == "csv" else iter_ndjson_records
+    lines = iter_lines(chunks, settings.IMPORT_MAX_LINE_LENGTH)
+    report = ImportReport()
+    batch, batch_lines = [], []
+
+    async def flush():
+        try:
+            stmt = insert(Memory)
+            memory_id = next_shard_id(db, Memory.id)
+            if memory_id is not None:
+                stmt = stmt.values(id=memory_id)
+            await db.execute(stmt, batch)
+            await bump_memories_version(db, user_id)
+            await record_memory_days(
+                db, user_id, Counter(row["created_at"].date() for row in batch)
+            )
+            await db.commit()
+            report.imported += len(batch)
+        except SQLAlchemyError:
+            await db.rollback()
+            for line in batch_lines:
+                report.add_error(line, "Could not be stored.")
+        batch.clear()
+        batch_lines.clear()
+
+    async for line_no, record in parse(lines):
+        if isinstance(record, str):
+            report.add_error(line_no, record)
+            continue
+        try:
+            memory = MemoryImport.model_validate(
+                {key: value for key, value in record.items() if value != ""}
+            )
+        except ValidationError as e:
+            report.add_error(
+                line_no,
+                "; ".join(
+                    f"{'.'.join(map(str, err['loc']))}: {err['msg']}"
+                    for err in e.errors()
+                ),
+            )
+            continue
+        created_at = memory.created_at or datetime.utcnow()
+        if created_at.tzinfo is not None:
+            # Stored timestamps are naive UTC, like datetime.utcnow()
+            created_at = created_at.astimezone(timezone.utc).replace(tzinfo=None)
+        batch.append(
+            {
+                "title": memory.title,
+                "description": memory.description,
+                "created_at": created_at,
+                "user_id": user_id,
+            }
+        )
+        batch_lines.append(line_no)
+        if len(batch) >= batch_size:
+            await flush()
+    if batch:
+        await flush()
+    if report.imported:
+        # The rows were not recorded one by one
+        await similarity.discard_index(user_id)
+    return report
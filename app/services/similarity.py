@@ -0,0 +1,434 @@
+# app/services/similarity.py
+#
+# "Related memories". Each memory is a vector of its words and word pairs,
+# hashed into SIMILARITY_DIMENSIONS signed buckets (title words count
+# double). A user's vectors sit in one NumPy matrix, and related memories
+# are the best IDF-weighted cosine scores against it, for a whole batch of
+# queries in one matrix product.
+#
+# Indexes persist as one append-only file of (id, vector) records per user.
+# Writes append a record (a zero vector deletes) from a background job, so
+# every worker can pick up the others' writes by reading the file's tail;
+# once most of a file's records are superseded, it is rewritten with the
+# live ones. A missing file is built from the database on first use; writes
+# that bypass the records (bulk import) remove the file so that happens.
+#
+# Builds, appends, rewrites and removals of a file take an flock on its
+# ".lock" file, so they exclude each other across processes. A build reads
+# the database only once it holds the lock, so a write it does not see
+# appends its record after the new file is in place.
+
+import asyncio
+import fcntl
+import os
+import re
+import threading
+import zlib
+from contextlib import contextmanager
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.core.cache import LRUCache
+from app.core.config import settings
+from app.db.jobs import job_handler, stage_job
+from app.models.memory_model import Memory
+
+BUILD_BATCH_SIZE = 1000
+TITLE_WEIGHT = 2
+# Share of the index that must be added or removed before the IDF weights
+# (and with them every row's norm) are recomputed
+REWEIGHT_FRACTION = 0.01
+# Share of a file's records that must be superseded or deleted before it is
+# rewritten with only the live ones, for files of at least COMPACT_MIN_RECORDS
+COMPACT_FRACTION = 0.5
+COMPACT_MIN_RECORDS = 1024
+
+_WORD = re.compile(r"\w+")
+
+# Loaded indexes by user id; the first load of a user serializes with others
+indexes = LRUCache(
+    maxsize=4096,
+    maxweight=settings.SIMILARITY_CACHE_MAX_BYTES,
+    weigh=lambda index: index.nbytes,
+)
+_load_lock = asyncio.Lock()
+
+
+def _record_dtype(dimensions: int) -> np.dtype:
+    return np.dtype([("id", "<i8"), ("vector", "<f4", (dimensions,))])
+
+
+def _hashes(text: str) -> List[int]:
+    words = _WORD.findall(text.lower())
+    grams = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+    return [zlib.crc32(gram.encode()) for gram in grams]
+
+
+def vectorize(title: str, description: str, dimensions: int) -> np.ndarray:
+    """The hashed term-frequency vector of one memory."""
+    vector = np.zeros(dimensions, dtype=np.float32)
+    hashes = _hashes(title or "") * TITLE_WEIGHT + _hashes(description or "")
+    if not hashes:
+        return vector
+    keys, counts = np.unique(np.array(hashes, dtype=np.uint32), return_counts=True)
+    # The top bit signs the term, so colliding terms tend to cancel out
+    signs = np.where(keys & 0x80000000, -1.0, 1.0)
+    np.add.at(vector, keys % dimensions, signs * (1.0 + np.log(counts)))
+    return vector
+
+
+def _records(rows: Iterable[Tuple[int, str, str]], dimensions: int) -> np.ndarray:
+    rows = list(rows)
+    records = np.zeros(len(rows), dtype=_record_dtype(dimensions))
+    for i, (memory_id, title, description) in enumerate(rows):
+        records[i] = (memory_id, vectorize(title, description, dimensions))
+    return records
+
+
+def index_path(user_id: int, dimensions: Optional[int] = None) -> str:
+    dimensions = dimensions or settings.SIMILARITY_DIMENSIONS
+    return os.path.join(
+        settings.SIMILARITY_INDEX_DIR, f"user{user_id}-d{dimensions}.vec"
+    )
+
+
+def _lock(path: str) -> int:
+    """Take the writers' lock of an index file; closing the returned file
+    descriptor releases it."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    fd = os.open(f"{path}.lock", os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+    except BaseException:
+        os.close(fd)
+        raise
+    return fd
+
+
+@contextmanager
+def _locked(path: str):
+    fd = _lock(path)
+    try:
+        yield
+    finally:
+        os.close(fd)
+
+
+class SimilarityIndex:
+    """One user's vectors, following the records of their index file."""
+
+    def __init__(self, path: str, dimensions: int):
+        self.path = path
+        self.dimensions = dimensions
+        self.dtype = _record_dtype(dimensions)
+        self.lock = threading.Lock()
+        self._reset()
+
+    def _reset(self) -> None:
+        self.size = 0
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.vectors = np.zeros((0, self.dimensions), dtype=np.float32)
+        self.rows = {}
+        self.df = np.zeros(self.dimensions, dtype=np.int64)
+        self.norms = np.zeros(0, dtype=np.float32)
+        self._weights = None
+        self._weighted_size = 0
+        self._offset = 0
+        self._inode = None
+
+    @property
+    def nbytes(self) -> int:
+        return self.ids.nbytes + self.vectors.nbytes + self.norms.nbytes
+
+    @property
+    def needs_compaction(self) -> bool:
+        records = self._offset // self.dtype.itemsize
+        return (
+            records >= COMPACT_MIN_RECORDS
+            and records - self.size >= records * COMPACT_FRACTION
+        )
+
+    def compact(self) -> None:
+        """Rewrite the file with one record per live memory."""
+        with _locked(self.path):
+            # Under the lock nothing is appended until the new file is in
+            if not self.refresh() or not self.needs_compaction:
+                return
+            with self.lock:
+                records = np.zeros(self.size, dtype=self.dtype)
+                records["id"] = self.ids[: self.size]
+                records["vector"] = self.vectors[: self.size]
+                _write_file(self.path, records)
+                # Already holding exactly what the new file does
+                stat = os.stat(self.path)
+                self._inode, self._offset = stat.st_ino, stat.st_size
+
+    def refresh(self) -> bool:
+        """Apply records appended since the last call; False once the file
+        is gone."""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return False
+        with self.lock:
+            if stat.st_ino != self._inode or stat.st_size < self._offset:
+                # Rebuilt or replaced: start over
+                self._reset()
+                self._inode = stat.st_ino
+            end = stat.st_size - stat.st_size % self.dtype.itemsize
+            if end > self._offset:
+                with open(self.path, "rb") as f:
+                    f.seek(self._offset)
+                    count = (end - self._offset) // self.dtype.itemsize
+                    self._apply(np.fromfile(f, dtype=self.dtype, count=count))
+                self._offset = end
+        return True
+
+    def _apply(self, records: np.ndarray) -> None:
+        if not self.size:
+            # Whole file: keep each id's last record, then drop deletions
+            reverse_ids = records["id"][::-1]
+            _, last = np.unique(reverse_ids, return_index=True)
+            keep = np.sort(len(records) - 1 - last)
+            keep = keep[np.any(records["vector"][keep] != 0, axis=1)]
+            self.ids = records["id"][keep].copy()
+            self.vectors = records["vector"][keep].copy()
+            self.size = len(keep)
+            self.rows = {
+                memory_id: row for row, memory_id in enumerate(self.ids.tolist())
+            }
+            self.df = np.count_nonzero(self.vectors, axis=0).astype(np.int64)
+            self.norms = np.zeros(self.size, dtype=np.float32)
+            self._weights = None
+        else:
+            for memory_id, vector in zip(records["id"].tolist(), records["vector"]):
+                self._set(memory_id, vector)
+
+    def _set(self, memory_id: int, vector: np.ndarray) -> None:
+        row = self.rows.get(memory_id)
+        if row is not None:
+            self.df -= self.vectors[row] != 0
+        if not vector.any():
+            if row is not None:
+                # Move the last row into the gap
+                last = self.size - 1
+                moved = int(self.ids[last])
+                self.ids[row], self.vectors[row] = moved, self.vectors[last]
+                self.norms[row] = self.norms[last]
+                self.rows[moved] = row
+                del self.rows[memory_id]
+                self.size = last
+            return
+        if row is None:
+            if self.size == len(self.ids):
+                capacity = max(16, 2 * self.size)
+                self.ids = np.resize(self.ids, capacity)
+                self.norms = np.resize(self.norms, capacity)
+                vectors = np.zeros((capacity, self.dimensions), dtype=np.float32)
+                vectors[: self.size] = self.vectors[: self.size]
+                self.vectors = vectors
+            row = self.rows[memory_id] = self.size
+            self.ids[row] = memory_id
+            self.size += 1
+        self.vectors[row] = vector
+        self.df += vector != 0
+        if self._weights is not None:
+            self.norms[row] = np.sqrt(np.dot(vector * vector, self._weights))
+
+    def _reweight(self) -> None:
+        # Until the index has changed enough, new rows are scored with the
+        # weights of the existing ones, so scores stay consistent cosines
+        # without a pass over every row per write
+        if (
+            self._weights is not None
+            and abs(self.size - self._weighted_size)
+            <= self._weighted_size * REWEIGHT_FRACTION
+        ):
+            return
+        idf = np.log((1.0 + self.size) / (1.0 + self.df)) + 1.0
+        self._weights = (idf * idf).astype(np.float32)
+        vectors = self.vectors[: self.size]
+        self.norms[: self.size] = np.sqrt(
+            np.einsum("ij,ij,j->i", vectors, vectors, self._weights)
+        )
+        self._weighted_size = self.size
+
+    def query(
+        self, queries: np.ndarray, k: int, exclude: Sequence[Optional[int]] = ()
+    ) -> List[List[Tuple[int, float]]]:
+        """The `k` best (id, score) for each row of `queries`, leaving out
+        exclude[i] (the query's own memory) for row i."""
+        with self.lock:
+            if not self.size:
+                return [[] for _ in range(len(queries))]
+            self._reweight()
+            weights = self._weights
+            # (n, m): every stored vector against every query at once
+            scores = self.vectors[: self.size] @ (queries * weights).T
+            query_norms = np.sqrt(np.einsum("ij,ij,j->i", queries, queries, weights))
+            denominator = np.outer(self.norms[: self.size], query_norms)
+            scores = np.divide(
+                scores,
+                denominator,
+                out=np.zeros_like(scores),
+                where=denominator > 0,
+            )
+            for column, memory_id in enumerate(exclude):
+                row = self.rows.get(memory_id)
+                if row is not None:
+                    scores[row, column] = -np.inf
+            ids = self.ids[: self.size].copy()
+        k = min(k, len(ids))
+        top = np.argpartition(-scores, k - 1, axis=0)[:k]
+        results = []
+        for column in range(scores.shape[1]):
+            rows = top[:, column]
+            rows = rows[np.argsort(-scores[rows, column], kind="stable")]
+            results.append(
+                [
+                    (int(ids[row]), float(scores[row, column]))
+                    for row in rows
+                    if scores[row, column] > 0
+                ]
+            )
+        return results
+
+
+def _write_file(path: str, records: np.ndarray) -> None:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    records.tofile(tmp)
+    os.replace(tmp, path)
+
+
+async def build_index(db: AsyncSession, user_id: int) -> None:
+    """Write the user's index file from their memories in the database."""
+    dimensions = settings.SIMILARITY_DIMENSIONS
+    path = index_path(user_id, dimensions)
+    chunks = [np.zeros(0, dtype=_record_dtype(dimensions))]
+    fd = await asyncio.to_thread(_lock, path)
+    try:
+        # A session of its own: `db` may be reading from a snapshot taken
+        # before the lock, which could miss writes whose appends found no
+        # file and were skipped
+        async with AsyncSession(db.bind) as snapshot:
+            result = await snapshot.stream(
+                select(Memory.id, Memory.title, Memory.description).where(
+                    Memory.user_id == user_id
+                )
+            )
+            async for rows in result.partitions(BUILD_BATCH_SIZE):
+                chunks.append(await asyncio.to_thread(_records, rows, dimensions))
+        await asyncio.to_thread(_write_file, path, np.concatenate(chunks))
+    finally:
+        os.close(fd)
+
+
+def index_version(user_id: int) -> str:
+    """A value that changes with the user's index file: on every record
+    appended, and when the file is rebuilt or removed."""
+    try:
+        stat = os.stat(index_path(user_id))
+    except FileNotFoundError:
+        return "none"
+    return f"{stat.st_ino}.{stat.st_mtime_ns}.{stat.st_size}"
+
+
+async def get_index(db: AsyncSession, user_id: int) -> SimilarityIndex:
+    """The user's index, current with every record written so far."""
+    index = indexes.get(user_id)
+    if index is None or index.path != index_path(user_id):
+        index = None
+    elif not await asyncio.to_thread(index.refresh):
+        index = None
+    if index is None:
+        async with _load_lock:
+            path = index_path(user_id)
+            if not os.path.exists(path):
+                await build_index(db, user_id)
+            index = SimilarityIndex(path, settings.SIMILARITY_DIMENSIONS)
+            await asyncio.to_thread(index.refresh)
+    if index.needs_compaction:
+        await asyncio.to_thread(index.compact)
+    indexes.set(user_id, index)
+    return index
+
+
+def _append(user_id: int, records: np.ndarray) -> None:
+    path = index_path(user_id)
+    # Waits for a build in progress, whose snapshot may predate the write
+    with _locked(path):
+        try:
+            fd = os.open(path, os.O_WRONLY | os.O_APPEND)
+        except FileNotFoundError:
+            # Not built yet; it will be, from the database, when first used
+            return
+        try:
+            os.write(fd, records.tobytes())
+        finally:
+            os.close(fd)
+
+
+async def stage_index_update(db: AsyncSession, memory: Memory) -> None:
+    """Have the user's index follow `memory`, added, changed or deleted in
+    `db`'s transaction, once that commits."""
+    if not settings.SIMILARITY_ENABLED:
+        return
+    if memory.id is None:
+        # The job needs the new memory's id
+        await db.flush()
+    await stage_job(
+        db, "similarity.sync", {"user_id": memory.user_id, "memory_id": memory.id}
+    )
+
+
+@job_handler("similarity.sync")
+async def _sync_index(source, payload: dict) -> None:
+    # The memory as it is now: the job may run long after its write, or
+    # more than once
+    async with source() as db:
+        row = (
+            await db.execute(
+                select(Memory.id, Memory.title, Memory.description).where(
+                    Memory.id == payload["memory_id"]
+                )
+            )
+        ).first()
+    dimensions = settings.SIMILARITY_DIMENSIONS
+    if row is None:
+        records = np.zeros(1, dtype=_record_dtype(dimensions))
+        records["id"] = payload["memory_id"]
+    else:
+        records = await asyncio.to_thread(_records, [tuple(row)], dimensions)
+    await asyncio.to_thread(_append, payload["user_id"], records)
+
+
+def _remove(path: str) -> None:
+    # After a build in progress, which may not have seen the change
+    with _locked(path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+async def discard_index(user_id: int) -> None:
+    """Have the user's index rebuilt from the database on next use."""
+    if settings.SIMILARITY_ENABLED:
+        indexes.delete(user_id)
+        await asyncio.to_thread(_remove, index_path(user_id))
+
+
+async def related_memories(
+    db: AsyncSession, user_id: int, memories: Sequence[Memory], k: int
+) -> List[List[Tuple[int, float]]]:
+    """For each of `memories`, the ids and scores of the user's `k` most
+    similar other memories, best first."""
+    index = await get_index(db, user_id)
+    queries = np.stack(
+        [vectorize(m.title, m.description, index.dimensions) for m in memories]
+    )
+    return await asyncio.to_thread(index.query, queries, k, [m.id for m in memories])
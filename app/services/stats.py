@@ -0,0 +1,128 @@
+# app/services/stats.py
+#
+# Timeline statistics (entries per day/month/year, streaks) from the
+# memory_day_counts summary table. The memory write paths keep it current
+# through record_memory_days; rebuild_day_counts and check_day_counts
+# recompute it from memories for maintenance.
+
+from collections import Counter
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.memory_day_count_model import MemoryDayCount
+from app.models.memory_model import Memory
+
+
+async def record_memory_days(
+    db: AsyncSession, user_id: int, deltas: Dict[date, int]
+) -> None:
+    """Add `deltas` (day -> change in memories) to the user's day counts;
+    call in the transaction of the write."""
+    deltas = {day: delta for day, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    stmt = sqlite_insert(MemoryDayCount)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[MemoryDayCount.user_id, MemoryDayCount.day],
+        set_={"count": MemoryDayCount.count + stmt.excluded.count},
+    )
+    await db.execute(
+        stmt,
+        [
+            {"user_id": user_id, "day": day, "count": delta}
+            for day, delta in deltas.items()
+        ],
+    )
+    if any(delta < 0 for delta in deltas.values()):
+        await db.execute(
+            delete(MemoryDayCount).where(
+                MemoryDayCount.user_id == user_id,
+                MemoryDayCount.day.in_(list(deltas)),
+                MemoryDayCount.count <= 0,
+            )
+        )
+
+
+def _streaks(days: List[date], today: date) -> dict:
+    longest, longest_end, run = 0, None, 0
+    for i, day in enumerate(days):
+        run = run + 1 if i and day - days[i - 1] == timedelta(days=1) else 1
+        if run > longest:
+            longest, longest_end = run, day
+    # A streak is still current until a whole day passes without an entry
+    current = run if days and today - days[-1] <= timedelta(days=1) else 0
+    return {
+        "current": current,
+        "longest": longest,
+        "longest_end": longest_end.isoformat() if longest_end else None,
+    }
+
+
+async def get_timeline(
+    db: AsyncSession, user_id: int, today: Optional[date] = None
+) -> dict:
+    """Counts per day, month and year, plus streaks, for one user."""
+    today = today or datetime.utcnow().date()
+    rows = (
+        await db.execute(
+            select(MemoryDayCount.day, MemoryDayCount.count)
+            .where(MemoryDayCount.user_id == user_id)
+            .order_by(MemoryDayCount.day)
+        )
+    ).all()
+    months, years = Counter(), Counter()
+    for day, count in rows:
+        months[f"{day.year:04d}-{day.month:02d}"] += count
+        years[day.year] += count
+    return {
+        "total": sum(years.values()),
+        "days": [{"date": day.isoformat(), "count": count} for day, count in rows],
+        "months": [{"month": key, "count": n} for key, n in months.items()],
+        "years": [{"year": key, "count": n} for key, n in years.items()],
+        "streaks": _streaks([day for day, _ in rows], today),
+    }
+
+
+def _day_counts_from_memories():
+    day = func.date(Memory.created_at)
+    return (
+        select(Memory.user_id, day.label("day"), func.count().label("count"))
+        .where(Memory.created_at.is_not(None))
+        .group_by(Memory.user_id, day)
+    )
+
+
+def rebuild_day_counts(connection: Connection) -> int:
+    """Recompute memory_day_counts from memories; returns the row count."""
+    connection.execute(delete(MemoryDayCount))
+    result = connection.execute(
+        insert(MemoryDayCount).from_select(
+            ["user_id", "day", "count"], _day_counts_from_memories()
+        )
+    )
+    return result.rowcount
+
+
+def check_day_counts(connection: Connection) -> List[Tuple[int, str, int, int]]:
+    """Days whose stored count differs from memories, as
+    (user_id, day, expected, stored)."""
+    expected = {
+        (user_id, day): count
+        for user_id, day, count in connection.execute(_day_counts_from_memories())
+    }
+    stored = {
+        (user_id, day.isoformat()): count
+        for user_id, day, count in connection.execute(
+            select(MemoryDayCount.user_id, MemoryDayCount.day, MemoryDayCount.count)
+        )
+    }
+    return sorted(
+        (user_id, day, expected.get((user_id, day), 0), stored.get((user_id, day), 0))
+        for user_id, day in expected.keys() | stored.keys()
+        if expected.get((user_id, day), 0) != stored.get((user_id, day), 0)
+    )
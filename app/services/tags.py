@@ -0,0 +1,211 @@
+# app/services/tags.py
+#
+# Tags on memories. memory_tags associates memories with the user's tags;
+# tags.count is the number of memories carrying each tag, maintained here in
+# the transaction of every write, so the tag cloud is one index range read.
+# Listings filtered by tags walk memory_tags in keyset order.
+
+from typing import Dict, Iterable, List, Optional, Sequence
+
+from sqlalchemy import delete, exists, insert, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy.orm import aliased
+from sqlalchemy.sql import Select
+
+from app.core.config import settings
+from app.core.pagination import Page, build_page, clamp_limit, order_keyset
+from app.db.session import next_shard_id
+from app.models.memory_model import Memory
+from app.models.tag_model import MemoryTag, Tag
+
+
+class _TaggedKey:
+    # The keyset columns of a listing driven from memory_tags
+    created_at = MemoryTag.created_at
+    id = MemoryTag.memory_id
+
+
+def normalize_tag(name: str) -> str:
+    """Tags compare case-insensitively and ignore a leading '#' and extra
+    whitespace: "#Road  Trip" is stored as "road trip"."""
+    return " ".join(name.strip().lstrip("#").split()).lower()
+
+
+def normalize_tags(names: Iterable[str]) -> List[str]:
+    """Normalized, de-duplicated tag names in their first-seen order;
+    raises ValueError for names that are too long."""
+    tags = []
+    for name in names:
+        tag = normalize_tag(name)
+        if len(tag) > settings.TAG_MAX_LENGTH:
+            raise ValueError(
+                f"Tags are at most {settings.TAG_MAX_LENGTH} characters long."
+            )
+        if tag and tag not in tags:
+            tags.append(tag)
+    return tags
+
+
+async def _add_tags(db: AsyncSession, memory: Memory, names: Sequence[str]) -> None:
+    tag_ids = []
+    for name in names:
+        stmt = sqlite_insert(Tag).values(
+            id=next_shard_id(db, Tag.id), user_id=memory.user_id, name=name, count=1
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Tag.user_id, Tag.name],
+            set_={"count": Tag.count + 1},
+        ).returning(Tag.id)
+        tag_ids.append((await db.execute(stmt)).scalar_one())
+    await db.execute(
+        insert(MemoryTag),
+        [
+            {
+                "memory_id": memory.id,
+                "tag_id": tag_id,
+                "user_id": memory.user_id,
+                "created_at": memory.created_at,
+            }
+            for tag_id in tag_ids
+        ],
+    )
+
+
+async def _remove_tags(db: AsyncSession, memory: Memory, tag_ids: List[int]) -> None:
+    await db.execute(
+        delete(MemoryTag).where(
+            MemoryTag.memory_id == memory.id, MemoryTag.tag_id.in_(tag_ids)
+        )
+    )
+    await db.execute(update(Tag).where(Tag.id.in_(tag_ids)).values(count=Tag.count - 1))
+    await db.execute(delete(Tag).where(Tag.id.in_(tag_ids), Tag.count <= 0))
+
+
+async def stage_new_memory_tags(
+    db: AsyncSession, memory: Memory, names: Iterable[str]
+) -> None:
+    """Tag a memory that has just been added to the session."""
+    names = normalize_tags(names)
+    if names:
+        # The associations need the memory's id
+        await db.flush()
+        await _add_tags(db, memory, names)
+
+
+async def set_memory_tags(
+    db: AsyncSession, memory: Memory, names: Iterable[str]
+) -> bool:
+    """Replace the tags of a stored memory, without committing; returns
+    whether they changed."""
+    wanted = normalize_tags(names)
+    current = dict(
+        (
+            await db.execute(
+                select(Tag.name, Tag.id)
+                .join(MemoryTag, MemoryTag.tag_id == Tag.id)
+                .where(MemoryTag.memory_id == memory.id)
+            )
+        ).all()
+    )
+    added = [name for name in wanted if name not in current]
+    removed = [tag_id for name, tag_id in current.items() if name not in wanted]
+    if removed:
+        await _remove_tags(db, memory, removed)
+    if added:
+        await _add_tags(db, memory, added)
+    return bool(added or removed)
+
+
+async def tags_for_memories(
+    db: AsyncSession, memory_ids: Sequence[int]
+) -> Dict[int, List[str]]:
+    """Tag names by memory id, sorted, for a page of memories."""
+    tags = {memory_id: [] for memory_id in memory_ids}
+    if not memory_ids:
+        return tags
+    rows = await db.execute(
+        select(MemoryTag.memory_id, Tag.name)
+        .join(Tag, Tag.id == MemoryTag.tag_id)
+        .where(MemoryTag.memory_id.in_(list(memory_ids)))
+    )
+    for memory_id, name in rows:
+        tags[memory_id].append(name)
+    for names in tags.values():
+        names.sort()
+    return tags
+
+
+async def get_tag_cloud(db: AsyncSession, user_id: int) -> List[dict]:
+    """The user's tags in name order, with how many memories carry each."""
+    rows = await db.execute(
+        select(Tag.name, Tag.count).where(Tag.user_id == user_id).order_by(Tag.name)
+    )
+    return [{"name": name, "count": count} for name, count in rows]
+
+
+async def paginate_tagged(
+    db: AsyncSession,
+    stmt: Select,
+    user_id: int,
+    names: Iterable[str],
+    match_all: bool = True,
+    limit: Optional[int] = None,
+    after: Optional[str] = None,
+    before: Optional[str] = None,
+) -> Page:
+    """Like paginate(), over the memories of `stmt` (a select of Memory
+    columns) that carry all, or with `match_all=False` any, of the tags
+    `names`. Cursors are interchangeable with unfiltered listings."""
+    limit = clamp_limit(limit)
+    names = normalize_tags(names)
+    tags = (
+        await db.execute(
+            select(Tag.id, Tag.count).where(Tag.user_id == user_id, Tag.name.in_(names))
+        )
+    ).all()
+    if not tags or (match_all and len(tags) < len(names)):
+        return build_page([], limit, after, before, False)
+
+    if match_all:
+        # Walk the rarest tag's memories in keyset order; the others are
+        # primary-key probes per candidate
+        tags.sort(key=lambda tag: tag.count)
+        others = []
+        for tag in tags[1:]:
+            other = aliased(MemoryTag)
+            others.append(
+                exists().where(
+                    other.memory_id == MemoryTag.memory_id, other.tag_id == tag.id
+                )
+            )
+        tagged = (
+            stmt.select_from(MemoryTag)
+            .join(Memory, Memory.id == MemoryTag.memory_id)
+            .where(MemoryTag.tag_id == tags[0].id, *others)
+        )
+        tagged = order_keyset(tagged, _TaggedKey, after, before)
+        rows = (await db.execute(tagged.limit(limit + 1))).all()
+        return build_page(rows[:limit], limit, after, before, len(rows) > limit)
+
+    # Any of the tags: merge one keyset range per tag, then fetch the page
+    keys = set()
+    for tag in tags:
+        ids = order_keyset(
+            select(MemoryTag.created_at, MemoryTag.memory_id).where(
+                MemoryTag.tag_id == tag.id
+            ),
+            _TaggedKey,
+            after,
+            before,
+        )
+        keys.update((await db.execute(ids.limit(limit + 1))).all())
+    keys = sorted(keys, reverse=not before)
+    memory_ids = [memory_id for _, memory_id in keys[:limit]]
+    found = {
+        row.id: row
+        for row in (await db.execute(stmt.where(Memory.id.in_(memory_ids)))).all()
+    }
+    rows = [found[memory_id] for memory_id in memory_ids if memory_id in found]
+    return build_page(rows, limit, after, before, len(keys) > limit)
@@ -1,9 +1,133 @@
 # app/templates.py
 
+import hashlib
+import json
 import os
+from functools import lru_cache
+from typing import AsyncIterator, Optional
 
 from fastapi.templating import Jinja2Templates
+from jinja2 import BytecodeCache, FileSystemBytecodeCache
+from markupsafe import Markup
+
+from app.core.assets import load_manifest, static_url
+from app.core.cache import LRUCache
+from app.core.config import settings
 
 current_dir = os.path.dirname(os.path.abspath(__file__))
 templates_dir = os.path.join(current_dir, "..", "frontend", "templates")
-templates = Jinja2Templates(directory=templates_dir)
+
+
+def _bytecode_cache(pattern: str) -> Optional[BytecodeCache]:
+    if not settings.TEMPLATES_BYTECODE_CACHE:
+        return None
+    directory = settings.TEMPLATES_BYTECODE_CACHE_DIR or None
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    return FileSystemBytecodeCache(directory, pattern)
+
+
+templates = Jinja2Templates(
+    directory=templates_dir,
+    auto_reload=settings.TEMPLATES_AUTO_RELOAD,
+    bytecode_cache=_bytecode_cache("__memories_%s.cache"),
+)
+
+# Async twin of the environment for streamed pages. Async templates compile
+# to different code, so their bytecode is kept under its own file pattern.
+async_env = templates.env.overlay(
+    enable_async=True,
+    bytecode_cache=_bytecode_cache("__memories_async_%s.cache"),
+)
+
+# Rendered memory articles: an edit bumps the version, so a stale fragment
+# can never be served, only left to age out
+fragment_cache = LRUCache(
+    maxsize=settings.FRAGMENT_CACHE_MAX_ENTRIES,
+    maxweight=settings.FRAGMENT_CACHE_MAX_BYTES,
+)
+
+
+def fragment_key(memory) -> tuple:
+    """The cache key of a memory's fragment. Ids alone are reused: deleting
+    the newest memory frees its id for the next insert, which starts over
+    at version 1, and may belong to another user. The owner and creation
+    time tell such rows apart."""
+    return (memory.id, memory.version, memory.user_id, memory.created_at)
+
+
+def render_memory(memory) -> Markup:
+    key = fragment_key(memory)
+    html = fragment_cache.get(key)
+    if html is None:
+        template = templates.get_template("partials/memory.html")
+        html = Markup(template.render(memory=memory))
+        fragment_cache.set(key, html)
+    return html
+
+
+def evict_memory(memory) -> None:
+    """Drop a memory's current fragment; called by the write paths."""
+    fragment_cache.delete(fragment_key(memory))
+
+
+templates.env.globals["render_memory"] = render_memory
+templates.env.globals["static_url"] = static_url
+
+
+@lru_cache(maxsize=None)
+def build_version() -> str:
+    """A digest of the templates and the static asset manifest, which a
+    deploy may change without any memory changing; part of the ETag of
+    rendered pages."""
+    digest = hashlib.sha1(usedforsecurity=False)
+    digest.update(json.dumps(load_manifest(), sort_keys=True).encode())
+    for name in sorted(templates.env.list_templates(extensions=["html"])):
+        source, _, _ = templates.env.loader.get_source(templates.env, name)
+        digest.update(f"{name}\0{source}\0".encode())
+    return digest.hexdigest()[:12]
+
+
+def precompile_templates() -> int:
+    """Compile every template into both environments; returns the count.
+
+    Run at startup so no request pays for parsing, and so the bytecode
+    cache is warm for workers started after this one.
+    """
+    names = templates.env.list_templates(extensions=["html"])
+    for env in (templates.env, async_env):
+        for name in names:
+            env.get_template(name)
+    return len(names)
+
+
+class _Flush:
+    """Template callable marking the output so far as ready to send."""
+
+    def __init__(self):
+        self.requested = False
+
+    def __call__(self) -> str:
+        self.requested = True
+        return ""
+
+
+async def stream_template(name: str, context: dict) -> AsyncIterator[bytes]:
+    """Render a template with the async environment, chunk by chunk.
+
+    Output is batched into TEMPLATES_STREAM_CHUNK_SIZE pieces; a
+    `{{ flush() }}` in the template sends what is buffered right away, e.g.
+    the page header before a slow query that the template awaits.
+    """
+    template = async_env.get_template(name)
+    flush = _Flush()
+    buffer, size = [], 0
+    async for chunk in template.generate_async({**context, "flush": flush}):
+        buffer.append(chunk)
+        size += len(chunk)
+        if size and (flush.requested or size >= settings.TEMPLATES_STREAM_CHUNK_SIZE):
+            yield "".join(buffer).encode()
+            buffer, size = [], 0
+        flush.requested = False
+    if buffer:
+        yield "".join(buffer).encode()
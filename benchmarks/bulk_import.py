@@ -0,0 +1,96 @@
+# benchmarks/bulk_import.py
+#
+# Streams a generated NDJSON or CSV upload of --rows memories through
+# POST /memories/import and reports throughput and peak memory.
+#
+#   python -m benchmarks.bulk_import --rows 100000 --format ndjson
+
+import argparse
+import asyncio
+import json
+import os
+import resource
+import tempfile
+import time
+import tracemalloc
+
+
+async def generate_body(rows: int, fmt: str, chunk_rows: int = 500):
+    if fmt == "csv":
+        yield b"title,description\n"
+    chunk = []
+    for i in range(rows):
+        title = f"Imported memory {i}"
+        description = f"Line {i} of a diary migrated from another app. " * 4
+        if fmt == "csv":
+            chunk.append(f'{title},"{description}"\n')
+        else:
+            chunk.append(json.dumps({"title": title, "description": description}))
+            chunk.append("\n")
+        if len(chunk) >= chunk_rows:
+            yield "".join(chunk).encode()
+            chunk = []
+    if chunk:
+        yield "".join(chunk).encode()
+
+
+async def run(args):
+    from httpx import ASGITransport, AsyncClient
+
+    from app.main import app
+
+    transport = ASGITransport(app=app)
+    async with app.router.lifespan_context(app), AsyncClient(
+        transport=transport, base_url="http://bench", timeout=None
+    ) as client:
+        credentials = {"username": "importbench", "password": "importbench123"}
+        await client.post("/users/register", data=credentials)
+        await client.post("/users/login", data=credentials)
+
+        if args.trace_memory:
+            tracemalloc.start()
+        started = time.perf_counter()
+        response = await client.post(
+            "/memories/import",
+            params={"format": args.format},
+            content=generate_body(args.rows, args.format),
+        )
+        elapsed = time.perf_counter() - started
+        if args.trace_memory:
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+    report = response.json()
+    print(
+        f"{args.format}: imported={report['imported']} failed={report['failed']} "
+        f"in {elapsed:.2f}s ({report['imported'] / elapsed:,.0f} rows/s)"
+    )
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"peak RSS {max_rss:.1f} MiB")
+    if args.trace_memory:
+        print(f"peak traced Python memory during import {peak / 2**20:.1f} MiB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--format", choices=["ndjson", "csv"], default="ndjson")
+    parser.add_argument("--batch-size", type=int, default=0)
+    parser.add_argument(
+        "--trace-memory",
+        action="store_true",
+        help="track peak Python allocations (several times slower)",
+    )
+    args = parser.parse_args()
+
+    # Configure before the app (and its settings) are imported
+    db_path = os.path.join(tempfile.mkdtemp(prefix="bulk-import-"), "bench.db")
+    os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{db_path}"
+    os.environ["SYNC_DATABASE_URL"] = f"sqlite:///{db_path}"
+    if args.batch_size:
+        os.environ["IMPORT_BATCH_SIZE"] = str(args.batch_size)
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+# benchmarks/compression.py
+#
+# Database size and description read/write latency with descriptions
+# stored plain and compressed (DESCRIPTION_COMPRESSION). Both modes write
+# the same generated diary entries into a fresh database, one committed
+# insert per entry, then read them back a page at a time.
+#
+#   python -m benchmarks.compression --rows 5000 --length 2000
+
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+from datetime import datetime
+
+from benchmarks.stats import latency_summary
+
+SENTENCES = [
+    "I woke up early and made coffee before anyone else was awake.",
+    "We walked to the park after lunch and sat by the lake for an hour.",
+    "Work was busy today, with three meetings and a deadline moved up.",
+    "My sister called in the evening and we talked about our parents.",
+    "It rained all afternoon, so I stayed inside and read my book.",
+    "I keep thinking about what she said yesterday at dinner.",
+    "The kids were tired and went to bed without much complaining.",
+    "I finally fixed the kitchen drawer that has been stuck for weeks.",
+    "Tomorrow I want to get up earlier and go for a run.",
+    "I felt anxious about the trip, but it went better than expected.",
+]
+
+
+def generate_entries(rows: int, length: int, seed: int) -> list:
+    rng = random.Random(seed)
+    entries = []
+    for i in range(rows):
+        parts, size = [f"Entry {i}."], 0
+        while size < length:
+            sentence = rng.choice(SENTENCES)
+            if rng.random() < 0.3:
+                # Some text that is not in the sentence pool
+                sentence += f" {rng.randrange(10**6)} {rng.choice(['!', '?', '.'])}"
+            parts.append(sentence)
+            size += len(sentence) + 1
+        entries.append(" ".join(parts))
+    return entries
+
+
+async def run_mode(compress: bool, entries: list, directory: str, reads: int):
+    from sqlalchemy import select
+    from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+    from sqlalchemy.orm import sessionmaker
+
+    from app.core.config import settings
+    from app.db.schema import sync_schema
+    from app.db.session import apply_engine_profile
+    from app.models.memory_model import Memory
+    from app.models.user_model import User
+
+    settings.DESCRIPTION_COMPRESSION = compress
+    path = os.path.join(directory, f"{'compressed' if compress else 'plain'}.db")
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    apply_engine_profile(engine)
+    session = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+    async with engine.begin() as connection:
+        await connection.run_sync(sync_schema)
+    async with session() as db:
+        db.add(User(id=1, username="compressbench", hashed_password="x"))
+        await db.commit()
+
+    writes = []
+    async with session() as db:
+        for i, description in enumerate(entries):
+            started = time.perf_counter()
+            db.add(
+                Memory(
+                    title=f"Entry {i}",
+                    description=description,
+                    user_id=1,
+                    created_at=datetime.utcnow(),
+                )
+            )
+            await db.commit()
+            writes.append(time.perf_counter() - started)
+
+    page = 20
+    read_latencies = []
+    async with session() as db:
+        for _ in range(reads):
+            first = random.randrange(1, max(2, len(entries) - page))
+            started = time.perf_counter()
+            result = await db.execute(
+                select(Memory.id, Memory.description)
+                .where(Memory.id >= first)
+                .order_by(Memory.id)
+                .limit(page)
+            )
+            result.all()
+            read_latencies.append(time.perf_counter() - started)
+
+    async with engine.connect() as connection:
+        await connection.exec_driver_sql("PRAGMA wal_checkpoint(TRUNCATE)")
+    await engine.dispose()
+    return {
+        "size_mib": os.path.getsize(path) / 2**20,
+        "write": latency_summary(writes),
+        "read": latency_summary(read_latencies),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--length", type=int, default=2000, help="chars per entry")
+    parser.add_argument("--reads", type=int, default=2000, help="pages read")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    entries = generate_entries(args.rows, args.length, args.seed)
+    directory = tempfile.mkdtemp(prefix="compression-")
+    print(f"{args.rows} entries of ~{args.length} chars in {directory}")
+    results = {}
+    for compress in (False, True):
+        random.seed(args.seed)
+        mode = "compressed" if compress else "plain"
+        results[mode] = result = asyncio.run(
+            run_mode(compress, entries, directory, args.reads)
+        )
+        print(
+            f"{mode:<10} size={result['size_mib']:7.2f}MiB  "
+            f"write p50={result['write']['p50']:6.3f}ms "
+            f"p95={result['write']['p95']:6.3f}ms  "
+            f"read page p50={result['read']['p50']:6.3f}ms "
+            f"p95={result['read']['p95']:6.3f}ms"
+        )
+    ratio = results["compressed"]["size_mib"] / results["plain"]["size_mib"]
+    print(f"compressed database is {ratio:.0%} of the plain one")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,305 @@
+# benchmarks/load.py
+#
+# Load test of the main user journeys against a seeded database. Each
+# scenario (register, login, create, list_page, list_api) runs as its own
+# phase with --concurrency clients, and reports p50/p95/p99 latency and
+# requests/sec. Results are saved as JSON so runs can be compared across
+# commits:
+#
+#   python -m benchmarks.load --users 100 --memories 200 --requests 2000
+#   python -m benchmarks.load --transport uvicorn --workers 2
+#   python -m benchmarks.load --compare benchmarks/results/<earlier>.json
+#   GROUP_COMMIT_ENABLED=true python -m benchmarks.load --scenarios create
+#
+# --transport inproc drives the ASGI app through httpx in this process;
+# uvicorn starts a real server and goes through a socket.
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.stats import latency_summary
+
+PASSWORD = "benchpassword123"
+SCENARIOS = ("list_page", "list_api", "create", "login", "register")
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+
+def seed(db_path: str, users: int, memories: int) -> None:
+    """Create the schema and users x memories rows, all with one password."""
+    from sqlalchemy import create_engine, insert
+
+    from app.core.security import hash_password
+    from app.db.schema import sync_schema
+    from app.models.memory_model import Memory
+    from app.models.user_model import User
+
+    engine = create_engine(f"sqlite:///{db_path}")
+    hashed = hash_password(PASSWORD)
+    started = datetime.utcnow() - timedelta(days=365)
+    with engine.begin() as connection:
+        sync_schema(connection)
+        connection.execute(
+            insert(User),
+            [
+                {"username": f"bench{u}", "hashed_password": hashed}
+                for u in range(users)
+            ],
+        )
+        user_ids = [row.id for row in connection.execute(User.__table__.select())]
+        for user_id in user_ids:
+            connection.execute(
+                insert(Memory),
+                [
+                    {
+                        "user_id": user_id,
+                        "title": f"Memory {m} of user {user_id}",
+                        "description": f"Seeded diary entry number {m}. " * 8,
+                        "created_at": started + timedelta(minutes=m),
+                    }
+                    for m in range(memories)
+                ],
+            )
+    engine.dispose()
+
+
+async def get_tokens(client, users: int, count: int) -> list:
+    tokens = []
+    for u in random.sample(range(users), min(users, count)):
+        response = await client.post(
+            "/api/token", data={"username": f"bench{u}", "password": PASSWORD}
+        )
+        response.raise_for_status()
+        tokens.append(response.json()["access_token"])
+    return tokens
+
+
+def make_request(scenario: str, tokens: list, users: int, counter):
+    """Return (method, url, kwargs) for one request of `scenario`."""
+    n = next(counter)
+    auth = {"Authorization": f"Bearer {tokens[n % len(tokens)]}"}
+    if scenario == "list_page":
+        return "GET", "/memories", {"headers": auth}
+    if scenario == "list_api":
+        return "GET", "/api/memories", {"headers": auth}
+    if scenario == "create":
+        body = {"title": f"Load {n}", "description": "Written during a load test."}
+        return "POST", "/api/memories", {"headers": auth, "json": body}
+    if scenario == "login":
+        data = {"username": f"bench{n % users}", "password": PASSWORD}
+        return "POST", "/api/token", {"data": data}
+    if scenario == "register":
+        data = {"username": f"new{os.getpid()}-{n}", "password": PASSWORD}
+        return "POST", "/users/register", {"data": data}
+    raise ValueError(scenario)
+
+
+async def run_phase(client, scenario, requests, concurrency, tokens, users):
+    counter = itertools.count()
+    remaining = itertools.islice(itertools.count(), requests)
+    latencies, errors = [], 0
+
+    async def worker():
+        nonlocal errors
+        for _ in remaining:
+            method, url, kwargs = make_request(scenario, tokens, users, counter)
+            sent = time.perf_counter()
+            response = await client.request(method, url, **kwargs)
+            latencies.append(time.perf_counter() - sent)
+            if response.status_code >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "seconds": elapsed,
+        "rps": len(latencies) / elapsed,
+        **latency_summary(latencies),
+    }
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_uvicorn(workers: int):
+    port = free_port()
+    server = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "app.main:app",
+            "--port",
+            str(port),
+            "--workers",
+            str(workers),
+            "--log-level",
+            "warning",
+        ]
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return server, base_url
+        except OSError:
+            if server.poll() is not None:
+                raise RuntimeError("uvicorn exited during startup")
+            time.sleep(0.1)
+    server.terminate()
+    raise RuntimeError("uvicorn did not start listening within 60s")
+
+
+async def drive(args, base_url=None):
+    import httpx
+
+    limits = httpx.Limits(max_connections=args.concurrency)
+    if base_url is None:
+        from app.main import app
+
+        lifespan = app.router.lifespan_context(app)
+        client = httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app), base_url="http://bench"
+        )
+    else:
+        lifespan = None
+        client = httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60)
+
+    results = {}
+    if lifespan is not None:
+        await lifespan.__aenter__()
+    try:
+        async with client:
+            tokens = await get_tokens(client, args.users, args.concurrency)
+            for scenario in args.scenarios:
+                # bcrypt-bound scenarios are an order of magnitude slower
+                count = args.requests
+                if scenario in ("login", "register"):
+                    count = max(args.concurrency, args.requests // 10)
+                results[scenario] = await run_phase(
+                    client, scenario, count, args.concurrency, tokens, args.users
+                )
+                print_result(scenario, results[scenario])
+    finally:
+        if lifespan is not None:
+            await lifespan.__aexit__(None, None, None)
+    return results
+
+
+def print_result(scenario: str, result: dict) -> None:
+    print(
+        f"{scenario:<10} n={result['requests']:<6} err={result['errors']:<4} "
+        f"{result['rps']:8.1f} req/s  p50={result['p50']:7.2f}ms "
+        f"p95={result['p95']:7.2f}ms p99={result['p99']:7.2f}ms"
+    )
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def save(args, results) -> str:
+    os.makedirs(args.results_dir, exist_ok=True)
+    revision = git_revision()
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+    path = os.path.join(args.results_dir, f"{stamp}-{revision}-{args.transport}.json")
+    config = {
+        key: getattr(args, key)
+        for key in ("transport", "workers", "users", "memories", "concurrency")
+    }
+    with open(path, "w") as f:
+        json.dump(
+            {"revision": revision, "config": config, "results": results}, f, indent=2
+        )
+    return path
+
+
+def compare(path: str, results: dict) -> None:
+    with open(path) as f:
+        baseline = json.load(f)
+    print(f"\nagainst {baseline['revision']} ({os.path.basename(path)}):")
+    for scenario, result in results.items():
+        before = baseline["results"].get(scenario)
+        if not before:
+            continue
+        rps = (result["rps"] / before["rps"] - 1) * 100
+        p95 = (result["p95"] / before["p95"] - 1) * 100
+        print(f"{scenario:<10} req/s {rps:+6.1f}%  p95 {p95:+6.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--transport", choices=["inproc", "uvicorn"], default="inproc")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--memories", type=int, default=200, help="per user")
+    parser.add_argument("--requests", type=int, default=1000, help="per scenario")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument(
+        "--scenarios",
+        type=lambda value: value.split(","),
+        default=list(SCENARIOS),
+        help=f"comma-separated subset of {','.join(SCENARIOS)}",
+    )
+    parser.add_argument("--db", help="reuse (or create) this database file")
+    parser.add_argument("--results-dir", default=RESULTS_DIR)
+    parser.add_argument("--compare", help="earlier results file to diff against")
+    args = parser.parse_args()
+
+    db_path = args.db or os.path.join(tempfile.mkdtemp(prefix="load-"), "bench.db")
+    # Configure before the app (and its settings) are imported; uvicorn
+    # inherits the environment
+    os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{db_path}"
+    os.environ["SYNC_DATABASE_URL"] = f"sqlite:///{db_path}"
+    os.environ["PASSWORD_HASH_MAX_QUEUE"] = str(max(64, args.concurrency))
+    # All clients share one IP; measure throughput, not the limiter
+    os.environ["RATE_LIMIT_ENABLED"] = "false"
+    if not os.path.exists(db_path):
+        started = time.perf_counter()
+        seed(db_path, args.users, args.memories)
+        print(
+            f"seeded {args.users} users x {args.memories} memories "
+            f"in {time.perf_counter() - started:.1f}s"
+        )
+
+    if args.transport == "uvicorn":
+        server, base_url = start_uvicorn(args.workers)
+        try:
+            results = asyncio.run(drive(args, base_url))
+        finally:
+            server.terminate()
+            server.wait()
+    else:
+        results = asyncio.run(drive(args))
+
+    print(f"\nsaved {save(args, results)}")
+    if args.compare:
+        compare(args.compare, results)
+
+
+if __name__ == "__main__":
+    main()
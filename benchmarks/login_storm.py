@@ -0,0 +1,112 @@
+# benchmarks/login_storm.py
+#
+# Measures the latency of an unrelated request (GET /) while a burst of
+# logins is in progress, to check that bcrypt no longer stalls the event
+# loop. Run with:
+#
+#   python -m benchmarks.login_storm --logins 50 --mode thread
+#
+# --mode inline calls bcrypt on the event loop, as the app used to, for
+# comparison.
+
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+from benchmarks.stats import percentile
+
+
+def summarize(label, samples):
+    ms = [s * 1000 for s in samples]
+    print(
+        f"{label:<14} n={len(ms):<5} p50={statistics.median(ms):7.2f}ms "
+        f"p95={percentile(ms, 95):7.2f}ms max={max(ms):7.2f}ms"
+    )
+
+
+async def probe(client, stop: asyncio.Event, interval: float):
+    # Requests are due on a fixed schedule and latency is measured from the
+    # due time, so time spent waiting for a blocked event loop is counted.
+    samples = []
+    due = time.perf_counter()
+    while not stop.is_set():
+        await client.get("/")
+        samples.append(time.perf_counter() - due)
+        due += interval
+        await asyncio.sleep(max(0.0, due - time.perf_counter()))
+    return samples
+
+
+async def run(args):
+    from httpx import ASGITransport, AsyncClient
+
+    from app.core import security
+    from app.main import app
+
+    if args.mode == "inline":
+
+        async def run_inline(fn, *fn_args):
+            return fn(*fn_args)
+
+        security.hashing_pool.run = run_inline
+
+    transport = ASGITransport(app=app)
+    async with app.router.lifespan_context(app), AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+        credentials = {"username": "stormuser", "password": "stormpassword123"}
+        await client.post("/users/register", data=credentials)
+
+        stop = asyncio.Event()
+        idle_probe = asyncio.create_task(probe(client, stop, args.interval))
+        await asyncio.sleep(args.idle_seconds)
+        stop.set()
+        idle = await idle_probe
+
+        stop = asyncio.Event()
+        storm_probe = asyncio.create_task(probe(client, stop, args.interval))
+        started = time.perf_counter()
+        await asyncio.gather(
+            *(client.post("/users/login", data=credentials) for _ in range(args.logins))
+        )
+        storm_seconds = time.perf_counter() - started
+        stop.set()
+        storm = await storm_probe
+
+    print(f"mode={args.mode} logins={args.logins} storm took {storm_seconds:.2f}s")
+    summarize("GET / idle", idle)
+    summarize("GET / storm", storm)
+    print(security.hashing_pool.stats())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--logins", type=int, default=50)
+    parser.add_argument(
+        "--mode", choices=["inline", "thread", "process"], default="thread"
+    )
+    parser.add_argument("--workers", type=int, default=0)
+    parser.add_argument("--interval", type=float, default=0.01)
+    parser.add_argument("--idle-seconds", type=float, default=1.0)
+    args = parser.parse_args()
+
+    # Configure before the app (and its settings) are imported
+    workdir = tempfile.mkdtemp(prefix="login-storm-")
+    db_path = os.path.join(workdir, "bench.db")
+    os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{db_path}"
+    os.environ["SYNC_DATABASE_URL"] = f"sqlite:///{db_path}"
+    os.environ["PASSWORD_HASH_EXECUTOR"] = (
+        "thread" if args.mode == "inline" else args.mode
+    )
+    os.environ["PASSWORD_HASH_WORKERS"] = str(args.workers)
+    os.environ["PASSWORD_HASH_MAX_QUEUE"] = str(max(64, args.logins))
+    # The storm comes from one client and would otherwise be rate limited
+    os.environ["RATE_LIMIT_ENABLED"] = "false"
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+# benchmarks/similarity.py
+#
+# The "related memories" index at several sizes of one user's diary: time
+# to vectorize the entries, index file size, load time, the cost of one
+# incremental write, and top-k query latency one query at a time and in
+# batches. --baseline also times the same scoring as a Python loop over
+# the entries, which is what the index replaces.
+#
+#   python -m benchmarks.similarity --sizes 10000 100000
+#   python -m benchmarks.similarity --sizes 10000 --baseline
+
+import argparse
+import math
+import os
+import random
+import tempfile
+import time
+
+from benchmarks.compression import generate_entries
+from benchmarks.stats import latency_summary
+
+
+def python_loop_query(vectors, query, weights, k):
+    scored = []
+    query_norm = math.sqrt(sum(q * q * w for q, w in zip(query, weights)))
+    for row, vector in enumerate(vectors):
+        dot = norm = 0.0
+        for v, q, w in zip(vector, query, weights):
+            dot += v * q * w
+            norm += v * v * w
+        if norm and query_norm:
+            scored.append((dot / math.sqrt(norm) / query_norm, row))
+    return sorted(scored, reverse=True)[:k]
+
+
+def run_size(size, args, directory):
+    import numpy as np
+
+    from app.services import similarity
+
+    entries = generate_entries(size, args.length, args.seed)
+    rows = [(i + 1, f"Entry {i}", text) for i, text in enumerate(entries)]
+    path = os.path.join(directory, f"user{size}-d{args.dimensions}.vec")
+
+    started = time.perf_counter()
+    records = similarity._records(rows, args.dimensions)
+    vectorize = time.perf_counter() - started
+    records.tofile(path)
+
+    index = similarity.SimilarityIndex(path, args.dimensions)
+    started = time.perf_counter()
+    index.refresh()
+    load = time.perf_counter() - started
+
+    rng = random.Random(args.seed)
+    picks = [rng.randrange(size) for _ in range(args.queries)]
+    queries = records["vector"][picks]
+    exclude = [rows[i][0] for i in picks]
+
+    single = []
+    for i in range(args.queries):
+        started = time.perf_counter()
+        index.query(queries[i : i + 1], args.k, exclude[i : i + 1])
+        single.append(time.perf_counter() - started)
+
+    batched = []
+    for start in range(0, args.queries, args.batch):
+        started = time.perf_counter()
+        index.query(
+            queries[start : start + args.batch],
+            args.k,
+            exclude[start : start + args.batch],
+        )
+        batched.append(
+            (time.perf_counter() - started) / len(queries[start : start + args.batch])
+        )
+
+    # One memory written, then the next query picks it up from the file
+    writes = []
+    for i in range(args.writes):
+        record = similarity._records(
+            [(size + i + 1, "New entry", entries[i % size])], args.dimensions
+        )
+        started = time.perf_counter()
+        with open(path, "ab") as f:
+            f.write(record.tobytes())
+        index.refresh()
+        index.query(queries[:1], args.k, exclude[:1])
+        writes.append(time.perf_counter() - started)
+
+    result = {
+        "vectorize_s": vectorize,
+        "file_mib": os.path.getsize(path) / 2**20,
+        "load_ms": load * 1000,
+        "single": latency_summary(single),
+        "batched": latency_summary(batched),
+        "write_then_query": latency_summary(writes),
+    }
+    if args.baseline:
+        vectors = records["vector"].tolist()
+        idf = np.log((1.0 + index.size) / (1.0 + index.df)) + 1.0
+        weights = (idf * idf).tolist()
+        started = time.perf_counter()
+        python_loop_query(vectors, queries[0].tolist(), weights, args.k)
+        result["python_loop_ms"] = (time.perf_counter() - started) * 1000
+    os.remove(path)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--length", type=int, default=500, help="chars per entry")
+    parser.add_argument("--dimensions", type=int, default=256)
+    parser.add_argument("--queries", type=int, default=256)
+    parser.add_argument("--batch", type=int, default=64, help="queries per batch")
+    parser.add_argument("--writes", type=int, default=50)
+    parser.add_argument("-k", type=int, default=5)
+    parser.add_argument("--baseline", action="store_true")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="similarity-")
+    for size in args.sizes:
+        result = run_size(size, args, directory)
+        print(
+            f"{size:>7} memories: vectorize {result['vectorize_s']:.1f}s, "
+            f"file {result['file_mib']:.1f}MiB, load {result['load_ms']:.0f}ms"
+        )
+        print(
+            f"         query p50={result['single']['p50']:.2f}ms "
+            f"p95={result['single']['p95']:.2f}ms, "
+            f"batched per query p50={result['batched']['p50']:.2f}ms, "
+            f"write+query p50={result['write_then_query']['p50']:.2f}ms"
+        )
+        if "python_loop_ms" in result:
+            print(f"         python loop query {result['python_loop_ms']:.0f}ms")
+
+
+if __name__ == "__main__":
+    main()
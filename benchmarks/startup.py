@@ -0,0 +1,108 @@
+# benchmarks/startup.py
+#
+# Cold-start cost of one worker: importing app.main, running the lifespan
+# startup, and serving the first request. Every run is a fresh interpreter,
+# as a newly forked worker would be. Run with:
+#
+#   python -m benchmarks.startup --runs 10
+#
+# --importtime prints the slowest modules of one extra run, from
+# `python -X importtime`.
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+# Executed in the child process; prints one JSON line of timings
+WORKER = """
+import asyncio, json, time
+started = time.perf_counter()
+from app.main import app
+imported = time.perf_counter()
+
+async def boot():
+    from httpx import ASGITransport, AsyncClient
+
+    async with app.router.lifespan_context(app):
+        ready = time.perf_counter()
+        transport = ASGITransport(app=app)
+        async with AsyncClient(transport=transport, base_url="http://bench") as client:
+            response = await client.get("/users/login")
+        assert response.status_code == 200
+        return ready, time.perf_counter()
+
+ready, served = asyncio.run(boot())
+print(json.dumps({
+    "import": imported - started,
+    "startup": ready - imported,
+    "first_request": served - ready,
+    "total": served - started,
+}))
+"""
+
+
+def run_worker(env) -> dict:
+    output = subprocess.run(
+        [sys.executable, "-c", WORKER],
+        env=env,
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def print_importtime(env, top: int):
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        env=env,
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stderr
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if cumulative.strip().isdigit():
+            rows.append((int(cumulative), name.strip()))
+    print("\nslowest imports (cumulative):")
+    for micros, name in sorted(rows, reverse=True)[:top]:
+        print(f"  {micros / 1000:8.1f}ms  {name}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--importtime", action="store_true")
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    db_path = os.path.join(tempfile.mkdtemp(prefix="startup-"), "bench.db")
+    env = dict(
+        os.environ,
+        DATABASE_URL=f"sqlite+aiosqlite:///{db_path}",
+        SYNC_DATABASE_URL=f"sqlite:///{db_path}",
+    )
+    # The first run creates and stamps the schema; later ones find it at head
+    first = run_worker(env)
+    samples = [run_worker(env) for _ in range(args.runs)]
+
+    print(f"first boot (empty database): {first['total'] * 1000:.1f}ms")
+    for phase in ("import", "startup", "first_request", "total"):
+        ms = [sample[phase] * 1000 for sample in samples]
+        print(
+            f"{phase:<14} median={statistics.median(ms):8.1f}ms "
+            f"min={min(ms):8.1f}ms max={max(ms):8.1f}ms"
+        )
+    if args.importtime:
+        print_importtime(env, args.top)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,22 @@
+# benchmarks/stats.py
+
+import statistics
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def latency_summary(samples) -> dict:
+    """p50/p95/p99/max of latencies given in seconds, in milliseconds."""
+    if not samples:
+        return {"p50": None, "p95": None, "p99": None, "max": None}
+    ms = [s * 1000 for s in samples]
+    return {
+        "p50": statistics.median(ms),
+        "p95": percentile(ms, 95),
+        "p99": percentile(ms, 99),
+        "max": max(ms),
+    }
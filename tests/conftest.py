@@ -0,0 +1,130 @@
+# tests/conftest.py
+
+import asyncio
+import os
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.core.config import settings
+from app.db.base import Base
+from app.db.session import apply_engine_profile, get_db, get_read_db
+from app.main import app
+
+# Override settings.DATABASE_URL and settings.SYNC_DATABASE_URL for testing
+settings.DATABASE_URL = settings.TEST_DATABASE_URL
+settings.SYNC_DATABASE_URL = "sqlite:///./test_memory_app.db"
+# Every test logs in from the same client; tests of the limits turn them on
+settings.RATE_LIMIT_ENABLED = False
+
+# Remove the test database file if it exists
+if os.path.exists("./test_memory_app.db"):
+    os.remove("./test_memory_app.db")
+
+
+# For SQLite foreign key support
+@event.listens_for(Engine, "connect")
+def _set_sqlite_pragma(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
+
+
+DATABASE_URL = settings.DATABASE_URL
+
+# Test database engines shaped like the app's: writes share one
+# connection, reads get a pool of query_only connections
+async_engine = create_async_engine(
+    DATABASE_URL,
+    future=True,
+    echo=False,
+    pool_size=1,
+    max_overflow=0,
+    pool_timeout=settings.DB_POOL_TIMEOUT_SECONDS,
+)
+apply_engine_profile(async_engine)
+read_engine = create_async_engine(
+    DATABASE_URL,
+    future=True,
+    echo=False,
+    pool_size=settings.DB_READ_POOL_SIZE,
+    max_overflow=settings.DB_READ_POOL_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT_SECONDS,
+)
+apply_engine_profile(read_engine, read_only=True)
+
+TestingSessionLocal = sessionmaker(
+    bind=async_engine,
+    class_=AsyncSession,
+    expire_on_commit=False,
+)
+
+TestingReadSessionLocal = sessionmaker(
+    bind=read_engine,
+    class_=AsyncSession,
+    expire_on_commit=False,
+)
+
+
+# Override the get_db and get_read_db dependencies
+async def override_get_db():
+    async with TestingSessionLocal() as session:
+        yield session
+
+
+async def override_get_read_db():
+    async with TestingReadSessionLocal() as session:
+        yield session
+
+
+app.dependency_overrides[get_db] = override_get_db
+app.dependency_overrides[get_read_db] = override_get_read_db
+
+
+# Create the database tables before running the tests
+@pytest.fixture(scope="session", autouse=True)
+async def prepare_database():
+    async with async_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    yield
+    # Drop the tables after tests
+    async with async_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+    await read_engine.dispose()
+    await async_engine.dispose()
+    # Remove the test database file
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(f"./test_memory_app.db{suffix}"):
+            os.remove(f"./test_memory_app.db{suffix}")
+
+
+# Create a new event loop for pytest-asyncio
+@pytest.fixture(scope="session")
+def event_loop():
+    loop = asyncio.get_event_loop_policy().new_event_loop()
+    yield loop
+    loop.close()
+
+
+# The engines behind the overridden get_db and get_read_db, for tests that
+# inspect SQL
+@pytest.fixture(scope="session")
+def db_engines():
+    return async_engine, read_engine
+
+
+# Provide a test client using AsyncClient and ASGITransport
+@pytest.fixture(scope="function")
+async def client():
+    from httpx import ASGITransport, AsyncClient
+
+    transport = ASGITransport(app=app)
+    async with AsyncClient(
+        transport=transport,
+        base_url="http://testserver",
+        follow_redirects=True,  # Keep redirects enabled
+    ) as c:
+        yield c
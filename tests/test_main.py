@@ -1,91 +1,7 @@
 # tests/test_main.py
 
-import os
-import asyncio
-
 import pytest
-from sqlalchemy import event
-from sqlalchemy.engine import Engine
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
-from sqlalchemy.orm import sessionmaker
-
-from app.core.config import settings
-from app.db.base import Base
-from app.db.session import get_db
-from app.main import app
-
-# Override settings.DATABASE_URL and settings.SYNC_DATABASE_URL for testing
-settings.DATABASE_URL = settings.TEST_DATABASE_URL
-settings.SYNC_DATABASE_URL = "sqlite:///./test_memory_app.db"
-
-# Remove the test database file if it exists
-if os.path.exists("./test_memory_app.db"):
-    os.remove("./test_memory_app.db")
-
-
-# For SQLite foreign key support
-@event.listens_for(Engine, "connect")
-def _set_sqlite_pragma(dbapi_connection, connection_record):
-    cursor = dbapi_connection.cursor()
-    cursor.execute("PRAGMA foreign_keys=ON")
-    cursor.close()
-
-
-DATABASE_URL = settings.DATABASE_URL
-
-# Create a test database engine
-async_engine = create_async_engine(DATABASE_URL, future=True, echo=False)
-
-TestingSessionLocal = sessionmaker(
-    bind=async_engine,
-    class_=AsyncSession,
-    expire_on_commit=False,
-)
-
-
-# Override the get_db dependency
-async def override_get_db():
-    async with TestingSessionLocal() as session:
-        yield session
-
-
-app.dependency_overrides[get_db] = override_get_db
-
-
-# Create the database tables before running the tests
-@pytest.fixture(scope="session", autouse=True)
-async def prepare_database():
-    async with async_engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
-    yield
-    # Drop the tables after tests
-    async with async_engine.begin() as conn:
-        await conn.run_sync(Base.metadata.drop_all)
-    # Remove the test database file
-    if os.path.exists("./test_memory_app.db"):
-        os.remove("./test_memory_app.db")
-
-
-# Create a new event loop for pytest-asyncio
-@pytest.fixture(scope="session")
-def event_loop():
-    loop = asyncio.get_event_loop_policy().new_event_loop()
-    yield loop
-    loop.close()
-
-
-# Provide a test client using AsyncClient and ASGITransport
-@pytest.fixture(scope="function")
-async def client():
-    from httpx import ASGITransport, AsyncClient
-
-    transport = ASGITransport(app=app)
-    async with AsyncClient(
-        transport=transport,
-        base_url="http://testserver",
-        follow_redirects=True,  # Keep redirects enabled
-    ) as c:
-        yield c
+from sqlalchemy.future import select
 
 
 # Now write your test functions
@@ -216,3 +132,1412 @@ async def test_get_memories_authenticated(client):
     response = await client.get("/memories")
     assert response.status_code == 200
     assert "No memories found" in response.text or "Your memories" in response.text
+
+
+@pytest.mark.asyncio
+async def test_get_memories_keyset_pagination(client):
+    import re
+
+    await client.post(
+        "/users/register",
+        data={"username": "pageuser", "password": "pagepassword123"},
+    )
+    await client.post(
+        "/users/login",
+        data={"username": "pageuser", "password": "pagepassword123"},
+    )
+    for i in range(5):
+        await client.post(
+            "/memories", data={"title": f"Page {i}", "description": f"Entry {i}"}
+        )
+
+    response = await client.get("/memories", params={"limit": 2})
+    assert response.status_code == 200
+    assert "Page 4" in response.text and "Page 3" in response.text
+    assert "Page 2" not in response.text
+
+    # A memory created between page loads must not shift the older pages
+    await client.post("/memories", data={"title": "Page 5", "description": "New"})
+    after = re.search(r"after=([\w-]+)", response.text).group(1)
+    response = await client.get("/memories", params={"limit": 2, "after": after})
+    assert "Page 2" in response.text and "Page 1" in response.text
+    assert "Page 3" not in response.text and "Page 5" not in response.text
+
+    before = re.search(r"before=([\w-]+)", response.text).group(1)
+    response = await client.get("/memories", params={"limit": 2, "before": before})
+    assert "Page 4" in response.text and "Page 3" in response.text
+
+
+@pytest.mark.asyncio
+async def test_get_memories_invalid_cursor(client):
+    await client.post(
+        "/users/register",
+        data={"username": "cursoruser", "password": "cursorpassword123"},
+    )
+    await client.post(
+        "/users/login",
+        data={"username": "cursoruser", "password": "cursorpassword123"},
+    )
+    response = await client.get("/memories", params={"after": "not-a-cursor"})
+    assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_search_memories(client):
+    await client.post(
+        "/users/register",
+        data={"username": "searchuser", "password": "searchpassword123"},
+    )
+    await client.post(
+        "/users/login",
+        data={"username": "searchuser", "password": "searchpassword123"},
+    )
+    await client.post(
+        "/memories",
+        data={"title": "Beach day", "description": "Swam <b>far</b> out at sea."},
+    )
+    await client.post(
+        "/memories", data={"title": "Mountains", "description": "Cold and windy."}
+    )
+
+    response = await client.get("/memories/search", params={"q": "swam"})
+    assert response.status_code == 200
+    assert "<mark>Swam</mark>" in response.text
+    assert "&lt;b&gt;far&lt;/b&gt;" in response.text
+    assert "Mountains" not in response.text
+
+    # Prefix match on the last term, and FTS syntax in input is inert
+    response = await client.get("/memories/search", params={"q": 'mount" *'})
+    assert "<mark>Mountains</mark>" in response.text
+
+    # Terms never match the owner token every memory is indexed with
+    response = await client.get("/memories/search", params={"q": "u"})
+    assert "No matching memories." in response.text
+
+
+@pytest.mark.asyncio
+async def test_search_is_scoped_to_user(client):
+    await client.post(
+        "/users/register",
+        data={"username": "othersearchuser", "password": "searchpassword123"},
+    )
+    await client.post(
+        "/users/login",
+        data={"username": "othersearchuser", "password": "searchpassword123"},
+    )
+    response = await client.get("/memories/search", params={"q": "beach"})
+    assert response.status_code == 200
+    assert "No matching memories." in response.text
+
+
+@pytest.mark.asyncio
+async def test_hashing_pool_rejects_when_saturated():
+    import asyncio
+    import time
+
+    from app.core.hashing import HashingPool, HashingPoolBusy
+
+    pool = HashingPool(kind="thread", workers=1, max_queue=1)
+    try:
+        jobs = [asyncio.ensure_future(pool.run(time.sleep, 0.1)) for _ in range(2)]
+        await asyncio.sleep(0)
+        with pytest.raises(HashingPoolBusy):
+            await pool.run(time.sleep, 0)
+        await asyncio.gather(*jobs)
+        stats = pool.stats()
+        assert stats["completed_total"] == 2
+        assert stats["rejected_total"] == 1
+        assert stats["in_flight"] == 0
+    finally:
+        pool.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_login_returns_503_when_hashing_pool_is_full(client, monkeypatch):
+    from app.core.hashing import hashing_pool
+
+    await client.post(
+        "/users/register",
+        data={"username": "busyuser", "password": "busypassword123"},
+    )
+    monkeypatch.setattr(hashing_pool, "max_queue", -1)
+    response = await client.post(
+        "/users/login",
+        data={"username": "busyuser", "password": "busypassword123"},
+    )
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+
+    # Shed before any work is done, for unknown users too
+    response = await client.post(
+        "/api/token", data={"username": "nobody", "password": "nobodypassword"}
+    )
+    assert response.status_code == 503
+
+    # Also when the expected wait, rather than the queue, is too long
+    monkeypatch.setattr(hashing_pool, "max_queue", 64)
+    monkeypatch.setattr(hashing_pool, "estimated_wait", lambda: 7.5)
+    response = await client.post(
+        "/users/login",
+        data={"username": "busyuser", "password": "busypassword123"},
+    )
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "8"
+
+
+@pytest.mark.asyncio
+async def test_auth_attempts_are_rate_limited(client, monkeypatch):
+    from app.core import ratelimit
+    from app.core.config import settings
+
+    monkeypatch.setattr(settings, "RATE_LIMIT_ENABLED", True)
+    monkeypatch.setattr(settings, "RATE_LIMIT_USERNAME_BURST", 2)
+    monkeypatch.setattr(settings, "RATE_LIMIT_IP_BURST", 4)
+    monkeypatch.setattr(
+        ratelimit, "bucket_backend", ratelimit.MemoryBucketBackend(maxsize=100)
+    )
+
+    statuses = [
+        (
+            await client.post(
+                "/api/token", data={"username": "Victim", "password": "guess"}
+            )
+        ).status_code
+        for _ in range(3)
+    ]
+    # The third attempt on the same username is refused
+    assert statuses == [401, 401, 429]
+
+    response = await client.post(
+        "/users/login", data={"username": "other", "password": "guess"}
+    )
+    assert response.status_code == 200
+    # The client has now used up its per-IP allowance, whatever the username
+    response = await client.post(
+        "/users/login", data={"username": "third", "password": "guess"}
+    )
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
+
+
+@pytest.mark.asyncio
+async def test_authenticated_requests_use_principal_cache(client, db_engines):
+    from sqlalchemy import event
+
+    from app.core.principal_cache import principal_cache
+    from app.models.user_model import User
+    from tests.conftest import TestingSessionLocal
+
+    await client.post(
+        "/users/register",
+        data={"username": "cacheduser", "password": "cachedpassword123"},
+    )
+    await client.post(
+        "/users/login",
+        data={"username": "cacheduser", "password": "cachedpassword123"},
+    )
+    await client.get("/memories")
+
+    statements = []
+
+    def _capture(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    for engine in db_engines:
+        event.listen(engine.sync_engine, "before_cursor_execute", _capture)
+    try:
+        response = await client.get("/memories")
+        assert response.status_code == 200
+        assert not [s for s in statements if "FROM users" in s]
+
+        # ORM writes to the user drop the cached principal
+        async with TestingSessionLocal() as session:
+            user = (
+                await session.execute(
+                    select(User).filter(User.username == "cacheduser")
+                )
+            ).scalar_one()
+            user.username = "cacheduser2"
+            await session.flush()
+            # A request between the flush and the commit reads the old row
+            response = await client.get("/memories")
+            assert response.status_code == 200
+            await session.commit()
+        assert await principal_cache.get_user(user.id) is None
+        statements.clear()
+        response = await client.get("/memories")
+        assert [s for s in statements if "FROM users" in s]
+    finally:
+        for engine in db_engines:
+            event.remove(engine.sync_engine, "before_cursor_execute", _capture)
+
+    token = client.cookies["access_token"].strip('"').partition(" ")[2]
+    assert await principal_cache.get_token(token) == user.id
+    await client.get("/users/logout")
+    assert await principal_cache.get_token(token) is None
+
+
+@pytest.mark.asyncio
+async def test_engine_profile_pragmas(tmp_path):
+    from sqlalchemy import text
+    from sqlalchemy.exc import OperationalError
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    from app.db.session import apply_engine_profile
+
+    url = f"sqlite+aiosqlite:///{tmp_path / 'profile.db'}"
+    writer = create_async_engine(url)
+    reader = create_async_engine(url)
+    apply_engine_profile(writer)
+    apply_engine_profile(reader, read_only=True)
+    try:
+        async with writer.begin() as conn:
+            assert (await conn.execute(text("PRAGMA journal_mode"))).scalar() == "wal"
+            assert (await conn.execute(text("PRAGMA synchronous"))).scalar() == 1
+            assert (await conn.execute(text("PRAGMA busy_timeout"))).scalar() == 5000
+            await conn.execute(text("CREATE TABLE t (x INTEGER)"))
+        async with reader.connect() as conn:
+            assert (await conn.execute(text("PRAGMA query_only"))).scalar() == 1
+            with pytest.raises(OperationalError):
+                await conn.execute(text("INSERT INTO t VALUES (1)"))
+    finally:
+        await writer.dispose()
+        await reader.dispose()
+
+
+@pytest.mark.asyncio
+async def test_read_write_split(client, db_engines):
+    import asyncio
+
+    from sqlalchemy import text
+    from sqlalchemy.exc import OperationalError
+
+    from app.db.session import get_read_db
+    from app.main import app
+
+    write_engine, _ = db_engines
+    # Sessions from the read dependency cannot write
+    async for db in app.dependency_overrides[get_read_db]():
+        with pytest.raises(OperationalError):
+            await db.execute(text("UPDATE users SET username = username"))
+
+    await client.post(
+        "/users/register",
+        data={"username": "splituser", "password": "splitpassword123"},
+    )
+    response = await client.post(
+        "/api/token", data={"username": "splituser", "password": "splitpassword123"}
+    )
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+    # Concurrent writes queue for the one write connection, and reads of
+    # the same rows carry on from the read pool meanwhile
+    responses = await asyncio.gather(
+        *(
+            client.post(
+                "/api/memories",
+                json={"title": f"Split {i}", "description": "Queued"},
+                headers=headers,
+            )
+            for i in range(20)
+        ),
+        *(client.get("/api/memories", headers=headers) for _ in range(5)),
+    )
+    assert [r.status_code for r in responses] == [201] * 20 + [200] * 5
+    assert write_engine.pool.size() == 1 and write_engine.pool.checkedout() == 0
+    page = (await client.get("/api/memories", headers=headers)).json()
+    assert len(page["items"]) == 20
+
+
+@pytest.mark.asyncio
+async def test_bulk_import_ndjson_and_csv(client):
+    await client.post(
+        "/users/register",
+        data={"username": "importuser", "password": "importpassword123"},
+    )
+    await client.post(
+        "/users/login",
+        data={"username": "importuser", "password": "importpassword123"},
+    )
+    ndjson = (
+        '{"title": "Imported 1", "description": "First"}\n'
+        "\n"
+        '{"title": "", "description": "Missing title"}\n'
+        "not json\n"
+        '{"title": "Imported 2", "description": "Second",'
+        ' "created_at": "2020-05-01T10:00:00+02:00"}'
+    )
+    response = await client.post(
+        "/memories/import",
+        content=ndjson.encode(),
+        headers={"Content-Type": "application/x-ndjson"},
+    )
+    assert response.status_code == 200
+    report = response.json()
+    assert report["imported"] == 2
+    assert report["failed"] == 2
+    assert [error["line"] for error in report["errors"]] == [3, 4]
+
+    csv_body = (
+        "title,description,created_at\r\n"
+        'Imported 3,"Spans\r\ntwo lines, with ""quotes""",\r\n'
+        "Too,many,fields,here\r\n"
+    )
+    response = await client.post(
+        "/memories/import", params={"format": "csv"}, content=csv_body.encode()
+    )
+    report = response.json()
+    assert report["imported"] == 1
+    assert report["errors"] == [{"line": 4, "error": "Expected 3 fields, got 4."}]
+
+    response = await client.get("/memories")
+    assert "Imported 3" in response.text
+    assert "2020-05-01 08:00:00" in response.text
+
+    response = await client.post("/memories/import", content=b"{}")
+    assert response.status_code == 415
+
+
+@pytest.mark.asyncio
+async def test_export_memories_streams_and_resumes(client):
+    import csv
+    import io
+    import json
+    import zipfile
+
+    await client.post(
+        "/users/register",
+        data={"username": "exportuser", "password": "exportpassword123"},
+    )
+    await client.post(
+        "/users/login",
+        data={"username": "exportuser", "password": "exportpassword123"},
+    )
+    body = "".join(
+        json.dumps({"title": f"Export {i}", "description": f"Row {i}"}) + "\n"
+        for i in range(5)
+    )
+    await client.post(
+        "/memories/import", params={"format": "ndjson"}, content=body.encode()
+    )
+
+    response = await client.get("/memories/export")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    records = [json.loads(line) for line in response.text.splitlines()]
+    assert [r["title"] for r in records] == [f"Export {i}" for i in range(5)]
+
+    response = await client.get(
+        "/memories/export", params={"after": records[1]["cursor"]}
+    )
+    resumed = [json.loads(line) for line in response.text.splitlines()]
+    assert [r["id"] for r in resumed] == [r["id"] for r in records[2:]]
+
+    response = await client.get("/memories/export", params={"format": "csv"})
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert [row["title"] for row in rows] == [r["title"] for r in records]
+
+    response = await client.get("/memories/export", params={"format": "zip"})
+    with zipfile.ZipFile(io.BytesIO(response.content)) as archive:
+        lines = archive.read("memories.ndjson").decode().splitlines()
+    assert [json.loads(line)["id"] for line in lines] == [r["id"] for r in records]
+
+    response = await client.get("/memories/export", params={"after": "bad"})
+    assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_json_api_crud_with_bearer_token(client):
+    await client.post(
+        "/users/register",
+        data={"username": "apiuser", "password": "apipassword123"},
+    )
+    response = await client.post(
+        "/api/token", data={"username": "apiuser", "password": "wrongpassword"}
+    )
+    assert response.status_code == 401
+    assert response.json() == {"detail": "Incorrect username or password"}
+
+    response = await client.post(
+        "/api/token", data={"username": "apiuser", "password": "apipassword123"}
+    )
+    assert response.status_code == 200
+    client.cookies.clear()
+    client.headers["Authorization"] = f"Bearer {response.json()['access_token']}"
+
+    ids = []
+    for i in range(3):
+        response = await client.post(
+            "/api/memories", json={"title": f"API {i}", "description": f"Body {i}"}
+        )
+        assert response.status_code == 201
+        ids.append(response.json()["id"])
+    response = await client.post("/api/memories", json={"title": "", "description": ""})
+    assert response.status_code == 422
+
+    response = await client.get("/api/memories", params={"limit": 2})
+    page = response.json()
+    assert [item["id"] for item in page["items"]] == ids[:0:-1]
+    assert page["prev_cursor"] is None
+    response = await client.get(
+        "/api/memories", params={"limit": 2, "after": page["next_cursor"]}
+    )
+    assert [item["id"] for item in response.json()["items"]] == ids[:1]
+
+    response = await client.patch(f"/api/memories/{ids[0]}", json={"title": "Edited"})
+    assert response.json()["title"] == "Edited"
+    assert response.json()["description"] == "Body 0"
+    response = await client.patch(f"/api/memories/{ids[0]}", json={"title": None})
+    assert response.status_code == 422
+
+    response = await client.get(f"/api/memories/{ids[0]}")
+    assert response.json()["title"] == "Edited"
+
+    response = await client.delete(f"/api/memories/{ids[0]}")
+    assert response.status_code == 204
+    response = await client.get(f"/api/memories/{ids[0]}")
+    assert response.status_code == 404
+    assert response.json() == {"detail": "Not found."}
+
+    # Edits reach the search index through its triggers
+    response = await client.get("/memories/search", params={"q": "edited"})
+    assert "No matching memories." in response.text
+    del client.headers["Authorization"]
+    response = await client.get("/api/memories")
+    assert response.status_code == 401
+
+
+@pytest.mark.asyncio
+async def test_memories_conditional_get(client, monkeypatch):
+    from app import main
+
+    await client.post(
+        "/users/register",
+        data={"username": "etaguser", "password": "etagpassword123"},
+    )
+    await client.post(
+        "/users/login",
+        data={"username": "etaguser", "password": "etagpassword123"},
+    )
+    await client.post("/memories", data={"title": "First", "description": "One"})
+
+    response = await client.get("/memories")
+    etag = response.headers["etag"]
+    last_modified = response.headers["last-modified"]
+    assert response.headers["cache-control"] == "private, no-cache"
+
+    response = await client.get("/memories", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers["etag"] == etag and not response.content
+    response = await client.get(
+        "/memories", headers={"If-Modified-Since": last_modified}
+    )
+    assert response.status_code == 304
+
+    # Other pages and representations carry their own tags
+    response = await client.get(
+        "/memories", params={"limit": 1}, headers={"If-None-Match": etag}
+    )
+    assert response.status_code == 200
+    response = await client.get("/api/memories", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    api_etag = response.headers["etag"]
+
+    await client.post("/memories", data={"title": "Second", "description": "Two"})
+    response = await client.get("/memories", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert "Second" in response.text and response.headers["etag"] != etag
+    response = await client.get("/api/memories", headers={"If-None-Match": api_etag})
+    assert response.status_code == 200
+
+    # A deploy that changes the templates or assets changes the page tags
+    response = await client.get("/memories")
+    etag = response.headers["etag"]
+    monkeypatch.setattr(main, "build_version", lambda: "next-deploy")
+    response = await client.get("/memories", headers={"If-None-Match": etag})
+    assert response.status_code == 200 and response.headers["etag"] != etag
+
+
+@pytest.mark.asyncio
+async def test_memory_fragments_are_cached_per_version(client):
+    from app.models.memory_model import Memory
+    from app.templates import fragment_cache, fragment_key
+    from tests.conftest import TestingSessionLocal
+
+    async def key_of(memory_id):
+        async with TestingSessionLocal() as db:
+            return fragment_key(await db.get(Memory, memory_id))
+
+    await client.post(
+        "/users/register",
+        data={"username": "fragmentuser", "password": "fragmentpassword123"},
+    )
+    response = await client.post(
+        "/api/token",
+        data={"username": "fragmentuser", "password": "fragmentpassword123"},
+    )
+    client.headers["Authorization"] = f"Bearer {response.json()['access_token']}"
+    response = await client.post(
+        "/api/memories", json={"title": "Cached", "description": "<b>escaped</b>"}
+    )
+    memory_id = response.json()["id"]
+
+    await client.get("/memories")
+    key = await key_of(memory_id)
+    assert key in fragment_cache
+    hits = fragment_cache.hits
+    response = await client.get("/memories", params={"limit": 5})
+    assert fragment_cache.hits > hits
+    assert "&lt;b&gt;escaped&lt;/b&gt;" in response.text
+
+    await client.patch(f"/api/memories/{memory_id}", json={"title": "Edited"})
+    assert key not in fragment_cache
+    response = await client.get("/memories")
+    assert "Edited" in response.text and "Cached" not in response.text
+    assert await key_of(memory_id) in fragment_cache
+    del client.headers["Authorization"]
+
+
+@pytest.mark.asyncio
+async def test_memory_fragments_are_not_shared_through_reused_ids(client, monkeypatch):
+    from app.services import memories
+
+    async def sign_up(username):
+        password = "reusedidpassword123"
+        await client.post(
+            "/users/register", data={"username": username, "password": password}
+        )
+        response = await client.post(
+            "/api/token", data={"username": username, "password": password}
+        )
+        return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    alice = await sign_up("reusedidalice")
+    bob = await sign_up("reusedidbob")
+    response = await client.post(
+        "/api/memories",
+        json={"title": "ALICE SECRET", "description": "Entry"},
+        headers=alice,
+    )
+    memory_id = response.json()["id"]
+    response = await client.get("/memories", headers=alice)
+    assert "ALICE SECRET" in response.text
+
+    # Deleted as if by another worker, so this process keeps the fragment;
+    # the newest rowid is then given out again
+    with monkeypatch.context() as patch:
+        patch.setattr(memories, "evict_memory", lambda memory: None)
+        await client.delete(f"/api/memories/{memory_id}", headers=alice)
+    response = await client.post(
+        "/api/memories",
+        json={"title": "Bob entry", "description": "Entry"},
+        headers=bob,
+    )
+    assert response.json()["id"] == memory_id
+
+    response = await client.get("/memories", headers=bob)
+    assert "Bob entry" in response.text
+    assert "ALICE SECRET" not in response.text
+
+
+@pytest.mark.asyncio
+async def test_memories_page_streams_header_before_query():
+    from types import SimpleNamespace
+
+    from app.core.pagination import Page
+    from app.templates import precompile_templates, stream_template
+
+    assert precompile_templates() >= 7
+
+    events = []
+
+    async def load_page():
+        events.append("query")
+        return Page(items=[], limit=20)
+
+    context = {
+        "request": None,
+        "load_page": load_page,
+        "user": SimpleNamespace(username="streamer"),
+    }
+    async for chunk in stream_template("memories.html", context):
+        events.append(chunk)
+    assert events[1] == "query"
+    assert b"<h1>Your Memories</h1>" in events[0]
+    assert b"No memories found." in b"".join(events[2:])
+
+
+def test_sync_schema_skips_database_at_alembic_head(tmp_path):
+    from sqlalchemy import create_engine, inspect
+
+    from app.db.schema import sync_schema
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'fresh.db'}")
+    try:
+        with engine.begin() as connection:
+            assert sync_schema(connection) is True
+        assert "memories" in inspect(engine).get_table_names()
+        # A fresh database is stamped, so later startups do nothing
+        with engine.begin() as connection:
+            assert sync_schema(connection) is False
+    finally:
+        engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_app_adopts_database_from_before_migrations(monkeypatch, tmp_path):
+    import shutil
+
+    from httpx import ASGITransport, AsyncClient
+    from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+    from sqlalchemy.orm import sessionmaker
+
+    from app import main
+    from app.core.principal_cache import principal_cache
+    from app.db.jobs import job_queue
+    from app.db.session import apply_engine_profile, get_db, get_read_db
+
+    # The shipped database has only the first revision's tables
+    path = tmp_path / "baseline.db"
+    shutil.copy("data/memory_app.db", path)
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    apply_engine_profile(engine)
+    sessions = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+
+    async def get_baseline_db():
+        async with sessions() as session:
+            yield session
+
+    app = main.create_app()
+    app.dependency_overrides = {get_db: get_baseline_db, get_read_db: get_baseline_db}
+    monkeypatch.setattr(main, "write_engine", engine)
+    monkeypatch.setattr(main, "read_engine", engine)
+    monkeypatch.setattr(main, "write_sessionmakers", lambda: [sessions])
+    monkeypatch.setattr(main.hashing_pool, "shutdown", lambda: None)
+    monkeypatch.setattr(job_queue, "_sources", {})
+    # User ids in this database overlap those of the test database
+    monkeypatch.setattr(principal_cache, "enabled", False)
+
+    credentials = {"username": "adopteduser", "password": "adoptedpassword123"}
+    async with app.router.lifespan_context(app):
+        transport = ASGITransport(app=app)
+        async with AsyncClient(
+            transport=transport, base_url="http://testserver"
+        ) as client:
+            await client.post("/users/register", data=credentials)
+            response = await client.post("/api/token", data=credentials)
+            headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+            response = await client.post(
+                "/api/memories",
+                json={"title": "Adopted", "description": "Migrated on startup"},
+                headers=headers,
+            )
+            assert response.status_code == 201
+            response = await client.get("/memories", headers=headers)
+            assert response.status_code == 200
+            response = await client.get("/api/memories", headers=headers)
+            assert [m["title"] for m in response.json()["items"]] == ["Adopted"]
+            response = await client.get(
+                "/memories/search", params={"q": "migrated"}, headers=headers
+            )
+            assert "<mark>Migrated</mark>" in response.text
+
+    # Stamped at head, so the next start has nothing to do
+    async with engine.begin() as connection:
+        assert await connection.run_sync(main.sync_schema) is False
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_static_assets_are_fingerprinted_and_precompressed(tmp_path):
+    from httpx import ASGITransport, AsyncClient
+    from starlette.applications import Starlette
+    from starlette.routing import Mount
+
+    from app.core.assets import IMMUTABLE, PrecompressedStaticFiles, build_assets
+
+    manifest = build_assets(dest=str(tmp_path))
+    hashed = manifest["css/style.css"]
+    assert hashed.startswith("css/style.") and hashed != "css/style.css"
+    assert (tmp_path / f"{hashed}.gz").exists()
+    assert (tmp_path / f"{hashed}.br").exists()
+    # Too small to be worth compressing
+    assert not (tmp_path / f"{manifest['images/favicon.ico']}.gz").exists()
+
+    static = PrecompressedStaticFiles(directory=str(tmp_path), manifest=manifest)
+    transport = ASGITransport(app=Starlette(routes=[Mount("/static", static)]))
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        response = await client.get(
+            f"/static/{hashed}", headers={"Accept-Encoding": "gzip"}
+        )
+        assert response.headers["content-encoding"] == "gzip"
+        assert response.headers["content-type"].startswith("text/css")
+        assert response.headers["cache-control"] == IMMUTABLE
+        assert response.headers["vary"] == "Accept-Encoding"
+        assert b".memory-item" in response.content
+
+        response = await client.get(
+            f"/static/{hashed}", headers={"Accept-Encoding": "gzip;q=0"}
+        )
+        assert "content-encoding" not in response.headers
+        response = await client.get("/static/css/style.css")
+        assert response.headers["cache-control"] == "no-cache"
+
+
+@pytest.mark.asyncio
+async def test_health_and_metrics(client, tmp_path):
+    from sqlalchemy import text
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    from app.core.metrics import instrument_engine
+
+    response = await client.get("/health")
+    assert response.json() == {"status": "ok", "database": "ok"}
+    await client.get("/users/login")
+    await client.get("/no-such-page")
+
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'metrics.db'}")
+    instrument_engine(engine, "scratch")
+    async with engine.connect() as connection:
+        await connection.execute(text("SELECT 1"))
+    await engine.dispose()
+
+    response = await client.get("/metrics")
+    assert response.status_code == 200
+    body = response.text
+    assert (
+        'http_request_duration_seconds_count{method="GET",route="/users/login",'
+        'status="200"}' in body
+    )
+    assert 'route="unmatched",status="404"' in body
+    assert (
+        'db_query_duration_seconds_count{engine="scratch",operation="SELECT"}' in body
+    )
+    assert 'db_pool_checkouts_total{engine="scratch"}' in body
+    assert "password_hash_pool_queue_depth 0.0" in body
+    assert "http_requests_in_progress 1.0" in body
+
+
+@pytest.mark.asyncio
+async def test_profile_on_request_header(client, monkeypatch, tmp_path):
+    from app.core.config import settings
+
+    monkeypatch.setattr(settings, "PROFILE_TOKEN", "let-me-profile")
+    monkeypatch.setattr(settings, "PROFILE_DIR", str(tmp_path))
+
+    response = await client.get("/users/login", headers={"X-Profile": "wrong"})
+    assert "x-profile-id" not in response.headers
+    response = await client.get("/users/login", headers={"X-Profile": "let-me-profile"})
+    profile_id = response.headers["x-profile-id"]
+    assert (tmp_path / f"{profile_id}.prof").exists()
+    summary = (tmp_path / f"{profile_id}.txt").read_text()
+    assert summary.startswith("GET /users/login route=/users/login")
+    assert "Own time by area:" in summary and "templates" in summary
+
+
+@pytest.mark.asyncio
+async def test_slow_query_log(monkeypatch, tmp_path):
+    import json
+    import logging
+
+    from sqlalchemy import text
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    from app.core.config import settings
+    from app.core.profiling import install_slow_query_log, slow_query_logger
+
+    records = []
+    handler = logging.Handler()
+    handler.emit = lambda record: records.append(json.loads(record.getMessage()))
+    # In place of the file handler
+    monkeypatch.setattr(slow_query_logger, "handlers", [handler])
+    monkeypatch.setattr(settings, "SLOW_QUERY_MS", 0.000001)
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'slow.db'}")
+    install_slow_query_log(engine, "scratch")
+    try:
+        async with engine.connect() as connection:
+            await connection.execute(
+                text("SELECT :a,   :b"), {"a": 1, "b": "secret value"}
+            )
+    finally:
+        await engine.dispose()
+
+    record = records[-1]
+    assert record["engine"] == "scratch" and record["route"] is None
+    assert record["statement"] == "SELECT ?, ?"
+    assert record["parameters"] == "(int, str)"
+    assert "secret value" not in json.dumps(records)
+
+
+@pytest.mark.asyncio
+async def test_group_commit_batches_concurrent_creates(client, monkeypatch):
+    import asyncio
+
+    from sqlalchemy.exc import IntegrityError
+
+    from app.core.config import settings
+    from app.services import memories
+
+    await client.post(
+        "/users/register",
+        data={"username": "groupuser", "password": "grouppassword123"},
+    )
+    response = await client.post(
+        "/api/token", data={"username": "groupuser", "password": "grouppassword123"}
+    )
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+    # Caches the principal, so the concurrent creates below only wait for
+    # the write connection
+    await client.get("/api/memories", headers=headers)
+    monkeypatch.setattr(settings, "GROUP_COMMIT_ENABLED", True)
+    monkeypatch.setattr(settings, "GROUP_COMMIT_MAX_DELAY_MS", 50.0)
+    monkeypatch.setattr(memories, "memory_writers", {})
+
+    responses = await asyncio.gather(
+        *(
+            client.post(
+                "/api/memories",
+                json={"title": f"Group {i}", "description": "Together"},
+                headers=headers,
+            )
+            for i in range(20)
+        )
+    )
+    assert [r.status_code for r in responses] == [201] * 20
+    assert len({r.json()["id"] for r in responses}) == 20
+    user_id = responses[0].json()["user_id"]
+    (writer,) = memories.memory_writers.values()
+    assert writer.batches_total < 20 and writer.items_total == 20
+    page = (await client.get("/api/memories", headers=headers)).json()
+    assert len(page["items"]) == 20
+
+    # A failing row is retried alone and only fails its own caller
+    results = await asyncio.gather(
+        writer.submit(
+            {"user_id": user_id, "title": "Ok", "description": "", "created_at": None}
+        ),
+        writer.submit(
+            {"user_id": 999999, "title": "No", "description": "", "created_at": None}
+        ),
+        return_exceptions=True,
+    )
+    assert results[0].id and isinstance(results[1], IntegrityError)
+    await memories.stop_memory_writers()
+
+
+@pytest.mark.asyncio
+async def test_sharded_storage_and_rebalance(client, monkeypatch, tmp_path):
+    import sqlite3
+
+    from sqlalchemy import delete
+
+    from app.core.config import settings
+    from app.db.jobs import jobs_of_user
+    from app.db.rebalance import rebalance_shards
+    from app.db.session import SHARD_ID_SPAN, dispose_shard_engines, prepare_shard
+    from app.models.job_model import Job
+    from tests.conftest import TestingSessionLocal
+
+    async def sign_up(username):
+        password = "shardpassword123"
+        await client.post(
+            "/users/register", data={"username": username, "password": password}
+        )
+        response = await client.post(
+            "/api/token", data={"username": username, "password": password}
+        )
+        return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    async def titles(headers):
+        response = await client.get("/api/memories", headers=headers)
+        return {item["id"]: item["title"] for item in response.json()["items"]}
+
+    def shard_rows(shard, user_id):
+        with sqlite3.connect(tmp_path / f"shard{shard}.db") as connection:
+            return connection.execute(
+                "SELECT count(*) FROM memories WHERE user_id = ?", (user_id,)
+            ).fetchone()[0]
+
+    def shard_jobs(shard, user_id):
+        with sqlite3.connect(tmp_path / f"shard{shard}.db") as connection:
+            return connection.execute(
+                "SELECT count(*) FROM jobs WHERE payload ->> 'user_id' = ?",
+                (user_id,),
+            ).fetchone()[0]
+
+    # Signed up before sharding: stays in the main database until moved
+    legacy = await sign_up("legacyshard")
+    response = await client.post(
+        "/api/memories",
+        json={"title": "Legacy", "description": "Entry"},
+        headers=legacy,
+    )
+    legacy_id = response.json()["user_id"]
+
+    monkeypatch.setattr(settings, "SHARD_COUNT", 2)
+    monkeypatch.setattr(
+        settings,
+        "SHARD_DATABASE_URL",
+        f"sqlite+aiosqlite:///{tmp_path}/shard{{shard}}.db",
+    )
+    for shard in range(2):
+        await prepare_shard(shard)
+    try:
+        sharded = await sign_up("newshard")
+        response = await client.post(
+            "/memories/import",
+            content=b'{"title": "Sharded one", "description": "Entry"}\n',
+            headers={**sharded, "Content-Type": "application/x-ndjson"},
+        )
+        assert response.json()["imported"] == 1
+        response = await client.post(
+            "/api/memories",
+            json={"title": "Sharded two", "description": "Entry", "tags": ["moved"]},
+            headers=sharded,
+        )
+        user_id = response.json()["user_id"]
+        shard = user_id % 2
+        assert shard_rows(shard, user_id) == 2
+        before = await titles(sharded)
+        # Allocated from the shard's own id range
+        assert min(before) > (shard + 1) * SHARD_ID_SPAN
+        assert sorted(before.values()) == ["Sharded one", "Sharded two"]
+        response = await client.get(
+            "/memories/search", params={"q": "sharded"}, headers=sharded
+        )
+        assert response.text.count("<h3>") == 2
+        assert list((await titles(legacy)).values()) == ["Legacy"]
+        # A job about the user still waiting in the shard's outbox (given
+        # up on, so the queue leaves it alone)
+        with sqlite3.connect(tmp_path / f"shard{shard}.db") as connection:
+            connection.execute(
+                "INSERT INTO jobs (kind, payload, attempts, created_at) "
+                "VALUES ('rebalance.test', ?, 5, CURRENT_TIMESTAMP)",
+                (f'{{"user_id": {user_id}}}',),
+            )
+
+        moves = await rebalance_shards([legacy_id, user_id], main=TestingSessionLocal)
+        assert moves == [(legacy_id, None, legacy_id % 2)]
+        assert shard_rows(legacy_id % 2, legacy_id) == 1
+        assert shard_jobs(shard, user_id) == 1
+        assert list((await titles(legacy)).values()) == ["Legacy"]
+
+        # Back to one database; memories keep their ids
+        monkeypatch.setattr(settings, "SHARD_COUNT", 0)
+        moves = await rebalance_shards([legacy_id, user_id], main=TestingSessionLocal)
+        assert moves == [(legacy_id, legacy_id % 2, None), (user_id, shard, None)]
+        assert shard_rows(shard, user_id) == 0
+        assert await titles(sharded) == before
+        # The job went with the user
+        assert shard_jobs(shard, user_id) == 0
+        async with TestingSessionLocal() as db:
+            jobs = await db.scalars(select(Job.kind).where(jobs_of_user(user_id)))
+            assert "rebalance.test" in jobs.all()
+            await db.execute(delete(Job).where(Job.kind == "rebalance.test"))
+            await db.commit()
+        response = await client.get(
+            "/api/memories", params={"tags": "moved"}, headers=sharded
+        )
+        assert [item["title"] for item in response.json()["items"]] == ["Sharded two"]
+    finally:
+        await dispose_shard_engines()
+
+
+@pytest.mark.asyncio
+async def test_compressed_descriptions(client, monkeypatch):
+    import sqlite3
+
+    from sqlalchemy import text
+
+    from app.core.config import settings
+    from app.db.compression import convert_descriptions
+    from app.db.search import search_index_decompresses, sync_search_index
+    from tests.conftest import TestingSessionLocal
+
+    async def sync_triggers():
+        # As the app's startup does
+        async with TestingSessionLocal() as session:
+            connection = await session.connection()
+            await connection.run_sync(sync_search_index)
+            decompresses = await connection.run_sync(search_index_decompresses)
+            await session.commit()
+        return decompresses
+
+    monkeypatch.setattr(settings, "DESCRIPTION_COMPRESSION", True)
+    assert await sync_triggers() is True
+    credentials = {"username": "compressuser", "password": "compresspassword123"}
+    await client.post("/users/register", data=credentials)
+    response = await client.post("/api/token", data=credentials)
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+    long_text = "Today I walked along the river with my sister. " * 40
+    ids = []
+    for description in (long_text, "Short and plain."):
+        response = await client.post(
+            "/api/memories",
+            json={"title": "Walk", "description": description},
+            headers=headers,
+        )
+        ids.append(response.json()["id"])
+
+    async def stored():
+        async with TestingSessionLocal() as session:
+            rows = await session.execute(
+                text(
+                    "SELECT typeof(description), length(description) FROM memories "
+                    "WHERE id IN (:a, :b) ORDER BY id"
+                ),
+                {"a": ids[0], "b": ids[1]},
+            )
+            return rows.all()
+
+    (long_type, long_size), (short_type, _) = await stored()
+    assert (long_type, short_type) == ("blob", "text")
+    assert long_size < len(long_text) / 10
+    response = await client.get(f"/api/memories/{ids[0]}", headers=headers)
+    assert response.json()["description"] == long_text
+    response = await client.get(
+        "/memories/search", params={"q": "river sister"}, headers=headers
+    )
+    assert "<mark>river</mark>" in response.text
+
+    # Existing rows are rewritten in batches, e.g. when switching it off
+    async with TestingSessionLocal() as session:
+        connection = await session.connection()
+        after_id, changed = 0, 0
+        while after_id is not None:
+            after_id, count = await connection.run_sync(
+                lambda sync: convert_descriptions(sync, False, after_id, limit=2)
+            )
+            changed += count
+        await session.commit()
+    assert changed == 1
+    assert [row[0] for row in await stored()] == ["text", "text"]
+    response = await client.get(
+        "/memories/search", params={"q": "river"}, headers=headers
+    )
+    assert "<mark>river</mark>" in response.text
+
+    # Switched off, the triggers no longer need the app's memory_text(), so
+    # any SQLite client can write memories again
+    monkeypatch.setattr(settings, "DESCRIPTION_COMPRESSION", False)
+    assert await sync_triggers() is False
+    conn = sqlite3.connect("./test_memory_app.db")
+    try:
+        conn.execute("UPDATE memories SET title = 'Plain walk' WHERE id = ?", (ids[1],))
+        conn.commit()
+    finally:
+        conn.close()
+    response = await client.get(
+        "/memories/search", params={"q": "plain walk"}, headers=headers
+    )
+    assert "<mark>Plain</mark> <mark>walk</mark>" in response.text
+
+
+@pytest.mark.asyncio
+async def test_timeline_stats(client):
+    import json
+    from datetime import datetime, timedelta
+
+    from sqlalchemy import text
+
+    from app.services.stats import check_day_counts, rebuild_day_counts
+    from tests.conftest import TestingSessionLocal
+
+    credentials = {"username": "statsuser", "password": "statspassword123"}
+    await client.post("/users/register", data=credentials)
+    response = await client.post("/api/token", data=credentials)
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+    today = datetime.utcnow().replace(hour=12)
+    dates = [today - timedelta(days=n) for n in (0, 1, 1, 2, 10, 11, 12, 13, 400)]
+    body = "\n".join(
+        json.dumps(
+            {"title": "Day", "description": "Entry", "created_at": d.isoformat()}
+        )
+        for d in dates
+    )
+    response = await client.post(
+        "/memories/import",
+        content=body.encode(),
+        headers={**headers, "Content-Type": "application/x-ndjson"},
+    )
+    assert response.json()["imported"] == 9
+
+    response = await client.get("/api/stats", headers=headers)
+    stats = response.json()
+    assert stats["total"] == 9
+    yesterday = (today - timedelta(days=1)).date().isoformat()
+    assert {"date": yesterday, "count": 2} in stats["days"]
+    assert len(stats["days"]) == 8
+    assert sum(year["count"] for year in stats["years"]) == 9
+    assert stats["streaks"]["current"] == 3
+    assert stats["streaks"]["longest"] == 4
+    response = await client.get(
+        "/api/stats", headers={**headers, "If-None-Match": response.headers["ETag"]}
+    )
+    assert response.status_code == 304
+
+    # Deleting today's entry breaks nothing but today's count
+    items = (await client.get("/api/memories", headers=headers)).json()["items"]
+    await client.delete(f"/api/memories/{items[0]['id']}", headers=headers)
+    stats = (await client.get("/api/stats", headers=headers)).json()
+    assert stats["total"] == 8
+    assert stats["streaks"]["current"] == 2
+
+    async with TestingSessionLocal() as session:
+        connection = await session.connection()
+        assert await connection.run_sync(check_day_counts) == []
+        await connection.execute(text("UPDATE memory_day_counts SET count = 7"))
+        assert await connection.run_sync(check_day_counts)
+        await connection.run_sync(rebuild_day_counts)
+        assert await connection.run_sync(check_day_counts) == []
+        await session.commit()
+
+
+@pytest.mark.asyncio
+async def test_tags(client):
+    credentials = {"username": "taguser", "password": "tagpassword123"}
+    await client.post("/users/register", data=credentials)
+    response = await client.post("/api/token", data=credentials)
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+    tag_sets = [["Travel", "#family"], ["travel"], ["family"], ["travel", "Family"]]
+    ids = []
+    for i, tags in enumerate(tag_sets):
+        response = await client.post(
+            "/api/memories",
+            json={"title": f"Tagged {i}", "description": "Entry", "tags": tags},
+            headers=headers,
+        )
+        assert response.status_code == 201
+        ids.append(response.json()["id"])
+    assert response.json()["tags"] == ["family", "travel"]
+
+    async def listing(**params):
+        response = await client.get("/api/memories", params=params, headers=headers)
+        assert response.status_code == 200
+        return response.json()
+
+    async def ids_of(**params):
+        return [item["id"] for item in (await listing(**params))["items"]]
+
+    assert await ids_of(tags="travel,family") == [ids[3], ids[0]]
+    assert await ids_of(tags="travel,family", match="any") == ids[::-1]
+    assert await ids_of(tags="travel,unknown") == []
+    # Keyset pages over a filter, both ways
+    page = await listing(tags="family,travel", match="any", limit=3)
+    assert [item["id"] for item in page["items"]] == ids[:0:-1]
+    page = await listing(tags="travel", limit=1, after=page["next_cursor"])
+    assert [item["id"] for item in page["items"]] == [ids[0]]
+    page = await listing(tags="travel", limit=2, before=page["prev_cursor"])
+    assert [item["id"] for item in page["items"]] == [ids[3], ids[1]]
+
+    async def cloud():
+        response = await client.get("/api/tags", headers=headers)
+        return {tag["name"]: tag["count"] for tag in response.json()["items"]}
+
+    assert await cloud() == {"family": 3, "travel": 3}
+    response = await client.patch(
+        f"/api/memories/{ids[1]}", json={"tags": ["work"]}, headers=headers
+    )
+    assert response.json()["tags"] == ["work"]
+    await client.delete(f"/api/memories/{ids[3]}", headers=headers)
+    await client.delete(f"/api/memories/{ids[1]}", headers=headers)
+    assert await cloud() == {"family": 2, "travel": 1}
+    response = await client.get(f"/api/memories/{ids[0]}", headers=headers)
+    assert response.json()["tags"] == ["family", "travel"]
+
+
+@pytest.mark.asyncio
+async def test_related_memories(client, monkeypatch, tmp_path):
+    import asyncio
+    import json
+    import os
+    import threading
+
+    from app.core.config import settings
+    from app.db.jobs import JOB_HANDLERS, job_queue
+    from app.services import similarity
+
+    monkeypatch.setattr(settings, "SIMILARITY_ENABLED", True)
+    monkeypatch.setattr(settings, "SIMILARITY_INDEX_DIR", str(tmp_path))
+    monkeypatch.setattr(similarity, "indexes", similarity.LRUCache(maxsize=16))
+    credentials = {"username": "similaruser", "password": "similarpassword123"}
+    await client.post("/users/register", data=credentials)
+    response = await client.post("/api/token", data=credentials)
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    entries = [
+        ("Beach day", "We swam in the sea and built sand castles on the beach."),
+        ("Budget", "Went through the monthly budget and paid the bills."),
+        ("Back to the beach", "Another swim in the sea, the beach was quiet."),
+    ]
+    body = "\n".join(
+        json.dumps({"title": title, "description": text}) for title, text in entries
+    )
+    await client.post(
+        "/memories/import",
+        content=body.encode(),
+        headers={**headers, "Content-Type": "application/x-ndjson"},
+    )
+    items = (await client.get("/api/memories", headers=headers)).json()["items"]
+    ids = {item["title"]: item["id"] for item in items}
+
+    async def related(memory_id):
+        # Index updates run as jobs after the write has returned
+        await job_queue.join()
+        response = await client.get(
+            f"/api/memories/{memory_id}/related", headers=headers
+        )
+        assert response.status_code == 200
+        return [item["title"] for item in response.json()["items"]]
+
+    # Built from the database on first use
+    assert (await related(ids["Beach day"]))[0] == "Back to the beach"
+    # Then kept current by the writes, once their job has run; results from
+    # before are not cached under the write's version
+    release = asyncio.Event()
+    sync_index = JOB_HANDLERS["similarity.sync"]
+
+    async def held_sync_index(source, payload):
+        await release.wait()
+        await sync_index(source, payload)
+
+    monkeypatch.setitem(JOB_HANDLERS, "similarity.sync", held_sync_index)
+    response = await client.post(
+        "/api/memories",
+        json={"title": "Sea swim", "description": "A cold swim in the sea."},
+        headers=headers,
+    )
+    url = f"/api/memories/{ids['Beach day']}/related"
+    early = await client.get(url, headers=headers)
+    assert "Sea swim" not in [item["title"] for item in early.json()["items"]]
+    release.set()
+    await job_queue.join()
+    later = await client.get(
+        url, headers={**headers, "If-None-Match": early.headers["ETag"]}
+    )
+    assert later.status_code == 200
+    assert "Sea swim" in [item["title"] for item in later.json()["items"]]
+    later = await client.get(
+        url, headers={**headers, "If-None-Match": later.headers["ETag"]}
+    )
+    assert later.status_code == 304
+    await client.patch(
+        f"/api/memories/{ids['Back to the beach']}",
+        json={"description": "Paid the bills, then the budget again."},
+        headers=headers,
+    )
+    assert (await related(ids["Budget"]))[0] == "Back to the beach"
+    await client.delete(f"/api/memories/{ids['Budget']}", headers=headers)
+    assert "Budget" not in await related(ids["Back to the beach"])
+
+    # Another worker's copy follows the same file
+    user_id = items[0]["user_id"]
+    index = similarity.SimilarityIndex(
+        similarity.index_path(user_id), settings.SIMILARITY_DIMENSIONS
+    )
+    assert index.refresh()
+    assert sorted(index.ids[: index.size].tolist()) == sorted(
+        set(ids.values()) - {ids["Budget"]} | {response.json()["id"]}
+    )
+
+    # Rewritten with the live records once half of them are dead
+    monkeypatch.setattr(similarity, "COMPACT_MIN_RECORDS", 1)
+    path = similarity.index_path(user_id)
+    assert os.path.getsize(path) > index.size * index.dtype.itemsize
+    await related(ids["Beach day"])
+    assert os.path.getsize(path) == index.size * index.dtype.itemsize
+    assert index.refresh() and index.size == 3
+    monkeypatch.setattr(similarity, "COMPACT_MIN_RECORDS", 1024)
+
+    # A write committed while a build is writing out an older snapshot
+    # appends its record once the new file is in place
+    await similarity.discard_index(user_id)
+    writing, proceed = threading.Event(), threading.Event()
+    write_file = similarity._write_file
+
+    def held_write_file(path, records):
+        writing.set()
+        proceed.wait()
+        write_file(path, records)
+
+    monkeypatch.setattr(similarity, "_write_file", held_write_file)
+    build = asyncio.create_task(client.get(url, headers=headers))
+    await asyncio.to_thread(writing.wait)
+    await client.post(
+        "/api/memories",
+        json={"title": "Lake swim", "description": "A swim in the lake."},
+        headers=headers,
+    )
+    await asyncio.sleep(0.2)
+    proceed.set()
+    await build
+    assert "Lake swim" in await related(ids["Beach day"])
+    await job_queue.stop()
+
+
+@pytest.mark.asyncio
+async def test_job_queue_retries_and_outbox(monkeypatch):
+    from datetime import datetime
+
+    from sqlalchemy import func, select
+
+    from app.db import jobs
+    from app.models.job_model import Job
+    from tests.conftest import TestingSessionLocal
+
+    queue = jobs.JobQueue(
+        capacity=2, workers=1, max_attempts=3, retry_base=0, lease=0, poll_interval=60
+    )
+    monkeypatch.setattr(jobs, "job_queue", queue)
+    calls = []
+
+    @jobs.job_handler("test.flaky")
+    async def flaky(source, payload):
+        calls.append(payload["n"])
+        if payload["n"] == 0 and calls.count(0) == 1:
+            raise RuntimeError("first attempt fails")
+
+    async def outbox():
+        async with TestingSessionLocal() as db:
+            return (
+                await db.execute(
+                    select(func.count()).select_from(Job).where(Job.kind != "test.dead")
+                )
+            ).scalar_one()
+
+    try:
+        async with TestingSessionLocal() as db:
+            for n in range(4):
+                await jobs.stage_job(db, "test.flaky", {"n": n})
+            await db.commit()
+        # Two fit in the queue; the others wait in the outbox
+        assert (queue.dispatched_total, queue.spilled_total) == (2, 2)
+        # Done rows go as soon as the queue runs dry, not at the next poll
+        await queue._queue.join()
+        assert sorted(calls) == [0, 1]
+        assert await outbox() == 3
+        # The spilled jobs and the retry are due: the outbox is read again
+        assert queue._poll_due()
+
+        # As after a restart: everything due is taken from the table
+        async with TestingSessionLocal() as db:
+            db.add(Job(kind="test.dead", payload={}, run_after=datetime.utcnow()))
+            await db.commit()
+        # At most two at a time, as the queue has room for
+        while await queue.poll():
+            await queue.join()
+        assert sorted(calls) == [0, 0, 1, 2, 3]
+        assert await outbox() == 0
+        # Nothing left to come due: the outbox is left alone until the idle
+        # poll
+        assert not queue._poll_due()
+        monkeypatch.setattr(queue, "idle_poll_interval", 0)
+        assert queue._poll_due()
+        async with TestingSessionLocal() as db:
+            dead = (
+                await db.execute(select(Job).where(Job.kind == "test.dead"))
+            ).scalar_one()
+        assert dead.run_after is None and dead.attempts == 3
+        assert "No handler" in dead.last_error
+    finally:
+        jobs.JOB_HANDLERS.pop("test.flaky", None)
+        await queue.stop()
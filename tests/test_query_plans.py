@@ -0,0 +1,161 @@
+# tests/test_query_plans.py
+
+import json
+import re
+import sqlite3
+
+import pytest
+from sqlalchemy import event
+
+from alembic import command
+from alembic.config import Config
+from app.db.compression import register_sqlite_functions
+from app.db.jobs import job_queue
+
+# Plan details that mean SQLite walks a whole table or sorts in memory
+# instead of using an index.
+BAD_PLAN = re.compile(r"^SCAN (?!CONSTANT ROW)|USE TEMP B-TREE FOR (?:ORDER|GROUP) BY")
+# Virtual tables (FTS5) report their own access through xBestIndex
+VIRTUAL_TABLE = re.compile(r"VIRTUAL TABLE INDEX")
+
+
+async def exercise_app(client):
+    """Drive every route in app/main.py and app/routers once."""
+    credentials = {"username": "planuser", "password": "planpassword123"}
+    await client.get("/")
+    await client.get("/health")
+    await client.get("/users/register")
+    await client.get("/users/login")
+    await client.post("/users/register", data=credentials)
+    await client.post("/users/register", data=credentials)
+    await client.post(
+        "/users/login", data={"username": "planuser", "password": "wrong-password"}
+    )
+    await client.post("/users/login", data=credentials)
+    for i in range(3):
+        await client.post(
+            "/memories", data={"title": f"Plan {i}", "description": f"Entry {i}"}
+        )
+    response = await client.get("/memories", params={"limit": 1})
+    after = re.search(r"after=([\w-]+)", response.text).group(1)
+    response = await client.get("/memories", params={"limit": 1, "after": after})
+    before = re.search(r"before=([\w-]+)", response.text).group(1)
+    await client.get("/memories", params={"limit": 1, "before": before})
+    await client.get("/memories/search", params={"q": "plan entry"})
+    response = await client.get("/memories/export")
+    cursor = json.loads(response.text.splitlines()[0])["cursor"]
+    await client.get("/memories/export", params={"format": "csv", "after": cursor})
+
+    response = await client.post("/api/token", data=credentials)
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+    response = await client.get("/api/memories", params={"limit": 1}, headers=headers)
+    memory_id = response.json()["items"][0]["id"]
+    await client.get(
+        "/api/memories",
+        params={"limit": 1, "after": response.json()["next_cursor"]},
+        headers=headers,
+    )
+    await client.get(f"/api/memories/{memory_id}", headers=headers)
+    await client.get(f"/api/memories/{memory_id}/related", headers=headers)
+    await client.get("/api/stats", headers=headers)
+    for tags in (["plan", "work"], ["plan"]):
+        await client.post(
+            "/api/memories",
+            json={"title": "Tagged", "description": "Entry", "tags": tags},
+            headers=headers,
+        )
+    for match in ("all", "any"):
+        response = await client.get(
+            "/api/memories",
+            params={"tags": "plan,work", "match": match, "limit": 1},
+            headers=headers,
+        )
+        await client.get(
+            "/api/memories",
+            params={
+                "tags": "plan,work",
+                "match": match,
+                "limit": 1,
+                "after": response.json()["next_cursor"],
+            },
+            headers=headers,
+        )
+    await client.get("/api/tags", headers=headers)
+    await client.patch(
+        f"/api/memories/{memory_id}",
+        json={"title": "Edited", "tags": ["work"]},
+        headers=headers,
+    )
+    await client.delete(f"/api/memories/{memory_id}", headers=headers)
+    await client.get("/users/logout")
+
+
+@pytest.fixture
+async def captured_queries(db_engines):
+    queries = []
+
+    def _capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(("SELECT", "UPDATE", "DELETE")):
+            queries.append((statement, parameters))
+
+    for engine in db_engines:
+        event.listen(engine.sync_engine, "before_cursor_execute", _capture)
+    yield queries
+    for engine in db_engines:
+        event.remove(engine.sync_engine, "before_cursor_execute", _capture)
+
+
+@pytest.fixture
+def migrated_db(tmp_path):
+    """A database built by `alembic upgrade head` rather than create_all."""
+    from app.core.config import settings
+
+    path = tmp_path / "migrated.db"
+    config = Config()
+    config.set_main_option("script_location", "alembic")
+    original_url = settings.DATABASE_URL
+    settings.DATABASE_URL = f"sqlite+aiosqlite:///{path}"
+    try:
+        command.upgrade(config, "head")
+    finally:
+        settings.DATABASE_URL = original_url
+    return path
+
+
+def bad_plan_steps(path, statement, parameters):
+    conn = sqlite3.connect(path)
+    # The search triggers call it; the app registers it on its own connections
+    register_sqlite_functions(conn)
+    try:
+        rows = conn.execute(f"EXPLAIN QUERY PLAN {statement}", parameters).fetchall()
+    finally:
+        conn.close()
+    return [
+        detail
+        for _, _, _, detail in rows
+        if BAD_PLAN.search(detail) and not VIRTUAL_TABLE.search(detail)
+    ]
+
+
+@pytest.mark.asyncio
+async def test_every_query_uses_an_index(
+    client, captured_queries, migrated_db, monkeypatch, tmp_path
+):
+    from app.core.config import settings
+
+    monkeypatch.setattr(settings, "SIMILARITY_ENABLED", True)
+    monkeypatch.setattr(settings, "SIMILARITY_INDEX_DIR", str(tmp_path / "similarity"))
+    await exercise_app(client)
+    # The post-write jobs, and the poll for jobs left in the outbox
+    await job_queue.join()
+    await job_queue.poll()
+    await job_queue.stop()
+    assert captured_queries, "no queries were captured"
+
+    failures = []
+    for database in ("./test_memory_app.db", migrated_db):
+        for statement, parameters in captured_queries:
+            steps = bad_plan_steps(database, statement, parameters)
+            if steps:
+                failures.append(f"{database}: {statement.strip()} -> {steps}")
+    assert not failures, "\n".join(failures)